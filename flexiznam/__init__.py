@@ -2,4 +2,5 @@
 
 from .main import *
 from . import utils
+from .snapshot import ProjectSnapshot
 from .schema import Dataset
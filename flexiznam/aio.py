@@ -0,0 +1,155 @@
+"""Asyncio versions of the flexiznam query functions
+
+The functions of this module have the same arguments as their equivalent in
+:py:mod:`flexiznam.main` but are coroutines, so they can be used in an asyncio
+application without blocking the event loop::
+
+    from flexiznam import aio
+
+    async def main():
+        mouse = await aio.get_entity(name="mouse", flexilims_session=session)
+        datasets = await aio.get_datasets_recursively(
+            origin_id=mouse.id, flexilims_session=session
+        )
+
+The flexilims client is synchronous, so each call runs in a thread of the executor
+of the event loop. A semaphore per event loop limits the number of calls running at
+the same time (see :py:func:`set_concurrency`). This is not a limit on HTTP
+requests: one call can make several requests, some of them concurrently (for
+instance :py:func:`get_entity` without `datatype` queries all datatypes on a thread
+pool). Recursive traversals query all siblings of a level concurrently with
+`asyncio.gather`.
+"""
+import asyncio
+import functools
+import threading
+import weakref
+from flexiznam import main
+
+DEFAULT_CONCURRENCY = 8
+
+_CONCURRENCY = dict(value=DEFAULT_CONCURRENCY)
+_SEMAPHORES = weakref.WeakKeyDictionary()
+_SEMAPHORES_LOCK = threading.Lock()
+
+
+def set_concurrency(max_requests):
+    """Set the maximum number of calls running at the same time per event loop
+
+    Applies to event loops that did not call a function of this module yet. Each
+    call can make several flexilims requests.
+
+    Args:
+        max_requests (int): number of concurrent calls
+    """
+    _CONCURRENCY["value"] = int(max_requests)
+
+
+def _get_semaphore():
+    loop = asyncio.get_running_loop()
+    with _SEMAPHORES_LOCK:
+        if loop not in _SEMAPHORES:
+            _SEMAPHORES[loop] = asyncio.Semaphore(_CONCURRENCY["value"])
+        return _SEMAPHORES[loop]
+
+
+async def _run(func, *args, **kwargs):
+    """Run a blocking function in the loop executor, within the call semaphore"""
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(func, *args, **kwargs)
+        )
+
+
+async def get_entity(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.get_entity`"""
+    return await _run(main.get_entity, *args, **kwargs)
+
+
+async def get_entities(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.get_entities`"""
+    return await _run(main.get_entities, *args, **kwargs)
+
+
+async def get_children(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.get_children`"""
+    return await _run(main.get_children, *args, **kwargs)
+
+
+async def get_datasets(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.get_datasets`"""
+    return await _run(main.get_datasets, *args, **kwargs)
+
+
+async def add_dataset(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.add_dataset`"""
+    return await _run(main.add_dataset, *args, **kwargs)
+
+
+async def update_entity(*args, **kwargs):
+    """Async version of :py:func:`flexiznam.main.update_entity`"""
+    return await _run(main.update_entity, *args, **kwargs)
+
+
+async def get_datasets_recursively(
+    origin_id=None,
+    origin_name=None,
+    origin_series=None,
+    dataset_type=None,
+    filter_datasets=None,
+    parent_type=None,
+    filter_parents=None,
+    return_paths=False,
+    project_id=None,
+    flexilims_session=None,
+):
+    """Async version of :py:func:`flexiznam.main.get_datasets_recursively`
+
+    The children of all siblings are queried concurrently. The output is the same
+    as the synchronous version, in the same order.
+    """
+    if flexilims_session is None:
+        flexilims_session = await _run(main.get_shared_session, project_id)
+    if origin_series is None:
+        if origin_id is None:
+            origin_id = await _run(
+                main.get_id, origin_name, flexilims_session=flexilims_session
+            )
+        origin_series = await get_entity(
+            id=origin_id, flexilims_session=flexilims_session
+        )
+
+    async def visit(series, parent_type):
+        """List of (id, datasets) of `series` and its descendants, depth first"""
+        origin_is_valid = (parent_type is None) or (series["type"] == parent_type)
+        if filter_parents is not None:
+            for key, value in filter_parents.items():
+                if series.get(key, None) != value:
+                    origin_is_valid = False
+        queries = [
+            get_children(parent_id=series["id"], flexilims_session=flexilims_session)
+        ]
+        if origin_is_valid:
+            queries.append(
+                get_datasets(
+                    origin_id=series["id"],
+                    dataset_type=dataset_type,
+                    project_id=project_id,
+                    flexilims_session=flexilims_session,
+                    return_paths=return_paths,
+                    filter_datasets=filter_datasets,
+                )
+            )
+        replies = await asyncio.gather(*queries)
+        output = []
+        if origin_is_valid and len(replies[1]):
+            output.append((series["id"], replies[1]))
+        children = [c for _, c in replies[0].iterrows() if c.type != "dataset"]
+        # like the synchronous version, `parent_type` only applies to the origin
+        descendants = await asyncio.gather(*[visit(c, None) for c in children])
+        for descendant in descendants:
+            output.extend(descendant)
+        return output
+
+    return dict(await visit(origin_series, parent_type))
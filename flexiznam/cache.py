@@ -0,0 +1,176 @@
+"""Session-scoped cache of flexilims replies
+
+Helpers of :py:mod:`flexiznam.main` often query flexilims for the same entity many
+times, for instance the parent of every dataset during an upload. An
+:py:class:`EntityCache` can be attached to a flexilims session to keep raw replies
+for a limited time. It is opt-in: use :py:func:`enable_cache` or
+`get_flexilims_session(..., use_cache=True)`.
+
+Writes done through flexiznam (`add_*`, `update_entity`, `delete_recursively`)
+invalidate the cached replies of the datatype they touch. Writes done directly with
+the flexilims session are not tracked, call `cache.clear()` after them.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_ATTRIBUTE = "_flexiznam_cache"
+CHILDREN = "__children__"
+
+
+class EntityCache(object):
+    """LRU cache with time-to-live for raw flexilims replies
+
+    Keys are tuples starting with the datatype (or `__children__` for
+    `get_children` replies). Values are stored and returned as deep copies, since
+    formatting a flexilims reply modifies it.
+    """
+
+    def __init__(self, ttl=300, maxsize=1024):
+        """Create an empty cache
+
+        Args:
+            ttl (float): time to live of an entry, in seconds. None to keep entries
+                until they are evicted or invalidated.
+            maxsize (int): maximum number of replies kept. The least recently used
+                reply is evicted first.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._get_valid(key) is not None
+
+    def _get_valid(self, key):
+        """Return the (timestamp, value) pair if the entry exists and is not stale"""
+        entry = self._data.get(key, None)
+        if entry is None:
+            return None
+        if (self.ttl is not None) and (time.monotonic() - entry[0] > self.ttl):
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key):
+        """Get a copy of a cached reply
+
+        Args:
+            key (tuple): cache key
+
+        Returns:
+            the cached reply or None if it is not cached or stale
+        """
+        with self._lock:
+            entry = self._get_valid(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return copy.deepcopy(entry[1])
+
+    def set(self, key, value):
+        """Cache a reply
+
+        Args:
+            key (tuple): cache key
+            value: flexilims reply to cache
+        """
+        with self._lock:
+            self._data[key] = (time.monotonic(), copy.deepcopy(value))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, datatype=None):
+        """Remove cached replies that might be affected by a change
+
+        Args:
+            datatype (str): datatype that changed. All replies for this datatype are
+                removed, as well as all `get_children` replies. If None, clear
+                everything.
+        """
+        with self._lock:
+            if datatype is None:
+                self._data.clear()
+                return
+            to_remove = [k for k in self._data if k[0] in (datatype, None, CHILDREN)]
+            for key in to_remove:
+                del self._data[key]
+
+    def clear(self):
+        """Remove all cached replies"""
+        self.invalidate(datatype=None)
+
+    @property
+    def stats(self):
+        """Dictionary with hits, misses, evictions and current size of the cache
+
+        `hits` is the number of flexilims requests that were avoided.
+        """
+        return dict(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            size=len(self._data),
+        )
+
+    def reset_stats(self):
+        """Set hit, miss and eviction counters back to 0"""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def enable_cache(flexilims_session, ttl=300, maxsize=1024):
+    """Attach a new cache to a flexilims session
+
+    Args:
+        flexilims_session (:py:class:`flexilims.Flexilims`): session to cache
+        ttl (float): time to live of an entry, in seconds
+        maxsize (int): maximum number of replies kept
+
+    Returns:
+        :py:class:`EntityCache`: the cache attached to the session
+    """
+    cache = EntityCache(ttl=ttl, maxsize=maxsize)
+    setattr(flexilims_session, CACHE_ATTRIBUTE, cache)
+    return cache
+
+
+def disable_cache(flexilims_session):
+    """Remove the cache of a flexilims session, if any"""
+    if hasattr(flexilims_session, CACHE_ATTRIBUTE):
+        delattr(flexilims_session, CACHE_ATTRIBUTE)
+
+
+def get_cache(flexilims_session):
+    """Get the cache attached to a flexilims session
+
+    Returns:
+        :py:class:`EntityCache`: the cache or None if caching is not enabled
+    """
+    return getattr(flexilims_session, CACHE_ATTRIBUTE, None)
+
+
+def invalidate(flexilims_session, datatype=None):
+    """Invalidate the cache of a flexilims session if it has one
+
+    Args:
+        flexilims_session (:py:class:`flexilims.Flexilims`): session
+        datatype (str): datatype that changed, None to clear everything
+    """
+    cache = get_cache(flexilims_session)
+    if cache is not None:
+        cache.invalidate(datatype)
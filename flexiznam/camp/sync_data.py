@@ -1,16 +1,29 @@
 """File to handle acquisition yaml file and create datasets on flexilims"""
+import copy
+import json
 import pathlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path, PurePosixPath
 import re
 import warnings
 import pandas as pd
-import yaml
+from flexiznam.yaml_io import load_yaml, dump_yaml
 
 import flexiznam as flz
 from flexiznam.schema import Dataset
+from flexiznam.schema.folder_scan import FolderScan
+from flexiznam.camp.upload_journal import UploadJournal, UploadProgress
 
 
-def create_yaml(folder_to_parse, project, origin_name, output_file, overwrite=False):
+def create_yaml(
+    folder_to_parse,
+    project,
+    origin_name,
+    output_file,
+    overwrite=False,
+    incremental=False,
+    max_workers=None,
+):
     """Create a yaml file from a folder
 
     Args:
@@ -19,8 +32,16 @@ def create_yaml(folder_to_parse, project, origin_name, output_file, overwrite=Fa
         origin_name (str): Name of the origin on flexilims
         output_file (str): Full path to output yaml.
         overwrite (bool, optional): Overwrite output file if it exists. Defaults to False.
+        incremental (bool, optional): Keep the fingerprint and datasets of each folder
+            in `<output_file>.scan.json` and, if this file exists, re-detect datasets
+            only in folders that changed since it was written. Implies `overwrite`.
+            Defaults to False.
+        max_workers (int, optional): number of threads used to parse the folders.
+            Defaults to None, parse serially.
     """
     output_file = pathlib.Path(output_file)
+    if incremental:
+        overwrite = True
     if (not overwrite) and output_file.exists():
         s = input("File %s already exists. Overwrite (yes/[no])? " % output_file)
         if s == "yes":
@@ -35,9 +56,24 @@ def create_yaml(folder_to_parse, project, origin_name, output_file, overwrite=Fa
     if not folder_to_parse.is_dir():
         raise FileNotFoundError("source_dir %s is not a directory" % folder_to_parse)
 
-    data = create_yaml_dict(folder_to_parse, project, origin_name)
-    with open(output_file, "w") as f:
-        yaml.dump(data, f)
+    scan_cache = None
+    if incremental:
+        scan_cache_file = output_file.with_name(output_file.name + ".scan.json")
+        scan_cache = dict()
+        if scan_cache_file.exists():
+            with open(scan_cache_file, "r") as f:
+                scan_cache = json.load(f)
+    data = create_yaml_dict(
+        folder_to_parse,
+        project,
+        origin_name,
+        scan_cache=scan_cache,
+        max_workers=max_workers,
+    )
+    dump_yaml(data, output_file)
+    if incremental:
+        with open(scan_cache_file, "w") as f:
+            json.dump(scan_cache, f)
 
 
 def create_yaml_dict(
@@ -45,11 +81,20 @@ def create_yaml_dict(
     project,
     origin_name,
     format_yaml=True,
+    scan_cache=None,
+    max_workers=None,
+    flexilims_session=None,
 ):
     """Create a yaml dict from a folder
 
     Recursively parse a folder and create a yaml dict with the structure of the folder.
 
+    If `scan_cache` is provided, the fingerprint of each folder (see
+    `folder_fingerprint`) and the datasets found in it are stored in it. When the
+    same dictionary is given again, datasets are re-detected only in folders whose
+    fingerprint changed. Every folder is still listed once, since modifying a
+    subfolder does not change the modification time of its parents.
+
     Args:
         folder_to_parse (str): Path to the folder to parse
         project (str): Name of the project, used as root of the path in the output
@@ -58,27 +103,50 @@ def create_yaml_dict(
         format_yaml (bool, optional): Format the output to be yaml compatible if True,
             otherwise keep dataset as Dataset object and path as pathlib.Path. Defaults
             to True.
+        scan_cache (dict, optional): JSON compatible dictionary of folder fingerprints
+            and datasets from a previous call. Updated in place. Requires
+            `format_yaml`. Defaults to None.
+        max_workers (int, optional): if not None, list folders and detect datasets
+            with a pool of `max_workers` threads. The output is the same as the serial
+            version. Defaults to None.
+        flexilims_session (Flexilims, optional): session to use to find the origin.
+            Defaults to the shared session of `project`.
 
     Returns:
         dict: Dictionary with the structure of the folder and automatically detected
             datasets
     """
-    flm_sess = flz.get_flexilims_session(project_id=project)
+    if (scan_cache is not None) and (not format_yaml):
+        raise ValueError("`scan_cache` can only be used with `format_yaml=True`")
+    if flexilims_session is None:
+        flexilims_session = flz.get_shared_session(project_id=project)
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
-        origin = flz.get_entity(name=origin_name, flexilims_session=flm_sess)
+        origin = flz.get_entity(name=origin_name, flexilims_session=flexilims_session)
     assert origin is not None, f"Origin {origin_name} not found in project {project}"
     assert "genealogy" in origin, f"Origin {origin_name} has no genealogy"
     genealogy = origin["genealogy"]
     folder_to_parse = Path(folder_to_parse)
     assert folder_to_parse.is_dir(), f"Folder {folder_to_parse} does not exist"
 
+    prefetched = None
+    if max_workers is not None:
+        prefetched = _prefetch_levels(
+            folder_to_parse,
+            project=project,
+            genealogy=list(genealogy),
+            format_yaml=format_yaml,
+            scan_cache=scan_cache,
+            max_workers=max_workers,
+        )
     data = _create_yaml_dict(
         level_folder=folder_to_parse,
         project=project,
         genealogy=genealogy,
         format_yaml=format_yaml,
         parent_dict=dict(),
+        scan_cache=scan_cache,
+        _prefetched=prefetched,
     )
     if format_yaml:
         root_folder = str(folder_to_parse.parent)
@@ -99,6 +167,7 @@ def parse_yaml(
     origin_name=None,
     project=None,
     format_yaml=True,
+    flexilims_session=None,
 ):
     """Parse a yaml file and check validity
 
@@ -117,12 +186,13 @@ def parse_yaml(
         format_yaml (bool, optional): Format the output to be yaml compatible if True,
             otherwise keep dataset as Dataset object and path as pathlib.Path. Defaults
             to True.
+        flexilims_session (Flexilims, optional): session to use, also for the validity
+            check. Defaults to the shared session of `project`.
     Returns
         dict: yaml dict with datasets added
     """
     if isinstance(yaml_data, str) or isinstance(yaml_data, Path):
-        with open(yaml_data, "r") as f:
-            yaml_data = yaml.safe_load(f)
+        yaml_data = load_yaml(yaml_data)
 
     if root_folder is None:
         root_folder = Path(yaml_data["root_folder"])
@@ -130,13 +200,14 @@ def parse_yaml(
 
     if project is None:
         project = yaml_data["project"]
-    flm_sess = flz.get_flexilims_session(project_id=project)
+    if flexilims_session is None:
+        flexilims_session = flz.get_shared_session(project_id=project)
 
     if origin_name is None:
         origin_name = yaml_data["origin_name"]
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
-        origin = flz.get_entity(name=origin_name, flexilims_session=flm_sess)
+        origin = flz.get_entity(name=origin_name, flexilims_session=flexilims_session)
     assert origin is not None, f"Origin {origin_name} not found in project {project}"
     assert "genealogy" in origin, f"Origin {origin_name} has no genealogy"
     genealogy = origin["genealogy"]
@@ -160,13 +231,19 @@ def parse_yaml(
         project=project,
     )
     yaml_data, errors = check_yaml_validity(
-        yaml_data, root_folder, origin_name, project
+        yaml_data,
+        root_folder,
+        origin_name,
+        project,
+        flexilims_session=flexilims_session,
     )
 
     return out
 
 
-def check_yaml_validity(yaml_data, root_folder=None, origin_name=None, project=None):
+def check_yaml_validity(
+    yaml_data, root_folder=None, origin_name=None, project=None, flexilims_session=None
+):
     """Check that a yaml file is valid
 
     This will check that the genealogy is correct, that the datasets are valid and
@@ -181,13 +258,14 @@ def check_yaml_validity(yaml_data, root_folder=None, origin_name=None, project=N
             read from the yaml file
         project (str): name of the project. If not provided, will be read from the yaml
             file
+        flexilims_session (Flexilims, optional): session to use. Defaults to the
+            shared session of `project`.
 
     Returns:
         dict: same as input yaml_data, but with errors added
     """
     if isinstance(yaml_data, str) or isinstance(yaml_data, Path):
-        with open(yaml_data, "r") as f:
-            yaml_data = yaml.safe_load(f)
+        yaml_data = load_yaml(yaml_data)
     if root_folder is not None:
         assert yaml_data["root_folder"] == str(
             root_folder
@@ -209,10 +287,11 @@ def check_yaml_validity(yaml_data, root_folder=None, origin_name=None, project=N
     else:
         origin_name = yaml_data["origin_name"]
 
-    flm_sess = flz.get_flexilims_session(project_id=project)
+    if flexilims_session is None:
+        flexilims_session = flz.get_shared_session(project_id=project)
     with warnings.catch_warnings():
         warnings.simplefilter("ignore")
-        origin = flz.get_entity(name=origin_name, flexilims_session=flm_sess)
+        origin = flz.get_entity(name=origin_name, flexilims_session=flexilims_session)
     assert hasattr(origin, "genealogy"), f"Origin {origin_name} has no genealogy"
 
     errors = _check_recursively(
@@ -232,9 +311,15 @@ def upload_yaml(
     log_func=print,
     flexilims_session=None,
     conflicts="abort",
+    journal=None,
+    progress=None,
 ):
     """Upload data from one yaml to flexilims
 
+    If `journal` is given, each entity created is appended to the journal file. If
+    the upload fails or is interrupted, running it again with the same journal skips
+    the entities already created and resumes after the last one.
+
     Args:
         source_yaml (dict or str): path to clean yaml or yaml dict
         raw_data_folder (str): path to the folder containing the data. Default to
@@ -246,15 +331,19 @@ def upload_yaml(
                          existing on flexilims, `skip` to ignore and proceed. Samples
                          are always updated with `skip` and datasets always have
                          mode=`safe`
+        journal (str or UploadJournal): path to the journal file, or journal object.
+            Default to None, no journal
+        progress (UploadProgress): progress object to update, for instance to
+            monitor the upload from another thread. Default to None, create one
 
     Returns:
-        list of names of entities created/updated
+        UploadProgress: counters of entities created, updated, skipped, resumed and
+            failed
 
     """
     if isinstance(source_yaml, str) or isinstance(source_yaml, Path):
         source_yaml = Path(source_yaml)
-        with open(source_yaml, "r") as f:
-            yaml_data = yaml.safe_load(f)
+        yaml_data = load_yaml(source_yaml)
     else:
         assert isinstance(source_yaml, dict), "source_yaml must be a dict or a path"
         yaml_data = source_yaml
@@ -262,7 +351,7 @@ def upload_yaml(
     # first find the origin
 
     if flexilims_session is None:
-        flexilims_session = flz.get_flexilims_session(project_id=yaml_data["project"])
+        flexilims_session = flz.get_shared_session(project_id=yaml_data["project"])
 
     origin_name = yaml_data["origin_name"]
     with warnings.catch_warnings():
@@ -271,16 +360,38 @@ def upload_yaml(
     assert origin is not None, f"`{origin_name}` not found on flexilims"
     if verbose:
         print(f"Found origin `{origin_name}` with id `{origin.id}`")
+
+    if (journal is not None) and not isinstance(journal, UploadJournal):
+        journal = UploadJournal(journal)
+    if progress is None:
+        progress = UploadProgress()
+    progress.total = _count_entities(yaml_data["children"])
     # then upload the data recursively
-    _upload_yaml_dict(
-        yaml_data["children"],
-        origin=origin,
-        raw_data_folder=raw_data_folder,
-        log_func=log_func,
-        flexilims_session=flexilims_session,
-        conflicts=conflicts,
-        verbose=verbose,
-    )
+    try:
+        _upload_yaml_dict(
+            yaml_data["children"],
+            origin=origin,
+            raw_data_folder=raw_data_folder,
+            log_func=log_func,
+            flexilims_session=flexilims_session,
+            conflicts=conflicts,
+            verbose=verbose,
+            genealogy=[origin_name],
+            journal=journal,
+            progress=progress,
+        )
+    finally:
+        if verbose:
+            print(progress)
+    return progress
+
+
+def _count_entities(yaml_dict):
+    """Number of entities in a yaml dict, including all children"""
+    n_entities = 0
+    for entity_data in yaml_dict.values():
+        n_entities += 1 + _count_entities(entity_data.get("children", None) or {})
+    return n_entities
 
 
 def _create_yaml_dict(
@@ -290,6 +401,8 @@ def _create_yaml_dict(
     format_yaml,
     parent_dict,
     only_datasets=False,
+    scan_cache=None,
+    _prefetched=None,
 ):
     """Private function to create a yaml dict from a folder
 
@@ -306,6 +419,10 @@ def _create_yaml_dict(
             and pathlib.Path objects
         parent_dict (dict): dict of the parent folder. Used for recursion
         only_datasets (bool): only parse datasets, not folders
+        scan_cache (dict): fingerprints and datasets of folders already parsed, see
+            `create_yaml_dict`. Updated in place
+        _prefetched (dict): output of `_prefetch_levels`, used instead of scanning
+            the folders again
     """
 
     level_folder = Path(level_folder)
@@ -361,26 +478,20 @@ def _create_yaml_dict(
     if format_yaml:
         level_dict["path"] = str(PurePosixPath(level_dict["path"]))
     children = dict() if "children" not in level_dict else level_dict["children"]
-    datasets = Dataset.from_folder(level_folder)
-    if datasets:
-        for ds_name, ds in datasets.items():
-            if ds_name in children:
-                warnings.warn(f"Dataset {ds_name} already exists in {level_name}. Skip")
-                continue
-            ds.genealogy = genealogy + list(ds.genealogy)
-            if format_yaml:
-                # find path root
-                proot = str(level_folder)[: -len(level_dict["path"])]
-                ds.path = ds.path.relative_to(proot)
-                children[ds_name] = ds.format(mode="yaml")
-                # remove fields that are not needed
-                for field in ["origin_id", "project_id", "name"]:
-                    children[ds_name].pop(field, None)
-                children[ds_name]["path"] = str(
-                    PurePosixPath(children[ds_name]["path"])
-                )
-            else:
-                children[ds_name] = ds
+    prefetched = None
+    if _prefetched is not None:
+        prefetched = _prefetched.get(str(level_folder), None)
+    if (prefetched is not None) and (prefetched[:2] == (genealogy, level_dict["path"])):
+        folder_scan, detected = prefetched[2:]
+    else:
+        folder_scan, detected = _scan_level(
+            level_folder, genealogy, level_dict["path"], format_yaml, scan_cache
+        )
+    for ds_name, ds in detected.items():
+        if ds_name in children:
+            warnings.warn(f"Dataset {ds_name} already exists in {level_name}. Skip")
+            continue
+        children[ds_name] = ds
 
     if only_datasets:
         subfolders = [
@@ -388,87 +499,199 @@ def _create_yaml_dict(
             for n, c in children.items()
             if (c is None) or (c.get("type", "unknown") != "dataset")
         ]
+        subfolders = [child for child in subfolders if child.is_dir()]
     else:
-        subfolders = level_folder.glob("*")
+        subfolders = [
+            level_folder / n for n in folder_scan.listdir() if folder_scan.is_dir(n)
+        ]
 
     for child in subfolders:
-        if child.is_dir():
-            _create_yaml_dict(
-                child,
-                project=project,
-                genealogy=genealogy + [level_name],
-                format_yaml=format_yaml,
-                parent_dict=children,
-            )
+        _create_yaml_dict(
+            child,
+            project=project,
+            genealogy=genealogy + [level_name],
+            format_yaml=format_yaml,
+            parent_dict=children,
+            scan_cache=scan_cache,
+            _prefetched=_prefetched,
+        )
     level_dict["children"] = children
     parent_dict[level_name] = level_dict
     return parent_dict
 
 
+def _scan_level(level_folder, genealogy, level_path, format_yaml, scan_cache):
+    """List a folder and find its datasets, using `scan_cache` if possible
+
+    Args:
+        level_folder (Path): folder to parse
+        genealogy (list): genealogy of the parent of `level_folder`
+        level_path (str or Path): path of `level_folder` relative to the project root
+        format_yaml (bool): format datasets to be yaml compatible
+        scan_cache (dict): see `create_yaml_dict`. Can be None
+
+    Returns:
+        (FolderScan, dict): listing of the folder and datasets by name
+    """
+    folder_scan = FolderScan(level_folder)
+    if scan_cache is not None:
+        fingerprint = folder_fingerprint(folder_scan)
+        cached = scan_cache.get(str(level_folder), None)
+        if (
+            (cached is not None)
+            and (cached["fingerprint"] == fingerprint)
+            and (cached["genealogy"] == genealogy)
+            and (cached["path"] == str(level_path))
+        ):
+            return folder_scan, copy.deepcopy(cached["datasets"])
+    detected = _detect_datasets(
+        level_folder, folder_scan, genealogy, level_path, format_yaml
+    )
+    if scan_cache is not None:
+        scan_cache[str(level_folder)] = dict(
+            fingerprint=fingerprint,
+            genealogy=list(genealogy),
+            path=str(level_path),
+            datasets=copy.deepcopy(detected),
+        )
+    return folder_scan, detected
+
+
+def _prefetch_levels(
+    level_folder, project, genealogy, format_yaml, scan_cache, max_workers
+):
+    """Scan a folder tree on a thread pool
+
+    All folders are listed and their datasets detected as `_create_yaml_dict` would
+    do when starting from an empty `parent_dict`.
+
+    Returns:
+        dict: folder path to (genealogy, path, folder_scan, detected datasets)
+    """
+    prefetched = dict()
+
+    def visit(folder, genealogy):
+        level_genealogy = genealogy + [folder.name]
+        level_path = Path(project, *level_genealogy)
+        if format_yaml:
+            level_path = str(PurePosixPath(level_path))
+        folder_scan, detected = _scan_level(
+            folder, genealogy, level_path, format_yaml, scan_cache
+        )
+        prefetched[str(folder)] = (genealogy, level_path, folder_scan, detected)
+        return [
+            (folder / n, level_genealogy)
+            for n in folder_scan.listdir()
+            if folder_scan.is_dir(n)
+        ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {executor.submit(visit, Path(level_folder), list(genealogy))}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for args in future.result():
+                    pending.add(executor.submit(visit, *args))
+    return prefetched
+
+
+def _detect_datasets(level_folder, folder_scan, genealogy, level_path, format_yaml):
+    """Find datasets in a folder and format them for `_create_yaml_dict`
+
+    Args:
+        level_folder (Path): folder to parse
+        folder_scan (FolderScan): listing of `level_folder`
+        genealogy (list): genealogy of the parent of `level_folder`
+        level_path (str): path of `level_folder` relative to the project root
+        format_yaml (bool): format datasets to be yaml compatible
+
+    Returns:
+        dict: datasets (formatted or not) by name
+    """
+    datasets = Dataset.from_folder(level_folder, folder_scan=folder_scan)
+    detected = dict()
+    for ds_name, ds in datasets.items():
+        ds.genealogy = genealogy + list(ds.genealogy)
+        if format_yaml:
+            # find path root
+            proot = str(level_folder)[: -len(level_path)]
+            ds.path = ds.path.relative_to(proot)
+            detected[ds_name] = ds.format(mode="yaml")
+            # remove fields that are not needed
+            for field in ["origin_id", "project_id", "name"]:
+                detected[ds_name].pop(field, None)
+            detected[ds_name]["path"] = str(PurePosixPath(detected[ds_name]["path"]))
+        else:
+            detected[ds_name] = ds
+    return detected
+
+
+def folder_fingerprint(folder_scan):
+    """Fingerprint of the content of a folder
+
+    The fingerprint changes if the folder modification time changes or if any file
+    directly in the folder is added, removed, resized or modified. Subfolders are not
+    included.
+
+    Args:
+        folder_scan (FolderScan): listing of the folder
+
+    Returns:
+        list: JSON compatible fingerprint
+    """
+    files = []
+    for name in sorted(folder_scan.listdir()):
+        if folder_scan.is_dir(name):
+            files.append([name, None, None])
+        else:
+            stat = folder_scan.stat(name)
+            files.append([name, stat.st_size, stat.st_mtime_ns])
+    return [folder_scan.folder.stat().st_mtime_ns, len(files), files]
+
+
 def _upload_yaml_dict(
-    yaml_dict, origin, raw_data_folder, log_func, flexilims_session, conflicts, verbose
+    yaml_dict,
+    origin,
+    raw_data_folder,
+    log_func,
+    flexilims_session,
+    conflicts,
+    verbose,
+    genealogy=(),
+    journal=None,
+    progress=None,
 ):
     for entity, entity_data in yaml_dict.items():
         entity_data = entity_data.copy()
         children = entity_data.pop("children", {})
         datatype = entity_data.pop("type")
-        if datatype == "session":
-            if verbose:
-                print(f"Adding session `{entity}`")
-            new_entity = flz.add_experimental_session(
-                date=entity[1:],
-                flexilims_session=flexilims_session,
-                parent_id=origin["id"],
-                attributes=entity_data,
-                session_name=entity,
-                conflicts=conflicts,
-            )
-        elif datatype == "recording":
-            rec_type = entity_data.pop("recording_type", "Not specified")
-            prot = entity_data.pop("protocol", "Not specified")
+        entity_path = list(genealogy) + [entity]
+        done = journal.get(entity_path) if journal is not None else None
+        if done is not None:
             if verbose:
-                print(
-                    f"Adding recording `{entity}`, type `{rec_type}`, protocol `{prot}`"
+                print(f"`{entity}` already uploaded with id `{done['id']}`")
+            if progress is not None:
+                progress.resumed += 1
+            new_entity = dict(id=done["id"], name=entity)
+        else:
+            try:
+                status, new_entity = _upload_entity(
+                    entity,
+                    entity_data,
+                    datatype,
+                    origin,
+                    flexilims_session,
+                    conflicts,
+                    verbose,
                 )
-            new_entity = flz.add_recording(
-                session_id=origin["id"],
-                recording_type=rec_type,
-                protocol=prot,
-                attributes=entity_data,
-                recording_name=entity,
-                conflicts=conflicts,
-                flexilims_session=flexilims_session,
-            )
-        elif datatype == "sample":
-            if verbose:
-                print(f"Adding sample `{entity}`")
-            new_entity = flz.add_sample(
-                parent_id=origin["id"],
-                attributes=entity_data,
-                sample_name=entity,
-                conflicts=conflicts,
-                flexilims_session=flexilims_session,
-            )
-        elif datatype == "dataset":
-            created = entity_data.pop("created")
-            dataset_type = entity_data.pop("dataset_type")
-            path = entity_data.pop("path")
-            is_raw = entity_data.pop("is_raw")
-
-            if verbose:
-                print(f"Adding dataset `{entity}`, type `{dataset_type}`")
-            new_entity = flz.add_dataset(
-                parent_id=origin["id"],
-                dataset_type=dataset_type,
-                created=created,
-                path=path,
-                is_raw=is_raw,
-                flexilims_session=flexilims_session,
-                dataset_name=entity,
-                attributes=entity_data["extra_attributes"],
-                strict_validation=False,
-                conflicts=conflicts,
-            )
+            except Exception:
+                if progress is not None:
+                    progress.failed += 1
+                raise
+            if progress is not None:
+                setattr(progress, status, getattr(progress, status) + 1)
+            if journal is not None:
+                journal.add(entity_path, new_entity["id"], datatype)
 
         _upload_yaml_dict(
             yaml_dict=children,
@@ -478,7 +701,91 @@ def _upload_yaml_dict(
             flexilims_session=flexilims_session,
             conflicts=conflicts,
             verbose=verbose,
+            genealogy=entity_path,
+            journal=journal,
+            progress=progress,
+        )
+
+
+def _upload_entity(
+    entity, entity_data, datatype, origin, flexilims_session, conflicts, verbose
+):
+    """Create one entity of a yaml dict on flexilims
+
+    Args:
+        entity (str): name of the entity
+        entity_data (dict): yaml dict of the entity, without `children` and `type`.
+            Modified in place
+        datatype (str): type of the entity
+        origin (dict or pd.Series): parent entity, must have an `id`
+        flexilims_session (Flexilims): session
+        conflicts (str): see `upload_yaml`
+        verbose (bool): print progress information
+
+    Returns:
+        (str, reply): `created`, `updated` or `skipped`, and the reply of the
+            `flz.add_*` function
+    """
+    if datatype == "session":
+        if verbose:
+            print(f"Adding session `{entity}`")
+        return flz.add_experimental_session(
+            date=entity[1:],
+            flexilims_session=flexilims_session,
+            parent_id=origin["id"],
+            attributes=entity_data,
+            session_name=entity,
+            conflicts=conflicts,
+            return_status=True,
+        )
+    if datatype == "recording":
+        rec_type = entity_data.pop("recording_type", "Not specified")
+        prot = entity_data.pop("protocol", "Not specified")
+        if verbose:
+            print(f"Adding recording `{entity}`, type `{rec_type}`, protocol `{prot}`")
+        return flz.add_recording(
+            session_id=origin["id"],
+            recording_type=rec_type,
+            protocol=prot,
+            attributes=entity_data,
+            recording_name=entity,
+            conflicts=conflicts,
+            flexilims_session=flexilims_session,
+            return_status=True,
+        )
+    if datatype == "sample":
+        if verbose:
+            print(f"Adding sample `{entity}`")
+        return flz.add_sample(
+            parent_id=origin["id"],
+            attributes=entity_data,
+            sample_name=entity,
+            conflicts=conflicts,
+            flexilims_session=flexilims_session,
+            return_status=True,
+        )
+    if datatype == "dataset":
+        created = entity_data.pop("created")
+        dataset_type = entity_data.pop("dataset_type")
+        path = entity_data.pop("path")
+        is_raw = entity_data.pop("is_raw")
+
+        if verbose:
+            print(f"Adding dataset `{entity}`, type `{dataset_type}`")
+        return flz.add_dataset(
+            parent_id=origin["id"],
+            dataset_type=dataset_type,
+            created=created,
+            path=path,
+            is_raw=is_raw,
+            flexilims_session=flexilims_session,
+            dataset_name=entity,
+            attributes=entity_data["extra_attributes"],
+            strict_validation=False,
+            conflicts=conflicts,
+            return_status=True,
         )
+    raise flz.errors.SyncYmlError(f"Unknown type `{datatype}` for `{entity}`")
 
 
 def _check_recursively(
@@ -538,8 +845,7 @@ def _check_recursively(
 if __name__ == "__main__":
     example_yml = "/Users/blota/Desktop/test_yaml.yml"
     out = parse_yaml(example_yml)
-    with open("/Users/blota/Desktop/test_yaml_redump.yml", "w") as f:
-        yaml.dump(out, f)
+    dump_yaml(out, "/Users/blota/Desktop/test_yaml_redump.yml")
 
     rel = "blota_onix_pilote/BRAC7448.2d/"
     root_folder = Path(flz.PARAMETERS["data_root"]["raw"]) / rel
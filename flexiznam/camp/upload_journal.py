@@ -0,0 +1,144 @@
+"""Journal and progress of yaml uploads
+
+:py:func:`flexiznam.camp.sync_data.upload_yaml` creates entities one by one. If it
+is given a journal file, every entity created is appended to the journal as soon as
+flexilims replies. Uploading the same yaml again with the same journal skips these
+entities and resumes after the last one created, without querying flexilims for
+them.
+
+The journal is a text file with one JSON record per line::
+
+    {"path": ["mouse", "S20230101", "R101010"], "id": "62a0...", "type": "recording"}
+
+`path` is the genealogy of the entity, starting with the origin of the upload. A
+line that was not fully written (if the upload was killed while writing) is
+ignored.
+"""
+import json
+import os
+import pathlib
+import threading
+import time
+
+
+class UploadJournal(object):
+    """Append-only record of the entities created by an upload
+
+    Attributes:
+        journal_file (pathlib.Path): path to the journal
+        entries (dict): tuple of genealogy to record of the entities already created
+    """
+
+    def __init__(self, journal_file):
+        """Open a journal, reading the entries of previous uploads if it exists
+
+        Args:
+            journal_file (str or pathlib.Path): path to the journal file. Created if
+                needed.
+        """
+        self.journal_file = pathlib.Path(journal_file)
+        self.entries = dict()
+        self._lock = threading.Lock()
+        if self.journal_file.exists():
+            with open(self.journal_file, "r") as f:
+                text = f.read()
+            for line in text.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # partially written line
+                    continue
+                self.entries[tuple(record["path"])] = record
+            if text and not text.endswith("\n"):
+                # terminate the partial line so that new entries start on a new line
+                with open(self.journal_file, "a") as f:
+                    f.write("\n")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, path):
+        return tuple(path) in self.entries
+
+    def get(self, path):
+        """Record of an entity or None if it is not in the journal
+
+        Args:
+            path (list): genealogy of the entity
+
+        Returns:
+            dict: with `path`, `id` and `type`
+        """
+        return self.entries.get(tuple(path), None)
+
+    def add(self, path, id, datatype):
+        """Append an entity to the journal and flush it to disk
+
+        Args:
+            path (list): genealogy of the entity
+            id (str): hexadecimal id of the entity on flexilims
+            datatype (str): type of the entity
+        """
+        record = dict(path=list(path), id=id, type=datatype)
+        with self._lock:
+            with open(self.journal_file, "a") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[tuple(path)] = record
+
+
+class UploadProgress(object):
+    """Counters of an upload
+
+    Attributes:
+        total (int): number of entities in the yaml
+        created (int): entities created on flexilims
+        updated (int): entities already on flexilims and updated
+        skipped (int): entities already on flexilims and not changed
+        resumed (int): entities skipped because they were in the journal
+        failed (int): entities that raised an error
+        start_time (float): `time.time()` at the start of the upload
+    """
+
+    def __init__(self, total=0):
+        self.total = total
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.resumed = 0
+        self.failed = 0
+        self.start_time = time.time()
+
+    @property
+    def done(self):
+        """Number of entities created, updated, skipped or resumed"""
+        return self.created + self.updated + self.skipped + self.resumed
+
+    @property
+    def elapsed(self):
+        """Seconds since the start of the upload"""
+        return time.time() - self.start_time
+
+    @property
+    def rate(self):
+        """Entities created or updated per second"""
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0
+        return (self.created + self.updated) / elapsed
+
+    def __str__(self):
+        return (
+            "%d/%d entities (%d created, %d updated, %d skipped, %d resumed, "
+            "%d failed), %.1f entities/s"
+        ) % (
+            self.done,
+            self.total,
+            self.created,
+            self.updated,
+            self.skipped,
+            self.resumed,
+            self.failed,
+            self.rate,
+        )
@@ -104,8 +104,7 @@ def add_mouse(
 def config(template=None, config_folder=None, update=False, add_projects=True):
     """Create a configuration file if none exists."""
     from flexiznam.config import config_tools
-    from flexiznam import errors
-    import yaml
+    from flexiznam import errors, yaml_io
 
     try:
         fname = config_tools._find_file("config.yml", config_folder=config_folder)
@@ -131,7 +130,7 @@ def config(template=None, config_folder=None, update=False, add_projects=True):
         click.echo("Configuration file created here:\n%s" % fname)
     click.echo("\nCurrent configuration is:")
     prm = config_tools.load_param(param_folder=config_folder)
-    click.echo(yaml.dump(prm))
+    click.echo(yaml_io.dump(prm))
 
 
 @cli.command()
@@ -193,16 +192,24 @@ def add_password(app, username, password, password_file):
     default=False,
     help="After creating the yaml skeleton, should I also parse it?",
 )
-def create_yaml(source_dir, target_yaml, project, origin, overwrite, process):
+@click.option(
+    "--incremental/--no-incremental",
+    default=False,
+    help="Re-detect datasets only in folders that changed since the last run.",
+)
+def create_yaml(
+    source_dir, target_yaml, project, origin, overwrite, process, incremental
+):
     """Create a yaml file by looking recursively in `root_dir`"""
     from flexiznam import camp
 
     camp.sync_data.create_yaml(
-        root_folder=source_dir,
+        folder_to_parse=source_dir,
         output_file=target_yaml,
         origin_name=origin,
         project=project,
         overwrite=overwrite,
+        incremental=incremental,
     )
     click.echo("Created yml skeleton in %s" % target_yaml)
     if process:
@@ -288,18 +295,30 @@ def process_yaml(source_yaml, target_yaml=None, overwrite=False, raw_data_folder
     help="Default is `abort` to crash if there is a conflict, use `skip` to "
     "ignore and proceed",
 )
-def yaml_to_flexilims(source_yaml, raw_data_folder=None, conflicts=None):
+@click.option(
+    "-j",
+    "--journal",
+    default=None,
+    help="Journal file recording the entities created. Rerun with the same journal "
+    "to resume a failed upload",
+)
+def yaml_to_flexilims(source_yaml, raw_data_folder=None, conflicts=None, journal=None):
     """Create entries on flexilims corresponding to yaml"""
     from flexiznam import camp, errors
     import pathlib
 
     source_yaml = pathlib.Path(source_yaml)
     try:
-        camp.sync_data.upload_yaml(
-            source_yaml, raw_data_folder, conflicts=conflicts, verbose=False
+        progress = camp.sync_data.upload_yaml(
+            source_yaml,
+            raw_data_folder,
+            conflicts=conflicts,
+            verbose=False,
+            journal=journal,
         )
     except errors.SyncYmlError as err:
         raise click.ClickException(err.args[0])
+    click.echo(str(progress))
 
 
 @cli.command()
@@ -318,12 +337,15 @@ def check_flexilims_issues(
     appropriately.
     """
     from flexiznam.main import get_flexilims_session
+    from flexiznam.snapshot import ProjectSnapshot
     from flexiznam import utils
     import pandas as pd
 
     flexilims_session = get_flexilims_session(
         project_id=project_id, username=flexilims_username
     )
+    # download the project once instead of walking it one request at a time
+    flexilims_session = ProjectSnapshot(flexilims_session)
     ndf = utils.check_flexilims_names(
         flexilims_session, root_name=root_name, recursive=True
     )
@@ -346,3 +368,41 @@ def check_flexilims_issues(
     if add_path:
         print("Adding missing paths")
         utils.add_missing_paths(flexilims_session, root_name=root_name)
+
+
+@cli.command()
+@click.option("-p", "--project_id", prompt="Enter the project ID", help="Project ID.")
+@click.option(
+    "-t",
+    "--target_file",
+    default=None,
+    help="SQLite file of the mirror. Default to the `offline_mirror` config field, "
+    "or ~/.flexiznam/flexilims_mirror.db.",
+)
+@click.option("--flexilims_username", default=None, help="Your username on flexilims.")
+def mirror(project_id, target_file, flexilims_username):
+    """Create or update a local copy of a flexilims project
+
+    Only entities that changed since the last run are written. Set `offline_mirror`
+    in the config file to use the copy in offline mode.
+    """
+    from flexiznam.main import get_flexilims_session
+    from flexiznam.mirror import ProjectMirror, get_mirror_file
+
+    if target_file is None:
+        target_file = get_mirror_file()
+    flexilims_session = get_flexilims_session(
+        project_id=project_id, username=flexilims_username, offline_mode=False
+    )
+    project_mirror = ProjectMirror(target_file, project_id=project_id, create=True)
+    summary = project_mirror.sync(flexilims_session)
+    click.echo(
+        "Mirror %s updated: %d new, %d updated, %d deleted, %d unchanged"
+        % (
+            target_file,
+            summary["new"],
+            summary["updated"],
+            summary["deleted"],
+            summary["unchanged"],
+        )
+    )
@@ -1,10 +1,10 @@
 import os.path
 from pathlib import Path
 import sys
-import yaml
 import warnings
 from copy import deepcopy
 import flexiznam
+from flexiznam import yaml_io
 from flexiznam.errors import ConfigurationError
 from flexiznam.config.default_config import DEFAULT_CONFIG
 from getpass import getpass
@@ -71,8 +71,7 @@ def load_param(param_folder=None, config_file="config.yml", verbose=False):
         param_file = Path(param_folder) / config_file
     if verbose:
         print(f"Reading parameters from {param_file}")
-    with open(param_file, "r") as yml_file:
-        prm = yaml.safe_load(yml_file)
+    prm = yaml_io.load_yaml(param_file, cache=False)
     return prm
 
 
@@ -80,8 +79,7 @@ def get_password(app, username, password_file=None, allow_input=True):
     """Read the password yaml"""
     if password_file is None:
         password_file = _find_file("secret_password.yml")
-    with open(password_file, "r") as yml_file:
-        pwd = yaml.safe_load(yml_file) or {}
+    pwd = yaml_io.load_yaml(password_file, cache=False) or {}
     try:
         if app not in pwd:
             raise ConfigurationError("No password for %s" % app)
@@ -106,15 +104,14 @@ def add_password(app, username, password, password_file=None):
                 os.mkdir(home)
             password_file = home / "secret_password.yml"
     if os.path.isfile(password_file):
-        with open(password_file, "r") as yml_file:
-            pwd = yaml.safe_load(yml_file) or {}  # use empty dict if load returns None
+        # use empty dict if load returns None
+        pwd = yaml_io.load_yaml(password_file, cache=False) or {}
     else:
         pwd = {}
     # create or copy the app field
     pwd[app] = pwd.get(app, {})
     pwd[app][username] = password
-    with open(password_file, "w") as yml_file:
-        yaml.dump(pwd, yml_file)
+    yaml_io.dump_yaml(pwd, password_file)
     return password_file
 
 
@@ -202,8 +199,7 @@ def create_config(
         if isinstance(template, dict):
             cfg = template
         else:  # we don't have a preloaded config, must be path to a file
-            with open(template, "r") as tpl_file:
-                cfg = yaml.safe_load(tpl_file)
+            cfg = yaml_io.load_yaml(template, cache=False)
     else:
         cfg = deepcopy(DEFAULT_CONFIG)
     cfg = _recursive_update(cfg, kwargs, skip_checks=skip_checks)
@@ -218,8 +214,7 @@ def create_config(
     target_file = config_folder / config_file
     if (not overwrite) and os.path.isfile(target_file):
         raise IOError("Config file %s already exists." % target_file)
-    with open(target_file, "w") as cfg_yml:
-        yaml.dump(cfg, cfg_yml)
+    yaml_io.dump_yaml(cfg, target_file)
 
 
 def _recursive_update(source, new_values, skip_checks=False):
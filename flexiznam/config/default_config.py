@@ -47,6 +47,15 @@ DEFAULT_CONFIG = dict(
     microscopy_extensions=[".czi", ".png", ".gif", ".tif", ".tiff"],
     # list of extensions accepted as `SequencingData`
     sequencing_extensions=[".fastq.gz", ".fastq", ".fq.gz", ".fq", ".bam", ".sam"],
+    # sqlite file caching the headers of scanimage tifs, on a local disk. True to use
+    # `~/.flexiznam/scanimage_headers.db`. None or False to disable
+    scanimage_header_cache=None,
+    # cache yaml files loaded by flexiznam as `<file>.cache.json`
+    yaml_cache=False,
+    # sqlite mirror of flexilims used in offline mode (see `flexiznam mirror`), on a
+    # local disk. True to use `~/.flexiznam/flexilims_mirror.db`. If None, offline
+    # mode uses `offline_yaml`
+    offline_mirror=None,
     conda_envs=dict(
         dlc="dlc_nogui",
         cottage_analysis="cottage_analysis",
@@ -1,7 +1,7 @@
 import os
 import tkinter as tk
 from ttkwidgets import CheckboxTreeview
-import yaml
+from flexiznam import yaml_io
 from pathlib import Path
 import flexiznam as flz
 import flexiznam.camp.sync_data
@@ -227,7 +227,7 @@ class FlexiGui(tk.Tk):
         self.selected_item.set(name)
         display = {k: v for k, v in data.items() if k not in self.FLEXILIMS_ONLY_FIELDS}
         self.textview.delete(1.0, tk.END)
-        self.textview.insert(tk.END, yaml.dump(display))
+        self.textview.insert(tk.END, yaml_io.dump(display))
 
     def on_textview_change(self, event):
         return
@@ -243,8 +243,7 @@ class FlexiGui(tk.Tk):
         if not filename:
             return
         self.report(f"Loading YAML file {filename}...")
-        with open(filename, "r") as f:
-            self.data = yaml.safe_load(f)
+        self.data = yaml_io.load_yaml(filename)
         self.update_data()
         self.report("Done")
 
@@ -319,8 +318,7 @@ class FlexiGui(tk.Tk):
         data = dict(self.data)
         data["project"] = self.project.get()
         data["root_folder"] = self.root_folder.get()
-        with open(target, "w") as f:
-            yaml.dump(data, f)
+        yaml_io.dump_yaml(data, target)
         self.report('Wrote YAML file "{}"'.format(target))
 
     def upload(self):
@@ -376,7 +374,7 @@ class FlexiGui(tk.Tk):
         name, original_data = self._entity_by_itemid[item]
         self.report(f"Updating item {name}")
         assert name == self.selected_item.get(), "Selected item does not match"
-        data = yaml.safe_load(text)
+        data = yaml_io.safe_load(text)
         for field in self.FLEXILIMS_ONLY_FIELDS:
             if field in original_data:
                 data[field] = original_data[field]
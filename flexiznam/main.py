@@ -1,20 +1,36 @@
+import copy
 import datetime
 import re
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 import portalocker
 import warnings
+import numpy as np
 import pandas as pd
 import flexilims as flm
 from pathlib import Path
 from flexilims.utils import SPECIAL_CHARACTERS
 import flexiznam
-import yaml
 from flexiznam import mcms
+from flexiznam import cache
+from flexiznam import yaml_io
+from flexiznam.mirror import ProjectMirror, get_mirror_file
 from flexiznam.config import PARAMETERS, get_password
 from flexiznam.errors import NameNotUniqueError, FlexilimsError, ConfigurationError
 
 
 warnings.simplefilter("always", DeprecationWarning)
 
+# tokens older than TOKEN_MAX_AGE - TOKEN_REFRESH_MARGIN seconds are replaced
+TOKEN_MAX_AGE = 12 * 3600
+TOKEN_REFRESH_MARGIN = 10 * 60
+
+# sessions of `get_shared_session`, (project_id, username, offline) to
+# (session, creation time of the token)
+_SESSION_REGISTRY = dict()
+_SESSION_REGISTRY_LOCK = threading.RLock()
+
 
 def _format_project(project_id, prm):
     if project_id in prm["project_ids"]:
@@ -77,6 +93,7 @@ def get_flexilims_session(
     reuse_token=True,
     timeout=10,
     offline_mode=None,
+    use_cache=False,
 ):
     """Open a new flexilims session by creating a new authentication token.
 
@@ -91,9 +108,15 @@ def get_flexilims_session(
         timeout (int): (optional) timeout in seconds for the portalocker lock. Default
                 to 10.
         offline_mode (bool): (optional) if True, will use an offline session. In this
-            case, the `offline_yaml` parameter must be set in the config file. If
+            case, the `offline_mirror` or `offline_yaml` parameter must be set in the
+            config file. If `offline_mirror` is set, the session is a
+            :py:class:`flexiznam.mirror.ProjectMirror` reading that file, which
+            must exist (see `flexiznam mirror`). If
             not provided, will look for the `offline_mode` parameter in the config
             file. Default to None.
+        use_cache (bool): (optional) if True, attach a
+            :py:class:`flexiznam.cache.EntityCache` to the session to avoid
+            repeating identical queries. Default to False.
 
 
     Returns:
@@ -108,6 +131,17 @@ def get_flexilims_session(
     if offline_mode is None:
         offline_mode = PARAMETERS.get("offline_mode", False)
 
+    if offline_mode and (PARAMETERS.get("offline_mirror", None) not in (None, False)):
+        if project_id is None:
+            raise ConfigurationError("project_id is required to use offline_mirror")
+        mirror_file = get_mirror_file()
+        if not mirror_file.exists():
+            raise ConfigurationError(f"offline_mirror file {mirror_file} not found")
+        flexilims_session = ProjectMirror(mirror_file, project_id=project_id)
+        if use_cache:
+            cache.enable_cache(flexilims_session)
+        return flexilims_session
+
     if offline_mode:
         yaml_file = PARAMETERS.get("offline_yaml", None)
         if yaml_file is None:
@@ -118,6 +152,8 @@ def get_flexilims_session(
         if not yaml_file.exists():
             raise ConfigurationError(f"offline_yaml file {yaml_file} not found")
         flexilims_session = flm.OfflineFlexilims(yaml_file, project_id=project_id)
+        if use_cache:
+            cache.enable_cache(flexilims_session)
         return flexilims_session
 
     if username is None:
@@ -126,30 +162,125 @@ def get_flexilims_session(
         password = get_password("flexilims", username)
 
     if reuse_token:
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        tocken_file = flexiznam.config.config_tools._find_file(
-            "flexilims_token.yml", create_if_missing=True
+        session, _ = _authenticate(
+            username, password, project_id=project_id, timeout=timeout
         )
-        with portalocker.Lock(tocken_file, "r+", timeout=timeout) as file_handle:
-            tokinfo = yaml.safe_load(file_handle) or {}
-            token = tokinfo.get("token", None)
-            date = tokinfo.get("date", None)
-            if date != today:
-                token = None
-            else:
-                token = dict(Authorization=f"Bearer {token}")
-            session = flm.Flexilims(
-                username, password, project_id=project_id, token=token
-            )
-            if token is None:
-                # we need to update the token
-                token = session.session.headers["Authorization"].split(" ")[-1]
-                yaml.dump(dict(token=token, date=today), file_handle)
     else:
         session = flm.Flexilims(username, password, project_id=project_id, token=None)
+    if use_cache:
+        cache.enable_cache(session)
     return session
 
 
+def _token_is_fresh(created):
+    """Is a token created at `created` (seconds since epoch) far from expiry?"""
+    if created is None:
+        return False
+    return time.time() - created < TOKEN_MAX_AGE - TOKEN_REFRESH_MARGIN
+
+
+def _authenticate(username, password, project_id=None, session=None, timeout=10):
+    """Get a token, reused from the token file if it is still fresh
+
+    A new token is written to the token file for other sessions and processes.
+
+    Args:
+        username (str): flexilims username
+        password (str): flexilims password
+        project_id (str): hexadecimal id of the project of a new session
+        session (:py:class:`flexilims.Flexilims`): session to authenticate. Its
+            token is replaced in place. If None, create a new session
+        timeout (int): timeout in seconds for the lock of the token file
+
+    Returns:
+        (:py:class:`flexilims.Flexilims`, float): the session and the creation time
+            of its token, in seconds since epoch
+    """
+    token_file = flexiznam.config.config_tools._find_file(
+        "flexilims_token.yml", create_if_missing=True
+    )
+    with portalocker.Lock(token_file, "r+", timeout=timeout) as file_handle:
+        tokinfo = yaml_io.safe_load(file_handle) or {}
+        token = tokinfo.get("token", None)
+        created = tokinfo.get("created", None)
+        if (token is not None) and _token_is_fresh(created):
+            header = dict(Authorization=f"Bearer {token}")
+            if session is None:
+                session = flm.Flexilims(
+                    username, password, project_id=project_id, token=header
+                )
+            else:
+                session.session.headers.update(header)
+            return session, created
+        # we need a new token
+        if session is None:
+            session = flm.Flexilims(
+                username, password, project_id=project_id, token=None
+            )
+        else:
+            session.session.headers.update(session.get_token(username, password))
+        created = time.time()
+        token = session.session.headers["Authorization"].split(" ")[-1]
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        file_handle.seek(0)
+        file_handle.truncate()
+        yaml_io.dump(dict(token=token, date=today, created=created), file_handle)
+    return session, created
+
+
+def get_shared_session(project_id=None, username=None, password=None):
+    """Get a flexilims session shared by the whole process
+
+    Functions called without `flexilims_session` use this instead of
+    :py:func:`get_flexilims_session`. There is one session per project and user,
+    created on first use and then reused, with its open HTTP connections. The token
+    file is read only when the session is created or when its token gets older than
+    `TOKEN_MAX_AGE - TOKEN_REFRESH_MARGIN` seconds. The token of the existing session
+    object is then replaced in memory, before it expires, so references to the
+    session remain valid.
+
+    Args:
+        project_id (str): name or hexadecimal id of the project
+        username (str): (optional) flexilims username. Default to the config file.
+        password (str): (optional) flexilims password, used to create the session
+            and refresh its token. Default to the secrets file.
+
+    Returns:
+        :py:class:`flexilims.Flexilims`: the shared session (or offline session in
+            offline mode)
+    """
+    if project_id is not None:
+        project_id = _format_project(project_id, PARAMETERS)
+    if username is None:
+        username = PARAMETERS.get("flexilims_username", None)
+    offline_mode = bool(PARAMETERS.get("offline_mode", False))
+    key = (project_id, username, offline_mode)
+    with _SESSION_REGISTRY_LOCK:
+        if key in _SESSION_REGISTRY:
+            session, created = _SESSION_REGISTRY[key]
+            if offline_mode or _token_is_fresh(created):
+                return session
+            # the token will expire soon, put a new one in the existing session
+            if password is None:
+                password = get_password("flexilims", username)
+            session, created = _authenticate(username, password, session=session)
+        elif offline_mode:
+            session = get_flexilims_session(project_id=project_id, offline_mode=True)
+            created = None
+        else:
+            if password is None:
+                password = get_password("flexilims", username)
+            session, created = _authenticate(username, password, project_id=project_id)
+        _SESSION_REGISTRY[key] = (session, created)
+        return session
+
+
+def clear_shared_sessions():
+    """Forget all the sessions created by :py:func:`get_shared_session`"""
+    with _SESSION_REGISTRY_LOCK:
+        _SESSION_REGISTRY.clear()
+
+
 def add_mouse(
     mouse_name,
     project_id=None,
@@ -194,7 +325,7 @@ def add_mouse(
     """
 
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(
+        flexilims_session = get_shared_session(
             project_id, flexilims_username, flexilims_password
         )
 
@@ -269,9 +400,17 @@ def add_mouse(
             attributes=mouse_info,
             strict_validation=False,
         )
+        cache.invalidate(flexilims_session, "mouse")
     return resp
 
 
+def _with_status(status, reply, return_status):
+    """Reply of the `add_*` functions, with what was done if `return_status`"""
+    if return_status:
+        return status, reply
+    return reply
+
+
 def add_experimental_session(
     date,
     flexilims_session,
@@ -281,6 +420,7 @@ def add_experimental_session(
     session_name=None,
     other_relations=None,
     conflicts="abort",
+    return_status=False,
 ):
     """Add a new session as a child entity of a mouse
 
@@ -299,10 +439,12 @@ def add_experimental_session(
                         `skip`, `abort`, `update` or `overwrite` (see update_entity for
                         detailed description)
         other_relations (list, optional): ID(s) of custom entities related to the session
+        return_status (bool, optional): also return what was done. Default False
 
 
     Returns:
-        flexilims reply
+        flexilims reply, or (status, reply) if `return_status` is True. `status` is
+            `created`, `updated` or `skipped`
 
     """
 
@@ -355,7 +497,7 @@ def add_experimental_session(
     if online_session is not None:
         if conflicts.lower() == "skip":
             print("A session named %s already exists" % session_full_name)
-            return online_session
+            return _with_status("skipped", online_session, return_status)
         elif conflicts.lower() == "abort":
             raise FlexilimsError(
                 "A session named %s already exists" % session_full_name
@@ -371,7 +513,7 @@ def add_experimental_session(
                 other_relations=None,
                 flexilims_session=flexilims_session,
             )
-            return resp
+            return _with_status("updated", resp, return_status)
 
     resp = flexilims_session.post(
         datatype="session",
@@ -381,7 +523,8 @@ def add_experimental_session(
         other_relations=other_relations,
         strict_validation=False,
     )
-    return resp
+    cache.invalidate(flexilims_session, "session")
+    return _with_status("created", resp, return_status)
 
 
 def add_recording(
@@ -394,6 +537,7 @@ def add_recording(
     other_relations=None,
     flexilims_session=None,
     project_id=None,
+    return_status=False,
 ):
     """Add a recording as a child of an experimental session
 
@@ -408,14 +552,16 @@ def add_recording(
         other_relations: ID(s) of custom entities related to the session
         flexilims_session (:py:class:`flexilims.Flexilims`): flexilims session
         project_id (str): name of the project or hexadecimal project id (needed if session is not provided)
+        return_status (bool): also return what was done. Default False
 
     Returns:
-        flexilims reply
+        flexilims reply, or (status, reply) if `return_status` is True. `status` is
+            `created`, `updated` or `skipped`
 
     """
 
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     if conflicts.lower() not in ("skip", "abort", "overwrite", "update"):
         raise AttributeError(
@@ -459,7 +605,7 @@ def add_recording(
     if online_recording is not None:
         if conflicts.lower() == "skip":
             print("A recording named %s already exists" % (rec_full_name))
-            return online_recording
+            return _with_status("skipped", online_recording, return_status)
         elif conflicts.lower() == "abort":
             raise FlexilimsError("A recording named %s already exists" % rec_full_name)
         else:
@@ -473,7 +619,7 @@ def add_recording(
                 other_relations=None,
                 flexilims_session=flexilims_session,
             )
-            return resp
+            return _with_status("updated", resp, return_status)
 
     resp = flexilims_session.post(
         datatype="recording",
@@ -483,7 +629,8 @@ def add_recording(
         other_relations=other_relations,
         strict_validation=False,
     )
-    return resp
+    cache.invalidate(flexilims_session, "recording")
+    return _with_status("created", resp, return_status)
 
 
 def add_entity(
@@ -513,7 +660,7 @@ def add_entity(
     """
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     try:
         rep = flexilims_session.post(
@@ -528,6 +675,7 @@ def add_entity(
         if "already exist in the project " in err.args[0]:
             raise NameNotUniqueError(err.args[0])
         raise FlexilimsError(err.args[0])
+    cache.invalidate(flexilims_session, datatype)
     return rep
 
 
@@ -539,6 +687,7 @@ def add_sample(
     other_relations=None,
     flexilims_session=None,
     project_id=None,
+    return_status=False,
 ):
     """Add a sample as a child of a mouse or another sample
 
@@ -555,13 +704,15 @@ def add_sample(
         flexilims_session (:py:class:`flexilims.Flexilims`): flexilims session.
         project_id (str): name of the project or hexadecimal project id
             (required if session is not provided).
+        return_status (bool): also return what was done. Default False.
 
     Returns:
-        flexilims reply
+        flexilims reply, or (status, reply) if `return_status` is True. `status` is
+            `created`, `updated` or `skipped`
 
     """
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     if conflicts.lower() not in ("skip", "abort", "update", "overwrite"):
         raise AttributeError("conflicts must be `skip` or `abort`")
@@ -576,6 +727,7 @@ def add_sample(
             "sample",
             "_".join(genealogy + ["sample_0"]),
             flexilims_session=flexilims_session,
+            origin_id=parent_id,
         )
         sample_name = sample_full_name[len(parent_df["name"]) + 1 :]
 
@@ -602,7 +754,7 @@ def add_sample(
     if online_sample is not None:
         if conflicts.lower() == "skip":
             print("A sample named %s already exists" % (sample_full_name))
-            return online_sample
+            return _with_status("skipped", online_sample, return_status)
         elif conflicts.lower() == "abort":
             raise FlexilimsError("A sample named %s already exists" % sample_full_name)
         else:
@@ -616,7 +768,7 @@ def add_sample(
                 other_relations=None,
                 flexilims_session=flexilims_session,
             )
-            return resp
+            return _with_status("updated", resp, return_status)
 
     resp = flexilims_session.post(
         datatype="sample",
@@ -626,7 +778,8 @@ def add_sample(
         other_relations=other_relations,
         strict_validation=False,
     )
-    return resp
+    cache.invalidate(flexilims_session, "sample")
+    return _with_status("created", resp, return_status)
 
 
 def add_dataset(
@@ -641,6 +794,7 @@ def add_dataset(
     attributes=None,
     strict_validation=False,
     conflicts="append",
+    return_status=False,
 ):
     """Add a dataset as a child of a recording, session, or sample
 
@@ -663,13 +817,15 @@ def add_dataset(
                          increment name and create a new dataset. `overwrite` will
                          set all existing attributes to None before updating, `update`
                          will update without clearing pre-existing attributes
+        return_status (bool): also return what was done. Default False
 
     Returns:
-        the flexilims response
+        the flexilims response, or (status, response) if `return_status` is True.
+            `status` is `created`, `updated` or `skipped`
 
     """
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
     valid_conflicts = ("abort", "skip", "append", "overwrite", "update")
     if conflicts.lower() not in valid_conflicts:
         raise AttributeError("`conflicts` must be in [%s]" % ", ".join(valid_conflicts))
@@ -695,7 +851,10 @@ def add_dataset(
 
     if conflicts.lower() == "append":
         dataset_name = generate_name(
-            "dataset", dataset_name, flexilims_session=flexilims_session
+            "dataset",
+            dataset_name,
+            flexilims_session=flexilims_session,
+            origin_id=parent_id,
         )
         dataset_info["genealogy"].append(dataset_name)
         dataset_full_name = "_".join(dataset_info["genealogy"])
@@ -712,7 +871,7 @@ def add_dataset(
                 )
             elif conflicts.lower() == "skip":
                 print("A dataset named %s already exists" % dataset_full_name)
-                return online_version
+                return _with_status("skipped", online_version, return_status)
             else:
                 resp = update_entity(
                     datatype="dataset",
@@ -723,7 +882,7 @@ def add_dataset(
                     attributes=dataset_info,
                     flexilims_session=flexilims_session,
                 )
-                return resp
+                return _with_status("updated", resp, return_status)
 
     resp = flexilims_session.post(
         datatype="dataset",
@@ -732,7 +891,186 @@ def add_dataset(
         attributes=dataset_info,
         strict_validation=strict_validation,
     )
-    return resp
+    cache.invalidate(flexilims_session, "dataset")
+    return _with_status("created", resp, return_status)
+
+
+def add_entities_bulk(
+    records,
+    conflicts="abort",
+    flexilims_session=None,
+    project_id=None,
+    max_workers=8,
+    snapshot=None,
+):
+    """Create many entities with one download of the project and concurrent posts
+
+    Each record is a dictionary with the keys:
+
+    - `datatype` (str): flexilims type
+    - `name` (str): full name of the entity
+    - `attributes` (dict, optional): attributes of the entity
+    - `origin_id` (str, optional): hexadecimal id of an existing parent, or
+    - `origin_name` (str, optional): name of the parent. The parent can be an existing
+      entity or another record of the same call.
+    - `other_relations` (optional): ID(s) of custom entities related to the entity
+
+    Parents and conflicts are resolved from a :py:class:`flexiznam.ProjectSnapshot`
+    downloaded once. Records are then posted one depth at a time, using a thread
+    pool for all the records of a depth. A failure is reported for the record (and
+    its children) without stopping the others.
+
+    Args:
+        records (list): list of dictionaries describing the entities
+        conflicts (str): `abort`, `skip`, `append`, `overwrite` or `update`. What to
+            do if an entity with the same name and datatype already exists. `abort`
+            raises an error before posting anything, `skip` keeps the online version,
+            `append` increments the suffix of the name (and of the last element of
+            `genealogy`), `overwrite` and `update` update the online entity like
+            :py:func:`update_entity`.
+        flexilims_session (:py:class:`flexilims.Flexilims`): flexilims session
+        project_id (str): name or hexadecimal id of the project, required if
+            session is not provided
+        max_workers (int): maximum number of concurrent requests
+        snapshot (:py:class:`flexiznam.ProjectSnapshot`): snapshot of the project to
+            use instead of downloading a new one. It will be updated with the new
+            entities.
+
+    Returns:
+        :py:class:`pandas.DataFrame`: one row per record with `name` (the name
+            actually used), `datatype`, `status` (`created`, `updated`, `skipped` or
+            `failed`), `id` and `error`
+    """
+    valid_conflicts = ("abort", "skip", "append", "overwrite", "update")
+    if conflicts.lower() not in valid_conflicts:
+        raise AttributeError("`conflicts` must be in [%s]" % ", ".join(valid_conflicts))
+    conflicts = conflicts.lower()
+    records = list(records)
+    if flexilims_session is None:
+        flexilims_session = get_shared_session(project_id)
+    if snapshot is None:
+        if isinstance(flexilims_session, flexiznam.ProjectSnapshot):
+            snapshot = flexilims_session
+        else:
+            snapshot = flexiznam.ProjectSnapshot(flexilims_session)
+
+    report = [
+        dict(
+            name=r["name"],
+            datatype=r["datatype"],
+            status=None,
+            id=None,
+            error=None,
+        )
+        for r in records
+    ]
+    batch_index = {r["name"]: i for i, r in enumerate(records)}
+    if len(batch_index) != len(records):
+        raise NameNotUniqueError("Records must have unique names")
+
+    # find the depth of each record in the batch and check conflicts
+    depths = [None] * len(records)
+
+    def get_depth(index, visiting=()):
+        if depths[index] is None:
+            parent = records[index].get("origin_name", None)
+            if parent in visiting:
+                raise FlexilimsError("Circular parents for %s" % parent)
+            if parent in batch_index:
+                parent_depth = get_depth(batch_index[parent], visiting + (parent,))
+                depths[index] = parent_depth + 1
+            else:
+                depths[index] = 0
+        return depths[index]
+
+    online = [None] * len(records)
+    for index, record in enumerate(records):
+        get_depth(index)
+        for entity_id in snapshot.by_name.get(record["name"], []):
+            if snapshot.by_id[entity_id]["type"] == record["datatype"]:
+                online[index] = snapshot.by_id[entity_id]
+    if conflicts == "abort":
+        existing = [r["name"] for r, o in zip(records, online) if o is not None]
+        if existing:
+            raise FlexilimsError("Entities already exist: %s" % ", ".join(existing))
+
+    # names reserved for appended records, with the names already used
+    taken = set(snapshot.by_name) | set(batch_index)
+
+    def process(index):
+        record = records[index]
+        datatype = record["datatype"]
+        attributes = dict(record.get("attributes", None) or {})
+        origin_id = record.get("origin_id", None)
+        origin_name = record.get("origin_name", None)
+        if origin_name in batch_index:
+            parent_report = report[batch_index[origin_name]]
+            if parent_report["status"] == "failed":
+                raise FlexilimsError("Parent `%s` failed" % origin_name)
+            origin_id = parent_report["id"]
+        elif origin_name is not None:
+            parents = snapshot.by_name.get(origin_name, [])
+            if len(parents) != 1:
+                raise FlexilimsError("Cannot find a unique parent `%s`" % origin_name)
+            origin_id = parents[0]
+
+        entity = online[index]
+        if (entity is not None) and (conflicts == "skip"):
+            return "skipped", entity["id"]
+        if (entity is not None) and (conflicts in ("overwrite", "update")):
+            full_attributes = _merge_attributes(entity, attributes, conflicts)
+            rep = snapshot.update_one(
+                id=entity["id"],
+                datatype=datatype,
+                origin_id=origin_id,
+                name=None,
+                attributes=full_attributes,
+                strict_validation=False,
+            )
+            return "updated", rep["id"]
+        rep = add_entity(
+            datatype=datatype,
+            name=report[index]["name"],
+            origin_id=origin_id,
+            attributes=attributes,
+            other_relations=record.get("other_relations", None),
+            flexilims_session=snapshot,
+        )
+        return "created", rep["id"]
+
+    # rename appended records before posting anything
+    if conflicts == "append":
+        for index, record in enumerate(records):
+            if online[index] is None:
+                continue
+            new_name = generate_names(
+                record["datatype"], record["name"], n_names=1, taken=taken
+            )[0]
+            report[index]["name"] = new_name
+            online[index] = None
+            genealogy = (record.get("attributes", None) or {}).get("genealogy", None)
+            if genealogy:
+                prefix = "_".join(genealogy[:-1])
+                short_name = new_name[len(prefix) + 1 :] if prefix else new_name
+                attributes = dict(record["attributes"])
+                attributes["genealogy"] = list(genealogy[:-1]) + [short_name]
+                records[index] = dict(record, attributes=attributes)
+
+    n_depths = max(depths) + 1 if records else 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for depth in range(n_depths):
+            indices = [i for i, d in enumerate(depths) if d == depth]
+            futures = [executor.submit(process, i) for i in indices]
+            for index, future in zip(indices, futures):
+                try:
+                    status, entity_id = future.result()
+                except Exception as err:
+                    status, entity_id = "failed", None
+                    report[index]["error"] = "%s: %s" % (type(err).__name__, err)
+                report[index]["status"] = status
+                report[index]["id"] = entity_id
+    cache.invalidate(flexilims_session)
+    return pd.DataFrame(report, columns=["name", "datatype", "status", "id", "error"])
 
 
 def update_entity(
@@ -775,7 +1113,7 @@ def update_entity(
     assert (name is not None) or (id is not None)
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
     entity = get_entity(
         datatype=datatype,
         name=name,
@@ -786,6 +1124,36 @@ def update_entity(
     if entity is None:
         err_msg = "Cannot find an entity of type `%s` named `%s`" % (datatype, name)
         raise FlexilimsError(err_msg)
+    full_attributes = _merge_attributes(entity, attributes, mode)
+    if id is None:
+        id = entity["id"]
+    rep = flexilims_session.update_one(
+        id=id,
+        datatype=datatype,
+        origin_id=origin_id,
+        name=None,
+        attributes=full_attributes,
+        strict_validation=False,
+    )
+    cache.invalidate(flexilims_session, datatype)
+    return rep
+
+
+def _merge_attributes(entity, attributes, mode):
+    """Attributes to send to flexilims to update an entity
+
+    Args:
+        entity (dict): raw flexilims entity, as downloaded
+        attributes (dict): attributes to update
+        mode (str): `overwrite` to set the attributes of `entity` that are not in
+            `attributes` to None, or `update` to keep them
+
+    Returns:
+        dict: the attributes to post
+
+    Raises:
+        FlexilimsError: if an attribute is a flexilims reserved keyword
+    """
     if mode.lower() == "overwrite":
         full_attributes = {k: None for k in entity["attributes"].keys()}
         full_attributes.update(attributes)
@@ -793,22 +1161,12 @@ def update_entity(
         full_attributes = attributes.copy()
     else:
         raise AttributeError("`mode` must be `overwrite` or `update`")
-    if id is None:
-        id = entity["id"]
     for attr in full_attributes:
         if attr in entity:
             raise FlexilimsError(
                 "Attribute `%s` is a flexilims reserved keyword" % attr
             )
-    rep = flexilims_session.update_one(
-        id=id,
-        datatype=datatype,
-        origin_id=origin_id,
-        name=None,
-        attributes=full_attributes,
-        strict_validation=False,
-    )
-    return rep
+    return full_attributes
 
 
 def get_entities(
@@ -821,6 +1179,7 @@ def get_entities(
     origin_id=None,
     id=None,
     format_reply=True,
+    columns=None,
 ):
     """
     Get entities of a given type and format results.
@@ -844,6 +1203,8 @@ def get_entities(
         format_reply (bool): (default True) whether to format the reply into a
             `Dataframe`. If this is set to false, a list of dictionaries will be
             returned instead.
+        columns (list): fields to include in the formatted reply, see
+            :py:func:`format_results`. Default None, include everything.
 
     Returns:
         :py:class:`pandas.DataFrame`: containing all matching entities
@@ -851,19 +1212,35 @@ def get_entities(
     """
     # assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
-    results = flexilims_session.get(
-        datatype,
-        query_key=query_key,
-        query_value=query_value,
-        name=name,
-        origin_id=origin_id,
-        id=id,
-    )
+        flexilims_session = get_shared_session(project_id)
+    entity_cache = cache.get_cache(flexilims_session)
+    results = None
+    if entity_cache is not None:
+        key = (
+            datatype,
+            flexilims_session.project_id,
+            query_key,
+            query_value,
+            name,
+            origin_id,
+            id,
+        )
+        results = entity_cache.get(key)
+    if results is None:
+        results = flexilims_session.get(
+            datatype,
+            query_key=query_key,
+            query_value=query_value,
+            name=name,
+            origin_id=origin_id,
+            id=id,
+        )
+        if entity_cache is not None:
+            entity_cache.set(key, results)
     if not format_reply:
         return results
-    results = format_results(results)
-    if len(results):
+    results = format_results(results, columns=columns)
+    if len(results) and ("name" in results.columns):
         results.set_index("name", drop=False, inplace=True)
     return results
 
@@ -890,8 +1267,8 @@ def get_entity(
     For best performance, provide the `id` of the entity and/or the `datatype`.
     Args:
         datatype (str): type of Flexylims entity to fetch, e.g. 'mouse', 'session',
-            'recording', or 'dataset'. If None, will iterate on all datatype until the
-            entity is found.
+            'recording', or 'dataset'. If None, all datatypes are queried in parallel
+            and the first match is returned.
         query_key (str): attribute to filter by.
         query_value (str): attribute value to select
         project_id (str): text name of the project. Either `project_id` or
@@ -914,23 +1291,18 @@ def get_entity(
 
     if (datatype is None) and (name is None):
         # datatype is not specify, try everything
-        args = [
-            datatype,
-            query_key,
-            query_value,
-            project_id,
-            flexilims_session,
-            name,
-            origin_id,
-            id,
-            format_reply,
-        ]
-        for dt in ("mouse", "session", "sample", "recording", "dataset"):
-            args[0] = dt
-            entity = get_entity(*args)
-            if entity is not None:
-                return entity
-        return None
+        if flexilims_session is None:
+            flexilims_session = get_shared_session(project_id)
+        _, entity = _find_datatype(
+            ("mouse", "session", "sample", "recording", "dataset"),
+            flexilims_session=flexilims_session,
+            query_key=query_key,
+            query_value=query_value,
+            origin_id=origin_id,
+            id=id,
+            format_reply=format_reply,
+        )
+        return entity
 
     entity = get_entities(
         datatype=datatype,
@@ -954,10 +1326,14 @@ def get_entity(
 
 def get_datatype(name=None, id=None, project_id=None, flexilims_session=None):
     """
-    Loop through possible datatypes and return the first with a matching name.
+    Find the datatype of an entity from its name or id.
+
+    If `name` is provided, a single request is made, otherwise all datatypes are
+    queried in parallel.
 
     .. warning::
-      If there are multiple matches, will return only the first one found!
+      If there are multiple matches, will return only the first one found, in the
+      order of PARAMETERS["datatypes"]!
 
     Args:
         name (str): (optional, if `id` is provided) name of the entity
@@ -974,21 +1350,71 @@ def get_datatype(name=None, id=None, project_id=None, flexilims_session=None):
     assert (project_id is not None) or (flexilims_session is not None)
     assert (name is not None) or (id is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
-    for datatype in PARAMETERS["datatypes"]:
-        resp = get_entity(
-            datatype=datatype, name=name, id=id, flexilims_session=flexilims_session
+        flexilims_session = get_shared_session(project_id)
+    if name is None:
+        datatype, _ = _find_datatype(
+            PARAMETERS["datatypes"],
+            flexilims_session=flexilims_session,
+            id=id,
+            format_reply=False,
         )
-        if resp:
+        return datatype
+
+    # datatype can be omitted when querying by name, find all types in one go
+    entities = get_entities(
+        datatype=None,
+        name=name,
+        id=id,
+        flexilims_session=flexilims_session,
+        format_reply=False,
+    )
+    for datatype in PARAMETERS["datatypes"]:
+        matches = [e for e in entities if e["type"] == datatype]
+        if len(matches) > 1:
+            raise NameNotUniqueError("Found %d entities, not 1" % len(matches))
+        if len(matches) == 1:
             return datatype
     return None
 
 
+def _find_datatype(datatypes, flexilims_session, **kwargs):
+    """Query several datatypes in parallel and return the first match
+
+    Results are considered in the order of `datatypes`, so the output, including
+    :py:class:`flexiznam.errors.NameNotUniqueError`, is the same as calling
+    `get_entity` on each datatype in turn.
+
+    Args:
+        datatypes (list): datatypes to query, by order of priority
+        flexilims_session (:py:class:`flexilims.Flexilims`): Flexylims session object
+        **kwargs: other arguments for :py:func:`get_entity`
+
+    Returns:
+        tuple: (datatype, entity) of the first match or (None, None)
+    """
+    datatypes = list(datatypes)
+    with ThreadPoolExecutor(max_workers=len(datatypes)) as executor:
+        futures = [
+            executor.submit(
+                get_entity,
+                datatype=datatype,
+                flexilims_session=flexilims_session,
+                **kwargs,
+            )
+            for datatype in datatypes
+        ]
+        for datatype, future in zip(datatypes, futures):
+            entity = future.result()
+            if entity is not None:
+                return datatype, entity
+    return None, None
+
+
 def get_id(name, datatype=None, project_id=None, flexilims_session=None):
     """Get database ID for entity by name"""
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     entity = get_entity(
         datatype=datatype, flexilims_session=flexilims_session, name=name
@@ -1015,7 +1441,7 @@ def get_path(name, datatype="dataset", project_id=None, flexilims_session=None):
     """
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     entity = get_entity(
         datatype=datatype, flexilims_session=flexilims_session, name=name
@@ -1027,7 +1453,7 @@ def get_experimental_sessions(project_id=None, flexilims_session=None, mouse=Non
     """Get all sessions from a given mouse"""
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
 
     expts = format_results(flexilims_session.get(datatype="session"))
 
@@ -1045,6 +1471,7 @@ def get_children(
     project_id=None,
     flexilims_session=None,
     filter=None,
+    columns=None,
 ):
     """
     Get all entries belonging to a particular parent entity
@@ -1057,6 +1484,8 @@ def get_children(
         project_id (str): text name of the project
         flexilims_session (:py:class:`flexilims.Flexilims`): Flexylims session object
         filter (dict, None): filter to apply to the extra_attributes of the children
+        columns (list, None): fields to return, see :py:func:`format_results`. Default
+            None, return everything.
 
     Returns:
         DataFrame: containing all the relevant child entitites
@@ -1064,23 +1493,32 @@ def get_children(
     """
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
     if parent_id is None:
         assert parent_name is not None, "Must provide either parent_id or parent_name"
         parent_id = get_id(parent_name, flexilims_session=flexilims_session)
-    results = format_results(
-        flexilims_session.get_children(parent_id), return_list=True
-    )
+    entity_cache = cache.get_cache(flexilims_session)
+    results = None
+    if entity_cache is not None:
+        key = (cache.CHILDREN, flexilims_session.project_id, parent_id)
+        results = entity_cache.get(key)
+    if results is None:
+        results = flexilims_session.get_children(parent_id)
+        if entity_cache is not None:
+            entity_cache.set(key, results)
     if not len(results):
         return pd.DataFrame(results)
+    # filter the raw replies to format only what we return
     if children_datatype is not None:
         results = [r for r in results if r["type"] == children_datatype]
     if filter is not None:
         for key, value in filter.items():
-            results = [r for r in results if r.get(key, None) == value]
+            results = [r for r in results if _get_flat_value(r, key) == value]
 
-    results = pd.DataFrame(results)
-    if len(results):
+    if not len(results):
+        return pd.DataFrame(results)
+    results = format_results(results, columns=columns)
+    if "name" in results.columns:
         results.set_index("name", drop=False, inplace=True)
     return results
 
@@ -1098,12 +1536,12 @@ def get_child_dataset(flz_session, parent_name, dataset_type):
         Dataset: the last dataset of the given type for the given parent entity
 
     """
-    all_children = get_children(
+    selected_datasets = get_children(
         parent_name=parent_name,
         children_datatype="dataset",
         flexilims_session=flz_session,
+        filter=dict(dataset_type=dataset_type),
     )
-    selected_datasets = all_children[all_children["dataset_type"] == dataset_type]
     if len(selected_datasets) == 0:
         raise ValueError(f"No {dataset_type} dataset found for session {parent_name}")
     elif len(selected_datasets) > 1:
@@ -1127,6 +1565,7 @@ def get_datasets_recursively(
     return_paths=False,
     project_id=None,
     flexilims_session=None,
+    max_workers=None,
     _output=None,
 ):
     """Get datasets recursively from a parent entity
@@ -1150,6 +1589,10 @@ def get_datasets_recursively(
         project_id (str): text name of the project. Not required if
             `flexilims_session` is provided.
         flexilims_session (:py:class:`flexilims.Flexilims`): Flexylims session object
+        max_workers (int): if not None, query the children of all entities of a
+            level at once using a pool of `max_workers` threads sharing the session.
+            At most `max_workers` requests are in flight at the same time. The output
+            is the same as the serial version. Default None.
         _output (list): internal argument used for recursion.
 
     Returns:
@@ -1162,6 +1605,19 @@ def get_datasets_recursively(
         origin_series = get_entity(id=origin_id, flexilims_session=flexilims_session)
     else:
         origin_id = origin_series["id"]
+
+    if max_workers is not None:
+        return _get_datasets_recursively_parallel(
+            origin_series=origin_series,
+            dataset_type=dataset_type,
+            filter_datasets=filter_datasets,
+            parent_type=parent_type,
+            filter_parents=filter_parents,
+            return_paths=return_paths,
+            project_id=project_id,
+            flexilims_session=flexilims_session,
+            max_workers=max_workers,
+        )
     origin_is_valid = True
 
     # initialize output if first call
@@ -1211,6 +1667,70 @@ def get_datasets_recursively(
     return _output
 
 
+def _get_datasets_recursively_parallel(
+    origin_series,
+    dataset_type,
+    filter_datasets,
+    parent_type,
+    filter_parents,
+    return_paths,
+    project_id,
+    flexilims_session,
+    max_workers,
+):
+    """Thread pool version of `get_datasets_recursively`
+
+    Entities are visited level by level, the children of all entities of a level
+    being queried in parallel. The output is then assembled in the same depth-first
+    order as the serial version.
+    """
+
+    def visit(series, parent_type):
+        origin_is_valid = (parent_type is None) or (series["type"] == parent_type)
+        if filter_parents is not None:
+            for key, value in filter_parents.items():
+                if series.get(key, None) != value:
+                    origin_is_valid = False
+        ds = []
+        if origin_is_valid:
+            ds = get_datasets(
+                origin_id=series["id"],
+                dataset_type=dataset_type,
+                project_id=project_id,
+                flexilims_session=flexilims_session,
+                return_paths=return_paths,
+                filter_datasets=filter_datasets,
+            )
+        children = get_children(
+            parent_id=series["id"], flexilims_session=flexilims_session
+        )
+        children = [c for _, c in children.iterrows() if c.type != "dataset"]
+        return ds, children
+
+    # like the serial version, `parent_type` only applies to the origin
+    visited = {}
+    level = [(origin_series, parent_type)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while level:
+            futures = [executor.submit(visit, *args) for args in level]
+            next_level = []
+            for (series, _), future in zip(level, futures):
+                ds, children = future.result()
+                visited[series["id"]] = (ds, [c["id"] for c in children])
+                next_level.extend((c, None) for c in children)
+            level = next_level
+
+    output = {}
+    to_do = [origin_series["id"]]
+    while to_do:
+        entity_id = to_do.pop()
+        ds, children_id = visited[entity_id]
+        if len(ds):
+            output[entity_id] = ds
+        to_do.extend(reversed(children_id))
+    return output
+
+
 def get_datasets(
     origin_id=None,
     origin_name=None,
@@ -1244,7 +1764,7 @@ def get_datasets(
     """
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
+        flexilims_session = get_shared_session(project_id)
     else:
         project_id = lookup_project(flexilims_session.project_id, PARAMETERS)
 
@@ -1264,12 +1784,9 @@ def get_datasets(
     )
 
     if not return_dataseries:
-        datasets = [
-            flexiznam.Dataset.from_dataseries(
-                dataseries=ds, flexilims_session=flexilims_session
-            )
-            for _, ds in datasets.iterrows()
-        ]
+        datasets = flexiznam.Dataset.from_dataframe(
+            datasets, flexilims_session=flexilims_session
+        )
         if return_paths:
             datasets = [ds.path_full for ds in datasets]
 
@@ -1282,38 +1799,246 @@ def get_datasets(
     return datasets
 
 
-def generate_name(datatype, name, flexilims_session=None, project_id=None):
+def _validate_chunk(datasets):
+    """Run `is_valid` on datasets sharing a listing cache
+
+    Returns:
+        list: (is_valid, reason) for each dataset
+    """
+    from flexiznam.schema.folder_scan import ListingCache, use_listings
+
+    output = []
+    with use_listings(ListingCache()):
+        for ds in datasets:
+            try:
+                reason = ds.is_valid(return_reason=True)
+            except Exception as err:
+                reason = "Error while checking dataset: %s" % err
+            output.append((not reason, reason))
+    return output
+
+
+def _without_session(dataset):
+    """Shallow copy of a dataset without its flexilims session, to pickle it"""
+    dataset = copy.copy(dataset)
+    dataset._flexilims_session = None
+    return dataset
+
+
+def validate_datasets(datasets, executor="thread", max_workers=None):
+    """Check that the files of many datasets exist
+
+    Runs `is_valid(return_reason=True)` on all datasets in parallel. Datasets are
+    grouped by folder and each group is checked by one worker, with a listing cache
+    shared by the group, so that each folder is listed once instead of checking each
+    file.
+
+    Args:
+        datasets (list): :py:class:`flexiznam.schema.datasets.Dataset` objects
+        executor (str or concurrent.futures.Executor): "thread", "process" or an
+            executor to submit the work to. Unless the executor is a thread pool, the
+            datasets are sent to the workers without their flexilims session.
+            Default "thread".
+        max_workers (int): number of workers if `executor` is a string. Default None,
+            use the default of the executor class.
+
+    Returns:
+        pandas.DataFrame: one row per dataset, in the order of `datasets`, with
+            columns `name`, `dataset_type`, `path`, `is_valid` and `reason` (empty if
+            valid)
+    """
+    datasets = list(datasets)
+    chunks = dict()
+    for index, ds in enumerate(datasets):
+        folder = ds.path_full
+        if folder.suffix:
+            # single file dataset, files are in the parent folder
+            folder = folder.parent
+        chunks.setdefault(folder, []).append(index)
+    chunks = list(chunks.values())
+
+    if executor == "thread":
+        pool, own_pool = ThreadPoolExecutor(max_workers=max_workers), True
+    elif executor == "process":
+        pool, own_pool = ProcessPoolExecutor(max_workers=max_workers), True
+    elif isinstance(executor, Executor):
+        pool, own_pool = executor, False
+    else:
+        raise ValueError("`executor` must be 'thread', 'process' or an Executor")
+
+    work = [[datasets[i] for i in chunk] for chunk in chunks]
+    if not isinstance(pool, ThreadPoolExecutor):
+        # sessions cannot be sent to other processes and are not needed
+        work = [[_without_session(ds) for ds in chunk] for chunk in work]
+    try:
+        futures = [pool.submit(_validate_chunk, chunk) for chunk in work]
+        results = [future.result() for future in futures]
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+    valid = [None] * len(datasets)
+    for chunk, chunk_results in zip(chunks, results):
+        for index, result in zip(chunk, chunk_results):
+            valid[index] = result
+    return pd.DataFrame(
+        dict(
+            name=[ds.full_name for ds in datasets],
+            dataset_type=[ds.dataset_type for ds in datasets],
+            path=[ds.path_full for ds in datasets],
+            is_valid=[v[0] for v in valid],
+            reason=[v[1] for v in valid],
+        ),
+        columns=["name", "dataset_type", "path", "is_valid", "reason"],
+    )
+
+
+def _split_name_suffix(name):
+    """Split a name in root and numeric suffix
+
+    Args:
+        name (str): name like `root_12`, `root` or `12`
+
+    Returns:
+        (str, int): the root, including the trailing underscore, and the suffix (0
+            if the name has no numeric suffix)
+    """
+    parts = name.split("_")
+    if not parts[-1].isnumeric():
+        return name + "_", 0
+    root = "_".join(parts[:-1])
+    if root:
+        return root + "_", int(parts[-1])
+    return parts[-1] + "_", 0
+
+
+def _free_names(root, suffix, taken, n_names):
+    """Find the `n_names` smallest free names `root + suffix` at or above `suffix`"""
+    names = []
+    while len(names) < n_names:
+        candidate = "%s%s" % (root, suffix)
+        if candidate not in taken:
+            names.append(candidate)
+        suffix += 1
+    return names
+
+
+def generate_name(
+    datatype, name, flexilims_session=None, project_id=None, origin_id=None
+):
     """
     Generate a number for incrementally increasing the numeric suffix
 
+    Args:
+        datatype (str): type of the entity
+        name (str): name to start from. If it ends with `_<number>`, the suffix is
+            incremented from that number, otherwise `_0` is appended.
+        flexilims_session (:py:class:`flexilims.Flexilims`): flexilims session
+        project_id (str): hexadecimal project id, required if session is not
+            provided
+        origin_id (str, optional): hexadecimal id of the parent. If provided, the
+            names of the siblings are fetched in one query instead of probing
+            every candidate name.
+
+    Returns:
+        str: the first free name
     """
+    return generate_names(
+        datatype,
+        name,
+        n_names=1,
+        flexilims_session=flexilims_session,
+        project_id=project_id,
+        origin_id=origin_id,
+    )[0]
+
+
+def generate_names(
+    datatype,
+    name,
+    n_names,
+    flexilims_session=None,
+    project_id=None,
+    origin_id=None,
+    taken=None,
+):
+    """Reserve `n_names` free names with increasing numeric suffixes
+
+    The names use the smallest free suffixes at or above the suffix of `name`. They
+    are not necessarily consecutive: suffixes already used are skipped.
+
+    Free names are found locally from the names already used in flexilims:
+
+    - if `taken` is provided, no query is made.
+    - for a single name, the first free name among the children of `origin_id` (if
+      provided) or the requested name is checked online, since names are unique in
+      the whole project, not only among siblings.
+    - otherwise, or if that name is taken, all entities of `datatype` are fetched
+      once.
+
+    Names are not locked online: two processes creating entities at the same time
+    can still get the same names.
+
+    Args:
+        datatype (str): type of the entity
+        name (str): name to start from (see :py:func:`generate_name`)
+        n_names (int): number of names to reserve
+        flexilims_session (:py:class:`flexilims.Flexilims`): flexilims session
+        project_id (str): hexadecimal project id, required if session is not
+            provided
+        origin_id (str, optional): hexadecimal id of the parent of the new entities
+        taken (set, optional): all the names already used in the project, for
+            instance from a :py:class:`flexiznam.ProjectSnapshot`. The new names are
+            added to it.
+
+    Returns:
+        list: `n_names` free names, sorted by suffix
+    """
+    root, suffix = _split_name_suffix(name)
+    if taken is not None:
+        names = _free_names(root, suffix, taken, n_names)
+        taken.update(names)
+        return names
     assert (project_id is not None) or (flexilims_session is not None)
     if flexilims_session is None:
-        flexilims_session = get_flexilims_session(project_id)
-    parts = name.split("_")
-    if not parts[-1].isnumeric():
-        root = name + "_"
-        suffix = 0
-    else:
-        root = "_".join(parts[:-1])
-        if root:
-            root += "_"
-            suffix = int(parts[-1])
+        flexilims_session = get_shared_session(project_id)
+
+    if n_names == 1:
+        if origin_id is not None:
+            children = get_children(
+                parent_id=origin_id,
+                children_datatype=datatype,
+                flexilims_session=flexilims_session,
+            )
+            siblings = set(children["name"]) if len(children) else set()
+            candidate = _free_names(root, suffix, siblings, 1)[0]
         else:
-            root = parts[-1] + "_"
-            suffix = 0
-    while (
-        get_entity(
-            datatype, name="%s%s" % (root, suffix), flexilims_session=flexilims_session
+            candidate = "%s%s" % (root, suffix)
+        online = get_entity(
+            datatype, name=candidate, flexilims_session=flexilims_session
         )
-        is not None
-    ):
-        suffix += 1
-    name = "%s%s" % (root, suffix)
-    return name
+        if online is None:
+            return [candidate]
+
+    # list all the entities of that type once and allocate locally
+    entities = get_entities(
+        datatype=datatype, flexilims_session=flexilims_session, format_reply=False
+    )
+    taken = set(entity["name"] for entity in entities)
+    return _free_names(root, suffix, taken, n_names)
+
 
+def _get_flat_value(result, key, default=None):
+    """Get a value of a raw flexilims reply as if it was formatted
 
-def format_results(results, return_list=False):
+    Top level fields have priority over attributes, as in `format_results`.
+    """
+    if (key != "attributes") and (key in result):
+        return result[key]
+    return result["attributes"].get(key, default)
+
+
+def format_results(results, return_list=False, columns=None):
     """Make request output a nice DataFrame
 
     This will crash if any attribute is also present in the flexilims reply,
@@ -1324,11 +2049,16 @@ def format_results(results, return_list=False):
     Args:
         results (:obj:`list` of :obj:`dict`): Flexilims reply
         return_list (bool): if True, return a list of dicts instead of a DataFrame
+        columns (list, optional): fields (top level or attributes) to keep. If
+            provided, only these columns are built, one at a time, and `results` is
+            not modified. Missing fields are NaN. Default None, keep everything.
 
     Returns:
         :py:class:`pandas.DataFrame`: Reply formatted as a DataFrame
 
     """
+    if columns is not None:
+        return _format_columns(results, list(columns), return_list)
     for result in results:
         for attr_name, attr_value in result["attributes"].items():
             if attr_name in result:
@@ -1341,6 +2071,21 @@ def format_results(results, return_list=False):
     return pd.DataFrame(results)
 
 
+def _format_columns(results, columns, return_list=False):
+    """Build the `columns` of `format_results` directly from raw replies"""
+    for result in results:
+        collisions = result["attributes"].keys() & result.keys()
+        for attr_name in collisions:
+            warnings.warn("An entity should not have %s as attribute" % attr_name)
+    data = {
+        column: [_get_flat_value(r, column, np.nan) for r in results]
+        for column in columns
+    }
+    if return_list:
+        return [dict(zip(columns, values)) for values in zip(*data.values())]
+    return pd.DataFrame(data, columns=columns)
+
+
 def delete_recursively(source_id, flexilims_session, do_it=False):
     """Delete an entity and all its children recursively
 
@@ -1368,4 +2113,5 @@ def delete_recursively(source_id, flexilims_session, do_it=False):
     if do_it:
         for child_id in to_delete:
             flexilims_session.delete(child_id)
+        cache.invalidate(flexilims_session)
     return to_delete
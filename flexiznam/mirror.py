@@ -0,0 +1,529 @@
+"""Local SQLite replica of flexilims projects
+
+A :py:class:`ProjectMirror` keeps a copy of every entity of a project in a SQLite
+file. It is kept up to date with :py:meth:`ProjectMirror.sync` (or `flexiznam mirror`)
+and can then be used as `flexilims_session` by any flexiznam read function, without
+contacting the server::
+
+    mirror = ProjectMirror("mirror.db", project_id="my_project", create=True)
+    mirror.sync(flz.get_flexilims_session("my_project"))
+    flz.get_entity(name="mouse", flexilims_session=mirror)
+
+Setting the `offline_mirror` field of the config file makes
+:py:func:`flexiznam.main.get_flexilims_session` return a mirror in offline mode. The
+file must be created first with `flexiznam mirror`. SQLite locking is not reliable on
+network file systems, so the mirror should be on a local disk.
+
+The flexilims API cannot return only the entities created or changed since a given
+date, so a sync downloads each datatype once. Only entities that are new, changed or
+deleted are written to the database, which keeps syncs cheap for large projects and
+lets many readers use the file while it is refreshed.
+
+The mirror also indexes attributes and genealogy, and :py:meth:`ProjectMirror.query`
+combines several predicates in one SQL query::
+
+    mirror.query(
+        datatype="dataset",
+        attributes=dict(dataset_type="scanimage", stack_type="calcium"),
+        genealogy_prefix=[["mouse_x"], ["mouse_y"]],
+        created_after="2023-01-01",
+    )
+"""
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+import pandas as pd
+from flexiznam.config import PARAMETERS
+from flexiznam.errors import FlexilimsError
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entities (
+    id TEXT PRIMARY KEY,
+    project_id TEXT,
+    type TEXT,
+    name TEXT,
+    origin_id TEXT,
+    date_created INTEGER,
+    digest TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS entities_name ON entities (project_id, name);
+CREATE INDEX IF NOT EXISTS entities_type ON entities (project_id, type);
+CREATE INDEX IF NOT EXISTS entities_origin ON entities (project_id, origin_id);
+CREATE TABLE IF NOT EXISTS attributes (
+    id TEXT,
+    project_id TEXT,
+    key TEXT,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS attributes_value ON attributes (project_id, key, value);
+CREATE INDEX IF NOT EXISTS attributes_id ON attributes (id);
+CREATE TABLE IF NOT EXISTS genealogy (
+    id TEXT PRIMARY KEY,
+    project_id TEXT,
+    path TEXT
+);
+CREATE INDEX IF NOT EXISTS genealogy_path ON genealogy (project_id, path);
+CREATE TABLE IF NOT EXISTS sync (
+    project_id TEXT,
+    datatype TEXT,
+    last_sync REAL,
+    PRIMARY KEY (project_id, datatype)
+);
+"""
+# increase when the indexes change, to rebuild them from the stored replies
+_INDEX_VERSION = 1
+
+
+def get_mirror_file():
+    """Path to the mirror database defined in the config file
+
+    Returns:
+        pathlib.Path: the `offline_mirror` field of the config file or, if it is None
+            or True, `~/.flexiznam/flexilims_mirror.db`
+    """
+    db_file = PARAMETERS.get("offline_mirror", None)
+    if (db_file is None) or (db_file is True):
+        db_file = pathlib.Path.home() / ".flexiznam" / "flexilims_mirror.db"
+    return pathlib.Path(db_file).expanduser()
+
+
+def _date_created(entity):
+    """`dateCreated` of a raw reply as an integer, None if missing"""
+    try:
+        return int(entity["dateCreated"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _encode_value(value):
+    """Text used to index and compare attribute values"""
+    return json.dumps(value, sort_keys=True)
+
+
+def _genealogy_path(genealogy):
+    """Genealogy as `a/b/c/`, so that a prefix of names is a prefix of the text"""
+    return "".join("%s/" % g for g in genealogy)
+
+
+def _to_ms(date):
+    """Convert a date to milliseconds since epoch, the unit of `dateCreated`
+
+    Numbers are assumed to be in milliseconds already, anything else is parsed by
+    :py:class:`pandas.Timestamp`. Naive dates are UTC.
+    """
+    if isinstance(date, (int, float)) and not isinstance(date, bool):
+        return int(date)
+    return int(pd.Timestamp(date).value // 10**6)
+
+
+class ProjectMirror(object):
+    """SQLite copy of one project, usable as a read-only flexilims session
+
+    The mirror mimics the read interface of :py:class:`flexilims.Flexilims` (`get`,
+    `get_children` and `project_id`). Writes (`post`, `update_one`, `delete`) are
+    sent to `flexilims_session` if one was given and the mirror is updated with the
+    reply. Without online session, they raise a :py:class:`FlexilimsError`.
+
+    Each thread uses its own connection to the database.
+    """
+
+    def __init__(self, db_file, project_id, flexilims_session=None, create=False):
+        """Open or create a mirror
+
+        Args:
+            db_file (str or pathlib.Path): path to the SQLite file. Several projects
+                can share the same file.
+            project_id (str): hexadecimal id or name of the project
+            flexilims_session (:py:class:`flexilims.Flexilims`, optional): online
+                session used for syncs and writes. Default to None
+            create (bool): create the file and its parent folders if they do not
+                exist. Default to False, the file must exist
+
+        Raises:
+            FileNotFoundError: if `db_file` does not exist and `create` is False
+        """
+        from flexiznam.main import _format_project
+
+        self.db_file = pathlib.Path(db_file)
+        if not self.db_file.exists():
+            if not create:
+                raise FileNotFoundError("Mirror file %s not found" % self.db_file)
+            self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.project_id = _format_project(project_id, PARAMETERS)
+        self.flexilims_session = flexilims_session
+        self._local = threading.local()
+        con = self._connection()
+        with con:
+            con.executescript(_SCHEMA)
+        if con.execute("PRAGMA user_version").fetchone()[0] < _INDEX_VERSION:
+            self._reindex()
+
+    def _reindex(self):
+        """Rebuild attribute and genealogy indexes of all projects in the file"""
+        con = self._connection()
+        with con:
+            con.execute("DELETE FROM attributes")
+            con.execute("DELETE FROM genealogy")
+            for project_id, data in con.execute(
+                "SELECT project_id, data FROM entities"
+            ).fetchall():
+                self._index(con, project_id, json.loads(data))
+            con.execute("PRAGMA user_version=%d" % _INDEX_VERSION)
+
+    @staticmethod
+    def _index(con, project_id, entity):
+        """Add an entity to the attribute and genealogy indexes"""
+        attributes = entity.get("attributes", None) or {}
+        con.executemany(
+            "INSERT INTO attributes VALUES (?, ?, ?, ?)",
+            [
+                (entity["id"], project_id, key, _encode_value(value))
+                for key, value in attributes.items()
+            ],
+        )
+        genealogy = attributes.get("genealogy", None)
+        if genealogy:
+            con.execute(
+                "INSERT OR REPLACE INTO genealogy VALUES (?, ?, ?)",
+                (entity["id"], project_id, _genealogy_path(genealogy)),
+            )
+
+    def _write(self, con, entities):
+        """Insert or replace entities and their index entries"""
+        self._remove(con, [e["id"] for e in entities])
+        con.executemany(
+            "INSERT INTO entities VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._to_row(e) for e in entities],
+        )
+        for entity in entities:
+            self._index(con, self.project_id, entity)
+
+    @staticmethod
+    def _remove(con, ids):
+        """Remove entities and their index entries"""
+        ids = [(i,) for i in ids]
+        con.executemany("DELETE FROM entities WHERE id=?", ids)
+        con.executemany("DELETE FROM attributes WHERE id=?", ids)
+        con.executemany("DELETE FROM genealogy WHERE id=?", ids)
+
+    def _connection(self):
+        con = getattr(self._local, "connection", None)
+        if con is None:
+            con = sqlite3.connect(str(self.db_file), timeout=30)
+            self._local.connection = con
+        return con
+
+    def __len__(self):
+        return (
+            self._connection()
+            .execute(
+                "SELECT COUNT(*) FROM entities WHERE project_id=?", (self.project_id,)
+            )
+            .fetchone()[0]
+        )
+
+    def __contains__(self, id):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT 1 FROM entities WHERE project_id=? AND id=?",
+                (self.project_id, id),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def last_sync(self, datatype):
+        """Time of the last sync of a datatype
+
+        Returns:
+            float: `time.time()` at the end of the last sync, None if never synced
+        """
+        row = (
+            self._connection()
+            .execute(
+                "SELECT last_sync FROM sync WHERE project_id=? AND datatype=?",
+                (self.project_id, datatype),
+            )
+            .fetchone()
+        )
+        return None if row is None else row[0]
+
+    def sync(self, flexilims_session=None, datatypes=None):
+        """Download the project and write the differences to the mirror
+
+        Entities are compared with a digest of their raw reply. New and changed
+        entities are written, entities of the synced datatypes that are not online
+        anymore are removed.
+
+        Args:
+            flexilims_session (:py:class:`flexilims.Flexilims`, optional): online
+                session. Default to the session given at creation.
+            datatypes (list, optional): datatypes to sync. Default to
+                PARAMETERS["datatypes"].
+
+        Returns:
+            dict: number of entities `new` (created since the previous sync),
+                `updated`, `deleted` and `unchanged`
+        """
+        if flexilims_session is None:
+            flexilims_session = self.flexilims_session
+        if flexilims_session is None:
+            raise FlexilimsError("A flexilims session is required to sync a mirror")
+        if flexilims_session.project_id != self.project_id:
+            raise FlexilimsError(
+                "Session is for project %s, mirror for %s"
+                % (flexilims_session.project_id, self.project_id)
+            )
+        if datatypes is None:
+            datatypes = PARAMETERS["datatypes"]
+        summary = dict(new=0, updated=0, deleted=0, unchanged=0)
+        for datatype in datatypes:
+            entities = flexilims_session.get(datatype)
+            for key, value in self._sync_datatype(datatype, entities).items():
+                summary[key] += value
+        return summary
+
+    def _sync_datatype(self, datatype, entities):
+        """Write the differences between the mirror and a download of a datatype"""
+        con = self._connection()
+        known = dict(
+            con.execute(
+                "SELECT id, digest FROM entities WHERE project_id=? AND type=?",
+                (self.project_id, datatype),
+            ).fetchall()
+        )
+        summary = dict(new=0, updated=0, deleted=0, unchanged=0)
+        to_write = []
+        online = set()
+        for entity in entities:
+            online.add(entity["id"])
+            if known.get(entity["id"], None) == self._digest(entity):
+                summary["unchanged"] += 1
+                continue
+            if entity["id"] in known:
+                summary["updated"] += 1
+            else:
+                summary["new"] += 1
+            to_write.append(entity)
+        deleted = [i for i in known if i not in online]
+        summary["deleted"] = len(deleted)
+        with con:
+            self._write(con, to_write)
+            self._remove(con, deleted)
+            con.execute(
+                "INSERT OR REPLACE INTO sync (project_id, datatype, last_sync) "
+                "VALUES (?, ?, ?)",
+                (self.project_id, datatype, time.time()),
+            )
+        return summary
+
+    @staticmethod
+    def _digest(entity):
+        data = json.dumps(entity, sort_keys=True)
+        return hashlib.blake2b(data.encode(), digest_size=16).hexdigest()
+
+    def _to_row(self, entity):
+        # keep the order of the keys of the reply, it defines the order of columns
+        return (
+            entity["id"],
+            self.project_id,
+            entity["type"],
+            entity["name"],
+            entity.get("origin_id", None),
+            _date_created(entity),
+            self._digest(entity),
+            json.dumps(entity),
+        )
+
+    def _upsert(self, entity):
+        con = self._connection()
+        with con:
+            self._write(con, [entity])
+
+    def get(
+        self,
+        datatype=None,
+        query_key=None,
+        query_value=None,
+        name=None,
+        origin_id=None,
+        id=None,
+        project_id=None,
+    ):
+        """Same as :py:meth:`flexilims.Flexilims.get` but from the mirror
+
+        Returns:
+            list: raw flexilims replies matching the query
+        """
+        if (project_id is not None) and (project_id != self.project_id):
+            raise ValueError("Mirror is for project %s" % self.project_id)
+        where = ["project_id=?"]
+        values = [self.project_id]
+        for column, value in (
+            ("type", datatype),
+            ("name", name),
+            ("origin_id", origin_id),
+            ("id", id),
+        ):
+            if value is not None:
+                where.append("%s=?" % column)
+                values.append(value)
+        if (query_key is not None) and (query_value is not None):
+            where.append(
+                "id IN (SELECT id FROM attributes WHERE project_id=? AND key=? "
+                "AND value=?)"
+            )
+            values.extend([self.project_id, query_key, _encode_value(query_value)])
+        output = self._select(where, values)
+        if query_key is not None:
+            output = [
+                e for e in output if e["attributes"].get(query_key, None) == query_value
+            ]
+        return output
+
+    def _select(self, where, values):
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT data FROM entities WHERE %s ORDER BY rowid"
+                % " AND ".join(where),
+                values,
+            )
+            .fetchall()
+        )
+        return [json.loads(row[0]) for row in rows]
+
+    def query(
+        self,
+        datatype=None,
+        attributes=None,
+        genealogy_prefix=None,
+        created_after=None,
+        created_before=None,
+        format_reply=True,
+        columns=None,
+    ):
+        """Find entities matching several predicates using the mirror indexes
+
+        All predicates must match. For instance, all scanimage calcium datasets of two
+        mice created in 2023::
+
+            mirror.query(
+                datatype="dataset",
+                attributes=dict(dataset_type="scanimage", stack_type="calcium"),
+                genealogy_prefix=[["mouse_x"], ["mouse_y"]],
+                created_after="2023-01-01",
+                created_before="2024-01-01",
+            )
+
+        Args:
+            datatype (str or list, optional): type of the entities, or list of
+                accepted types
+            attributes (dict, optional): attribute name to required value. If the
+                value is a tuple or a set, any of its elements is accepted. Values are
+                compared by their JSON representation, `1` does not match `1.0`.
+            genealogy_prefix (list, optional): start of the genealogy, as a list of
+                names (`["mouse", "S20230101"]`), or list of such lists to accept any
+                of them. The prefix matches whole names only.
+            created_after (optional): keep entities with `dateCreated` on or after
+                this date. Date string, datetime or milliseconds since epoch.
+            created_before (optional): keep entities with `dateCreated` strictly
+                before this date
+            format_reply (bool, optional): format the reply as `get_entities` does.
+                If False, return the raw replies. Default to True.
+            columns (list, optional): columns to keep, see
+                :py:func:`flexiznam.main.format_results`
+
+        Returns:
+            :py:class:`pandas.DataFrame`: one row per entity indexed by name, or
+                list of raw replies if `format_reply` is False
+        """
+        where = ["project_id=?"]
+        values = [self.project_id]
+        if datatype is not None:
+            datatypes = [datatype] if isinstance(datatype, str) else list(datatype)
+            where.append("type IN (%s)" % ", ".join("?" * len(datatypes)))
+            values.extend(datatypes)
+        for key, value in (attributes or {}).items():
+            accepted = list(value) if isinstance(value, (tuple, set)) else [value]
+            where.append(
+                "id IN (SELECT id FROM attributes WHERE project_id=? AND key=? "
+                "AND value IN (%s))" % ", ".join("?" * len(accepted))
+            )
+            values.extend([self.project_id, key])
+            values.extend(_encode_value(v) for v in accepted)
+        if genealogy_prefix is not None:
+            prefixes = genealogy_prefix
+            if len(prefixes) and isinstance(prefixes[0], str):
+                prefixes = [prefixes]
+            ranges = []
+            values.append(self.project_id)
+            for prefix in prefixes:
+                # all paths starting with `prefix/` are between `prefix/` and `prefix0`
+                path = _genealogy_path(prefix)
+                ranges.append("(path >= ? AND path < ?)")
+                values.extend([path, path[:-1] + chr(ord("/") + 1)])
+            where.append(
+                "id IN (SELECT id FROM genealogy WHERE project_id=? AND (%s))"
+                % (" OR ".join(ranges) if ranges else "0")
+            )
+        if created_after is not None:
+            where.append("date_created >= ?")
+            values.append(_to_ms(created_after))
+        if created_before is not None:
+            where.append("date_created < ?")
+            values.append(_to_ms(created_before))
+
+        results = self._select(where, values)
+        if not format_reply:
+            return results
+        from flexiznam.main import format_results
+
+        results = format_results(results, columns=columns)
+        if len(results) and ("name" in results.columns):
+            results.set_index("name", drop=False, inplace=True)
+        return results
+
+    def get_children(self, id):
+        """Same as :py:meth:`flexilims.Flexilims.get_children` but from the mirror
+
+        Returns:
+            list: raw replies of all the children of `id`
+        """
+        return self.get(origin_id=id)
+
+    def _online_session(self):
+        if self.flexilims_session is None:
+            raise FlexilimsError(
+                "Mirror of %s is read-only without flexilims session" % self.project_id
+            )
+        return self.flexilims_session
+
+    def post(self, *args, **kwargs):
+        """Create an entity online and add it to the mirror"""
+        reply = self._online_session().post(*args, **kwargs)
+        self._update_from_reply(reply)
+        return reply
+
+    def update_one(self, *args, **kwargs):
+        """Update an entity online and in the mirror"""
+        reply = self._online_session().update_one(*args, **kwargs)
+        self._update_from_reply(reply)
+        return reply
+
+    def delete(self, id):
+        """Delete an entity online and from the mirror"""
+        reply = self._online_session().delete(id)
+        con = self._connection()
+        with con:
+            self._remove(con, [id])
+        return reply
+
+    def _update_from_reply(self, reply):
+        if isinstance(reply, dict) and ("id" in reply) and ("attributes" in reply):
+            self._upsert(reply)
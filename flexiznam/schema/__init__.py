@@ -38,3 +38,5 @@ Dataset.SUBCLASSES["microscopy"] = MicroscopyData
 Dataset.SUBCLASSES["onix"] = OnixData
 Dataset.SUBCLASSES["sequencing"] = SequencingData
 Dataset.SUBCLASSES["visstim"] = VisStimData
+
+from .dataset_table import DatasetTable
@@ -1,8 +1,8 @@
 import datetime
-import os
 import pathlib
 
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
 
 
 class CameraData(Dataset):
@@ -20,6 +20,7 @@ class CameraData(Dataset):
         flexilims_session=None,
         project=None,
         enforce_validity=True,
+        folder_scan=None,
     ):
         """Create a Camera dataset by loading info from folder
 
@@ -35,6 +36,8 @@ class CameraData(Dataset):
             enforce_validity (bool): True by default. Refuse to create camera dataset
                                      if they don't have a video, metadata and timestamp
                                      file
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of datasets (fzm.schema.camera_data.CameraData)
@@ -45,9 +48,10 @@ class CameraData(Dataset):
         elif isinstance(folder_genealogy, list):
             folder_genealogy = tuple(folder_genealogy)
 
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
         fnames = [
             f
-            for f in os.listdir(folder)
+            for f in folder_scan.listdir()
             if f.endswith(tuple(CameraData.VALID_EXTENSIONS))
         ]
         metadata_files = [
@@ -100,8 +104,7 @@ class CameraData(Dataset):
                     "Found more than one potential video file for camera %s"
                     % camera_name
                 )
-            video_path = pathlib.Path(folder) / vid[0]
-            created = datetime.datetime.fromtimestamp(video_path.stat().st_mtime)
+            created = datetime.datetime.fromtimestamp(folder_scan.stat(vid[0]).st_mtime)
             extra_attributes = dict(
                 video_file=vid[0],
             )
@@ -219,6 +222,23 @@ class CameraData(Dataset):
     def video_file(self, value):
         self.extra_attributes["video_file"] = str(value)
 
+    def associated_files(self, folder=None):
+        """Video, timestamps and metadata files of the camera
+
+        Args:
+            folder: Where to look for files? default to self.path_full
+
+        Returns:
+            list: paths of the files defined in extra_attributes
+        """
+        if folder is None:
+            folder = self._files_folder()
+        return [
+            pathlib.Path(folder) / self.extra_attributes[attr]
+            for attr in ["video_file", "timestamp_file", "metadata_file"]
+            if attr in self.extra_attributes
+        ]
+
     def is_valid(self, return_reason=False):
         """Check that video, metadata and timestamps files exist"""
         for attr in ["video_file", "timestamp_file", "metadata_file"]:
@@ -226,7 +246,7 @@ class CameraData(Dataset):
                 msg = f"Missing attribute {attr}"
                 return msg if return_reason else False
             fname = getattr(self, attr)
-            if not (self.path_full / fname).exists():
+            if not self._exists(self.path_full / fname):
                 msg = f"Unvalid {attr}. {self.path_full / fname} does not exist"
                 return msg if return_reason else False
         return "" if return_reason else True
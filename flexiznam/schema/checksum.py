@@ -0,0 +1,317 @@
+"""Checksums of large data files
+
+Files are read in large chunks with `readinto` into a buffer reused by each thread,
+and several files are hashed concurrently on a thread pool. Supported algorithms are
+`md5` and, if the `xxhash` package is installed, `xxh64` and `xxh3_128`.
+
+Checksums can be computed in two modes:
+
+- whole file (`piece_size=None`, the default): the digest is the usual checksum of
+  the file, the same as `md5sum` for instance.
+- piecewise: the file is cut in pieces of `piece_size` bytes, hashed independently
+  (also concurrently) and the digest is the checksum of the concatenated digests of
+  the pieces. Use it for very large files: with a `state_file`, each piece is
+  recorded as soon as it is hashed, and an interrupted run resumes after the pieces
+  already done.
+
+With a `state_file`, finished files are also recorded in both modes and not hashed
+again if their size and modification time did not change.
+
+The checksums of a dataset are stored in its `checksums` extra attribute (see
+:py:meth:`flexiznam.schema.datasets.Dataset.compute_checksums`)::
+
+    {
+        "algorithm": "md5",
+        "piece_size": None,
+        "files": [
+            {"file": "sample.fastq.gz", "size": 123, "mtime_ns": 1690000000,
+             "digest": "..."},
+        ],
+    }
+"""
+import hashlib
+import json
+import os
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+CHUNK_SIZE = 8 << 20
+
+_BUFFERS = threading.local()
+
+
+def available_algorithms():
+    """Names of the algorithms that can be used
+
+    Returns:
+        list: `md5` and the xxhash algorithms if `xxhash` is installed
+    """
+    algorithms = ["md5"]
+    if xxhash is not None:
+        algorithms.extend(["xxh64", "xxh3_128"])
+    return algorithms
+
+
+def _new_hasher(algorithm):
+    if algorithm == "md5":
+        return hashlib.md5()
+    if algorithm in ("xxh64", "xxh3_128"):
+        if xxhash is None:
+            raise ValueError("Install the `xxhash` package to use %s" % algorithm)
+        return getattr(xxhash, algorithm)()
+    raise ValueError(
+        "Unknown algorithm %s. Must be one of %s" % (algorithm, available_algorithms())
+    )
+
+
+def _buffer(chunk_size):
+    """Buffer of the current thread, reused between calls"""
+    buffer = getattr(_BUFFERS, "buffer", None)
+    if (buffer is None) or (len(buffer) != chunk_size):
+        buffer = memoryview(bytearray(chunk_size))
+        _BUFFERS.buffer = buffer
+    return buffer
+
+
+def hash_range(path, algorithm="md5", start=0, length=None, chunk_size=CHUNK_SIZE):
+    """Checksum of a range of bytes of a file
+
+    Args:
+        path (str or pathlib.Path): path to the file
+        algorithm (str): name of the algorithm, see :py:func:`available_algorithms`
+        start (int): first byte of the range
+        length (int, optional): number of bytes to hash. Default to the end of file
+        chunk_size (int): size of the reads, in bytes
+
+    Returns:
+        str: hexadecimal digest
+    """
+    hasher = _new_hasher(algorithm)
+    buffer = _buffer(chunk_size)
+    remaining = length
+    with open(path, "rb", buffering=0) as f:
+        f.seek(start)
+        while (remaining is None) or (remaining > 0):
+            view = buffer if remaining is None else buffer[: min(remaining, chunk_size)]
+            n_read = f.readinto(view)
+            if not n_read:
+                break
+            hasher.update(view[:n_read])
+            if remaining is not None:
+                remaining -= n_read
+    return hasher.hexdigest()
+
+
+class _State(object):
+    """Append-only record of the files and pieces already hashed"""
+
+    def __init__(self, state_file):
+        self.state_file = None if state_file is None else pathlib.Path(state_file)
+        self.done = dict()
+        self._lock = threading.Lock()
+        if (self.state_file is None) or not self.state_file.exists():
+            return
+        with open(self.state_file, "r") as f:
+            text = f.read()
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # partially written line
+                continue
+            self.done[self._key(**record)] = record["digest"]
+        if text and not text.endswith("\n"):
+            # terminate the partial line so that new records start on a new line
+            with open(self.state_file, "a") as f:
+                f.write("\n")
+
+    @staticmethod
+    def _key(file, size, mtime_ns, algorithm, piece_size, piece, **kwargs):
+        return (file, size, mtime_ns, algorithm, piece_size, piece)
+
+    def get(self, **key):
+        return self.done.get(self._key(**key), None)
+
+    def add(self, digest, **key):
+        with self._lock:
+            self.done[self._key(**key)] = digest
+            if self.state_file is None:
+                return
+            with open(self.state_file, "a") as f:
+                f.write(json.dumps(dict(digest=digest, **key)) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def compute_checksums(
+    files,
+    algorithm="md5",
+    piece_size=None,
+    state_file=None,
+    max_workers=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """Checksums of many files, computed concurrently
+
+    Args:
+        files (list): paths of the files
+        algorithm (str): name of the algorithm, see :py:func:`available_algorithms`
+        piece_size (int, optional): hash pieces of `piece_size` bytes independently.
+            Must be a multiple of `chunk_size`. Default None, hash whole files.
+        state_file (str or pathlib.Path, optional): file recording the files and
+            pieces already hashed, to resume an interrupted run. Created if needed.
+        max_workers (int, optional): number of threads
+        chunk_size (int): size of the reads, in bytes
+
+    Returns:
+        list: one dict per file with `size`, `mtime_ns` and `digest`, in the order
+            of `files`
+    """
+    _new_hasher(algorithm)
+    if (piece_size is not None) and (piece_size % chunk_size):
+        raise ValueError("piece_size must be a multiple of chunk_size")
+    state = _State(state_file)
+    files = [os.path.abspath(f) for f in files]
+    stats = [os.stat(f) for f in files]
+
+    # each task is a (file index, piece index, start, length). Piece is None in
+    # whole file mode
+    tasks = []
+    for index, (path, file_stat) in enumerate(zip(files, stats)):
+        if piece_size is None:
+            tasks.append((index, None, 0, None))
+        else:
+            n_pieces = max(1, -(-file_stat.st_size // piece_size))
+            for piece in range(n_pieces):
+                tasks.append((index, piece, piece * piece_size, piece_size))
+
+    def run(task):
+        index, piece, start, length = task
+        key = dict(
+            file=files[index],
+            size=stats[index].st_size,
+            mtime_ns=stats[index].st_mtime_ns,
+            algorithm=algorithm,
+            piece_size=piece_size,
+            piece=piece,
+        )
+        digest = state.get(**key)
+        if digest is None:
+            digest = hash_range(files[index], algorithm, start, length, chunk_size)
+            state.add(digest, **key)
+        return digest
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        digests = list(executor.map(run, tasks))
+
+    pieces = [[] for _ in files]
+    for (index, _, _, _), digest in zip(tasks, digests):
+        pieces[index].append(digest)
+    output = []
+    for path, file_stat, file_pieces in zip(files, stats, pieces):
+        if piece_size is None:
+            digest = file_pieces[0]
+        else:
+            hasher = _new_hasher(algorithm)
+            for piece_digest in file_pieces:
+                hasher.update(bytes.fromhex(piece_digest))
+            digest = hasher.hexdigest()
+        output.append(
+            dict(size=file_stat.st_size, mtime_ns=file_stat.st_mtime_ns, digest=digest)
+        )
+    return output
+
+
+def checksum_datasets(
+    datasets,
+    algorithm="md5",
+    piece_size=None,
+    state_file=None,
+    max_workers=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """Compute the checksums of the files of datasets and store them
+
+    The files of all datasets are hashed concurrently. The checksums are stored in
+    `extra_attributes["checksums"]` of each dataset.
+
+    Args:
+        datasets (list): :py:class:`flexiznam.schema.datasets.Dataset` objects
+        algorithm (str): name of the algorithm, see :py:func:`available_algorithms`
+        piece_size (int, optional): hash pieces of `piece_size` bytes independently.
+            Default None, hash whole files.
+        state_file (str or pathlib.Path, optional): file recording the files and
+            pieces already hashed, to resume an interrupted run
+        max_workers (int, optional): number of threads
+        chunk_size (int): size of the reads, in bytes
+
+    Returns:
+        list: the `checksums` attribute of each dataset
+    """
+    files = []
+    for ds in datasets:
+        folder = ds._files_folder()
+        files.append([(folder, pathlib.Path(f)) for f in ds.associated_files()])
+    records = compute_checksums(
+        [f for ds_files in files for _, f in ds_files],
+        algorithm=algorithm,
+        piece_size=piece_size,
+        state_file=state_file,
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+    )
+    output = []
+    records = iter(records)
+    for ds, ds_files in zip(datasets, files):
+        ds_records = []
+        for folder, path in ds_files:
+            record = next(records)
+            record["file"] = path.relative_to(folder).as_posix()
+            ds_records.append(record)
+        checksums = dict(algorithm=algorithm, piece_size=piece_size, files=ds_records)
+        ds.extra_attributes["checksums"] = checksums
+        output.append(checksums)
+    return output
+
+
+def verify_checksums(checksums, folder, max_workers=None, chunk_size=CHUNK_SIZE):
+    """Compute checksums again and compare them to stored ones
+
+    Args:
+        checksums (dict): `checksums` attribute of a dataset
+        folder (str or pathlib.Path): folder of the dataset
+        max_workers (int, optional): number of threads
+        chunk_size (int): size of the reads, in bytes
+
+    Returns:
+        dict: file name to reason, for the files that changed. Empty if nothing
+            changed
+    """
+    folder = pathlib.Path(folder)
+    reasons = dict()
+    to_hash = []
+    for record in checksums["files"]:
+        path = folder / record["file"]
+        if not path.exists():
+            reasons[record["file"]] = "file is missing"
+        elif path.stat().st_size != record["size"]:
+            reasons[record["file"]] = "size changed"
+        else:
+            to_hash.append(record)
+    new_records = compute_checksums(
+        [folder / record["file"] for record in to_hash],
+        algorithm=checksums["algorithm"],
+        piece_size=checksums["piece_size"],
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+    )
+    for record, new_record in zip(to_hash, new_records):
+        if record["digest"] != new_record["digest"]:
+            reasons[record["file"]] = "checksum changed"
+    return reasons
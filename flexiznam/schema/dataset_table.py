@@ -0,0 +1,328 @@
+"""Compact storage of many datasets of a project
+
+A :py:class:`flexiznam.schema.datasets.Dataset` object holds its own dictionary of
+attributes, `pathlib.Path`, genealogy tuple and reference to the project and session.
+Keeping all the datasets of a project in memory that way is expensive.
+
+:py:class:`DatasetTable` stores the same information column by column. The project,
+project ID and flexilims session are stored once for the whole table, dataset types
+are stored as small integer codes, the genealogy of the parents is shared between
+siblings and strings are interned. Full dataset objects are created only when a row is
+accessed::
+
+    table = DatasetTable.from_dataframe(
+        flz.get_entities(datatype="dataset", flexilims_session=session),
+        flexilims_session=session,
+    )
+    ds = table["mouse_S20230101_R101010_camera"]
+"""
+import array
+import sys
+import flexiznam as flz
+from flexiznam.errors import DatasetError
+from flexiznam.schema.datasets import Dataset
+
+_NAN = float("nan")
+# attribute not defined for a row, different from an attribute set to NaN
+_MISSING = object()
+
+
+def _intern(value):
+    """Intern strings and share NaN to avoid one copy per row"""
+    if type(value) is str:
+        return sys.intern(value)
+    if (type(value) is float) and (value != value):
+        return _NAN
+    return value
+
+
+class DatasetTable(object):
+    """Table of datasets of one project, stored column by column
+
+    Rows are materialised as :py:class:`Dataset` (or subclasses) on access and are not
+    kept by the table.
+
+    Attributes:
+        project (str): name of the project
+        project_id (str): hexadecimal ID of the project
+        flexilims_session (flexilims.Session): session given to the datasets
+    """
+
+    __slots__ = (
+        "project",
+        "project_id",
+        "flexilims_session",
+        "_ids",
+        "_origin_ids",
+        "_paths",
+        "_is_raw",
+        "_created",
+        "_types",
+        "_type_codes",
+        "_parents",
+        "_parent_lookup",
+        "_parent_codes",
+        "_leaves",
+        "_attributes",
+        "_name_index",
+    )
+
+    def __init__(self, project=None, project_id=None, flexilims_session=None):
+        """Create an empty table
+
+        Args:
+            project (str, optional): name of the project. Can be guessed from
+                `project_id` or from the session
+            project_id (str, optional): hexadecimal ID of the project
+            flexilims_session (flexilims.Session, optional): session to add to the
+                datasets
+        """
+        if project_id is None:
+            if project is not None:
+                project_id = flz.main._format_project(project, flz.PARAMETERS)
+            elif flexilims_session is not None:
+                project_id = flexilims_session.project_id
+        if project_id is not None:
+            name = flz.main.lookup_project(project_id, flz.PARAMETERS)
+            if name is None:
+                raise IOError("Unknown project ID. Please update config file")
+            if (project is not None) and (project != name):
+                raise DatasetError("project_id does not correspond to project")
+            project = name
+        session_project = getattr(flexilims_session, "project_id", None)
+        if (session_project is not None) and (session_project != project_id):
+            raise DatasetError(
+                "Cannot use a flexilims_session from a different project"
+            )
+        self.project = project
+        self.project_id = project_id
+        self.flexilims_session = flexilims_session
+        self._ids = []
+        self._origin_ids = []
+        self._paths = []
+        self._is_raw = []
+        self._created = []
+        self._types = []
+        self._type_codes = array.array("H")
+        self._parents = []
+        self._parent_lookup = dict()
+        self._parent_codes = array.array("l")
+        self._leaves = []
+        self._attributes = dict()
+        self._name_index = None
+
+    @classmethod
+    def from_dataframe(cls, dataframe, flexilims_session=None):
+        """Create a table from a flexilims dataframe
+
+        Args:
+            dataframe (pandas.DataFrame): formatted flexilims reply with one dataset
+                per row, for instance the output of `flz.get_children`. The index
+                must be the dataset names. All datasets must be in the same project.
+            flexilims_session (flexilims.Session, optional): authentication session to
+                access flexilims. Will be added to all dataset objects.
+
+        Returns:
+            :py:class:`DatasetTable`: the table
+        """
+        project_id = None
+        if len(dataframe):
+            project_ids = dataframe["project"].unique()
+            if len(project_ids) > 1:
+                raise DatasetError(
+                    "All datasets of a table must be in the same project"
+                )
+            project_id = project_ids[0]
+        table = cls(project_id=project_id, flexilims_session=flexilims_session)
+        for name, record in zip(dataframe.index, dataframe.to_dict("records")):
+            kwargs = Dataset._format_record_to_kwargs(record, name)
+            kwargs.pop("project_id")
+            table._append(**kwargs)
+        return table
+
+    @classmethod
+    def from_datasets(cls, datasets, flexilims_session=None):
+        """Create a table from dataset objects
+
+        Args:
+            datasets (list): :py:class:`Dataset` objects, all in the same project
+            flexilims_session (flexilims.Session, optional): session to add to the
+                datasets. If None, use the session of the first dataset
+
+        Returns:
+            :py:class:`DatasetTable`: the table
+        """
+        datasets = list(datasets)
+        project_id = None
+        if len(datasets):
+            project_id = datasets[0].project_id
+            if flexilims_session is None:
+                flexilims_session = datasets[0].flexilims_session
+        table = cls(project_id=project_id, flexilims_session=flexilims_session)
+        for ds in datasets:
+            table.append(ds)
+        return table
+
+    def append(self, dataset):
+        """Add a dataset at the end of the table
+
+        Args:
+            dataset (:py:class:`Dataset`): dataset to add, in the project of the table
+        """
+        if dataset.project_id != self.project_id:
+            raise DatasetError("All datasets of a table must be in the same project")
+        self._append(
+            name=dataset.full_name,
+            path=dataset.path.as_posix(),
+            is_raw=dataset.is_raw,
+            dataset_type=dataset.dataset_type,
+            created=dataset.created,
+            genealogy=dataset.genealogy,
+            origin_id=dataset.origin_id,
+            extra_attributes=dataset.extra_attributes,
+            id=dataset.id,
+        )
+
+    def _append(
+        self,
+        name,
+        path,
+        is_raw,
+        dataset_type,
+        created,
+        genealogy,
+        origin_id,
+        extra_attributes,
+        id,
+    ):
+        if genealogy is None or not len(genealogy):
+            raise DatasetError("Datasets of a table must have a genealogy")
+        genealogy = tuple(genealogy)
+        if "_".join(genealogy) != name:
+            raise DatasetError(
+                "Genealogy does not correspond to flexilims name:"
+                + "\n %s: %s" % (name, genealogy)
+            )
+        dataset_type = str(dataset_type)
+        try:
+            type_code = self._types.index(dataset_type)
+        except ValueError:
+            type_code = len(self._types)
+            self._types.append(sys.intern(dataset_type))
+        parent = tuple(sys.intern(str(p)) for p in genealogy[:-1])
+        parent_code = self._parent_lookup.get(parent, None)
+        if parent_code is None:
+            parent_code = len(self._parents)
+            self._parents.append(parent)
+            self._parent_lookup[parent] = parent_code
+
+        row = len(self._ids)
+        for key in extra_attributes:
+            if key not in self._attributes:
+                self._attributes[sys.intern(key)] = [_MISSING] * row
+        for key, column in self._attributes.items():
+            column.append(_intern(extra_attributes.get(key, _MISSING)))
+        self._ids.append(id)
+        self._origin_ids.append(_intern(origin_id))
+        self._paths.append(str(path))
+        self._is_raw.append(_intern(is_raw))
+        self._created.append(created)
+        self._type_codes.append(type_code)
+        self._parent_codes.append(parent_code)
+        self._leaves.append(sys.intern(str(genealogy[-1])))
+        if self._name_index is not None:
+            self._name_index[name] = row
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def __contains__(self, name):
+        return name in self._get_name_index()
+
+    def __getitem__(self, key):
+        """Materialise a dataset
+
+        Args:
+            key (int or str): row number or name of the dataset
+
+        Returns:
+            :py:class:`Dataset`: the dataset or the subclass of its `dataset_type`
+        """
+        if isinstance(key, str):
+            return Dataset._from_checked_kwargs(
+                self.record(self.index(key)), self.flexilims_session
+            )
+        return Dataset._from_checked_kwargs(self.record(key), self.flexilims_session)
+
+    def _get_name_index(self):
+        if self._name_index is None:
+            self._name_index = {name: row for row, name in enumerate(self.names)}
+        return self._name_index
+
+    def index(self, name):
+        """Row number of a dataset
+
+        Args:
+            name (str): full name of the dataset
+
+        Returns:
+            int: row number
+        """
+        try:
+            return self._get_name_index()[name]
+        except KeyError:
+            raise KeyError("Dataset %s is not in the table" % name)
+
+    def genealogy(self, row):
+        """Genealogy of a dataset, without materialising it
+
+        Args:
+            row (int): row number
+
+        Returns:
+            tuple: genealogy of the dataset
+        """
+        return self._parents[self._parent_codes[row]] + (self._leaves[row],)
+
+    @property
+    def names(self):
+        """list: full names of the datasets, in order"""
+        return ["_".join(self.genealogy(row)) for row in range(len(self))]
+
+    @property
+    def dataset_types(self):
+        """list: dataset types of the datasets, in order"""
+        return [self._types[code] for code in self._type_codes]
+
+    def record(self, row):
+        """Constructor kwargs of a dataset, without materialising it
+
+        Args:
+            row (int): row number
+
+        Returns:
+            dict: kwargs for the :py:class:`Dataset` constructor, with `name`
+        """
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("DatasetTable index out of range")
+        genealogy = self.genealogy(row)
+        return dict(
+            path=self._paths[row],
+            is_raw=self._is_raw[row],
+            dataset_type=self._types[self._type_codes[row]],
+            created=self._created[row],
+            genealogy=genealogy,
+            origin_id=self._origin_ids[row],
+            extra_attributes={
+                k: v[row] for k, v in self._attributes.items() if v[row] is not _MISSING
+            },
+            project=self.project,
+            name="_".join(genealogy),
+            id=self._ids[row],
+        )
@@ -1,4 +1,6 @@
+import os
 import pathlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path, PurePosixPath
 import pandas as pd
@@ -6,6 +8,8 @@ import flexiznam as flz
 from flexiznam import utils
 from flexiznam.errors import FlexilimsError, DatasetError
 from flexiznam.config import PARAMETERS
+from flexiznam.schema.folder_scan import FolderScan, active_listings
+from flexiznam.schema import checksum, fingerprint as fingerprint_tools
 
 
 class Dataset(object):
@@ -20,33 +24,80 @@ class Dataset(object):
     SUBCLASSES = dict()
 
     @classmethod
-    def from_folder(cls, folder, verbose=False, flexilims_session=None, project=None):
+    def from_folder(
+        cls,
+        folder,
+        verbose=False,
+        flexilims_session=None,
+        project=None,
+        folder_scan=None,
+        max_workers=None,
+        fingerprint=False,
+    ):
         """Try to load all datasets found in the folder.
 
         Will try all defined subclasses of datasets and keep everything that does not
         crash. If you know which dataset to expect, use the subclass directly
+
+        The folder is listed only once and the listing is shared by all subclasses.
+
+        Args:
+            folder (str or Path): folder to parse
+            verbose (bool): print progress. Default False
+            flexilims_session (flexilims.Session): session to interact with flexilims
+            project (str): project ID or name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
+            max_workers (int): if not None, run the subclasses concurrently with a
+                pool of `max_workers` threads. The output is the same.
+            fingerprint (bool): compute the fingerprint of the files of each dataset
+                (see :py:meth:`compute_fingerprint`), with a pool of `max_workers`
+                threads. Default False
+
+        Returns:
+            dict: dictionary of datasets
         """
         folder = pathlib.Path(folder)
         if not folder.is_dir():
             raise IOError("%s is not a directory." % folder)
-        data = dict()
         if not cls.SUBCLASSES:
             raise IOError("Dataset subclasses not assigned")
-        for ds_type, ds_class in cls.SUBCLASSES.items():
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
+
+        def detect(ds_type, ds_class):
             if verbose:
                 print("Looking for %s" % ds_type)
             try:
-                res = ds_class.from_folder(
+                return ds_class.from_folder(
                     folder,
                     verbose=verbose,
                     flexilims_session=flexilims_session,
                     project=project,
+                    folder_scan=folder_scan,
                 )
             except OSError:
+                return None
+
+        if max_workers is None:
+            results = [detect(*item) for item in cls.SUBCLASSES.items()]
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(detect, *item) for item in cls.SUBCLASSES.items()
+                ]
+                results = [future.result() for future in futures]
+
+        data = dict()
+        for res in results:
+            if res is None:
                 continue
             if any(k in data for k in res):
                 raise DatasetError("Found two datasets with the same name")
             data.update(res)
+        if fingerprint:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for ds in data.values():
+                    ds.compute_fingerprint(executor=executor)
         return data
 
     @staticmethod
@@ -121,6 +172,73 @@ class Dataset(object):
             )
         return ds
 
+    @staticmethod
+    def from_dataframe(dataframe, flexilims_session=None):
+        """Create datasets from all rows of a flexilims dataframe
+
+        Same as calling `from_dataseries` on each row, but faster for large
+        dataframes: rows are not converted to series and the project of the
+        datasets is looked up once instead of once per dataset.
+
+        Args:
+            dataframe (pandas.DataFrame): formatted flexilims reply with one dataset
+                per row, for instance the output of `flz.get_children`. The index
+                must be the dataset names.
+            flexilims_session (flexilims.Session, optional): authentication session to
+                access flexilims. Will be added to all dataset objects.
+
+        Returns:
+            list: :py:class:`Dataset` (or subclasses) in the order of the rows
+        """
+        if not len(dataframe):
+            return []
+        session_project = getattr(flexilims_session, "project_id", None)
+        projects = dict()
+        for project_id in dataframe["project"].unique():
+            project = flz.main.lookup_project(project_id, flz.PARAMETERS)
+            if project is None:
+                raise IOError("Unknown project ID. Please update config file")
+            if (session_project is not None) and (session_project != project_id):
+                raise DatasetError(
+                    "Cannot use a flexilims_session from a different project"
+                )
+            projects[project_id] = project
+
+        datasets = []
+        for name, record in zip(dataframe.index, dataframe.to_dict("records")):
+            kwargs = Dataset._format_record_to_kwargs(record, name)
+            kwargs["project"] = projects[kwargs.pop("project_id")]
+            datasets.append(Dataset._from_checked_kwargs(kwargs, flexilims_session))
+        return datasets
+
+    @staticmethod
+    def _from_checked_kwargs(kwargs, flexilims_session):
+        """Create a dataset from kwargs of a project and session already checked
+
+        Args:
+            kwargs (dict): kwargs for the constructor, with `name` and `project`
+            flexilims_session (flexilims.Session): session, set without checking that
+                it belongs to the project
+
+        Returns:
+            :py:class:`Dataset`: dataset or subclass depending on `dataset_type`
+        """
+        kwargs = dict(kwargs)
+        name = kwargs.pop("name")
+        dataset_type = kwargs["dataset_type"]
+        if dataset_type in Dataset.SUBCLASSES:
+            kwargs.pop("dataset_type")
+            ds = Dataset.SUBCLASSES[dataset_type](**kwargs)
+        else:
+            ds = Dataset(**kwargs)
+        ds._flexilims_session = flexilims_session
+        if ds.full_name != name:
+            raise DatasetError(
+                "Genealogy does not correspond to flexilims name:"
+                + "\n %s: %s" % (name, ds.genealogy)
+            )
+        return ds
+
     @staticmethod
     def from_origin(
         project=None,
@@ -228,6 +346,7 @@ class Dataset(object):
                 dataset_root,
                 project_id=project,
                 flexilims_session=flexilims_session,
+                origin_id=origin["id"],
             )
             short_name = dataset_name[len(origin["name"]) + 1 :]
             genealogy = tuple(origin.genealogy) + (short_name,)
@@ -321,6 +440,21 @@ class Dataset(object):
     @staticmethod
     def _format_series_to_kwargs(flm_series):
         """Format a flm get reply into kwargs valid for Dataset constructor"""
+        return Dataset._format_record_to_kwargs(
+            dict(flm_series.items()), flm_series.name
+        )
+
+    @staticmethod
+    def _format_record_to_kwargs(record, name):
+        """Format one record of a formatted flm reply into kwargs for the constructor
+
+        Args:
+            record (dict): formatted flexilims reply, with attributes at the top level
+            name (str): name of the dataset
+
+        Returns:
+            dict: kwargs for the constructor, with `name` and `project_id`
+        """
         flm_attributes = {
             "id",
             "type",
@@ -333,21 +467,18 @@ class Dataset(object):
             "customEntities",
             "project",
         }
-        d = dict()
-        for k, v in flm_series.items():
-            d[k] = v
-        attr = {k: v for k, v in flm_series.items() if k not in flm_attributes}
+        attr = {k: v for k, v in record.items() if k not in flm_attributes}
         kwargs = dict(
             path=attr.pop("path"),
             is_raw=attr.pop("is_raw", None),
             dataset_type=attr.pop("dataset_type"),
             created=attr.pop("created", None),
             genealogy=attr.pop("genealogy", None),
-            origin_id=flm_series.get("origin_id", None),
+            origin_id=record.get("origin_id", None),
             extra_attributes=attr,
-            project_id=flm_series.project,
-            name=flm_series.name,
-            id=flm_series.id,
+            project_id=record["project"],
+            name=name,
+            id=record["id"],
         )
         return kwargs
 
@@ -426,11 +557,30 @@ class Dataset(object):
         Should be reimplemented in children classes.
         Should return True if the dataset is found a valid, false otherwise
         """
-        if not self.path_full.exists():
+        if not self._exists(self.path_full):
             msg = f"Path {self.path_full} does not exist"
             return msg if return_reason else False
         return "" if return_reason else True
 
+    @staticmethod
+    def _exists(path):
+        """Same as `path.exists()`, in the listing cache of `validate_datasets` if any
+
+        `is_valid` methods should use it to check files.
+        """
+        listings = active_listings()
+        if listings is None:
+            return Path(path).exists()
+        return listings.exists(path)
+
+    @staticmethod
+    def _listdir(folder):
+        """Same as `os.listdir`, in the listing cache of `validate_datasets` if any"""
+        listings = active_listings()
+        if listings is None:
+            return os.listdir(folder)
+        return listings.listdir(folder)
+
     def associated_files(self, folder=None):
         """Give a list of all files associated with this dataset
 
@@ -438,11 +588,115 @@ class Dataset(object):
             folder: Where to look for files? default to self.path
 
         Returns:
+            list: paths of the files, in `folder`
         """
         raise NotImplementedError(
             "`associated_files` is not defined for generic " "datasets"
         )
 
+    def _files_folder(self):
+        """Folder containing the associated files, the default of `associated_files`"""
+        if self.path.is_absolute():
+            # datasets created by `from_folder` might not have a project yet
+            return self.path
+        return self.path_full
+
+    def compute_fingerprint(self, max_workers=None, executor=None):
+        """Fingerprint the associated files
+
+        The fingerprint records the size, modification time and a hash of a sample of
+        the content of each file (see :py:mod:`flexiznam.schema.fingerprint`). It is
+        stored in `extra_attributes["fingerprint"]`.
+
+        Args:
+            max_workers (int, optional): number of threads, if `executor` is None
+            executor (concurrent.futures.Executor, optional): executor to use
+
+        Returns:
+            dict: the fingerprint
+        """
+        fingerprint = fingerprint_tools.compute_fingerprint(
+            self.associated_files(),
+            self._files_folder(),
+            max_workers=max_workers,
+            executor=executor,
+        )
+        self.extra_attributes["fingerprint"] = fingerprint
+        return fingerprint
+
+    def verify(self, deep=False, max_workers=None, executor=None):
+        """Check that the associated files did not change since the fingerprint
+
+        Args:
+            deep (bool): hash the samples of all files again. By default, only files
+                whose size or modification time changed are hashed again.
+            max_workers (int, optional): number of threads, if `executor` is None
+            executor (concurrent.futures.Executor, optional): executor to use
+
+        Returns:
+            dict: file name to reason, for the files that changed. Empty if nothing
+                changed
+        """
+        if "fingerprint" not in self.extra_attributes:
+            raise DatasetError("Dataset %s has no fingerprint" % self.full_name)
+        return fingerprint_tools.verify_fingerprint(
+            self.extra_attributes["fingerprint"],
+            self._files_folder(),
+            deep=deep,
+            max_workers=max_workers,
+            executor=executor,
+        )
+
+    def compute_checksums(
+        self, algorithm="md5", piece_size=None, state_file=None, max_workers=None
+    ):
+        """Compute the checksums of the associated files
+
+        The files are read entirely. The checksums are stored in
+        `extra_attributes["checksums"]`, as a dict with the `algorithm`, the
+        `piece_size` and the `files`, a list of records with `file`, `size`,
+        `mtime_ns` and `digest`. To hash the files of many datasets concurrently,
+        use :py:func:`flexiznam.schema.checksum.checksum_datasets`.
+
+        Args:
+            algorithm (str): `md5` or, if `xxhash` is installed, `xxh64` or
+                `xxh3_128`. Default `md5`
+            piece_size (int, optional): hash pieces of `piece_size` bytes
+                independently, see :py:mod:`flexiznam.schema.checksum`. Default None,
+                hash whole files.
+            state_file (str or pathlib.Path, optional): file recording the progress,
+                to resume an interrupted run
+            max_workers (int, optional): number of threads
+
+        Returns:
+            dict: the checksums
+        """
+        return checksum.checksum_datasets(
+            [self],
+            algorithm=algorithm,
+            piece_size=piece_size,
+            state_file=state_file,
+            max_workers=max_workers,
+        )[0]
+
+    def verify_checksums(self, max_workers=None):
+        """Compute the checksums of the associated files again and compare them
+
+        Args:
+            max_workers (int, optional): number of threads
+
+        Returns:
+            dict: file name to reason, for the files that changed. Empty if nothing
+                changed
+        """
+        if "checksums" not in self.extra_attributes:
+            raise DatasetError("Dataset %s has no checksums" % self.full_name)
+        return checksum.verify_checksums(
+            self.extra_attributes["checksums"],
+            self._files_folder(),
+            max_workers=max_workers,
+        )
+
     def get_flexilims_entry(self):
         """Get the flexilims entry for this dataset
 
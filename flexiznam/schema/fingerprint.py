@@ -0,0 +1,164 @@
+"""Content fingerprints of the files of a dataset
+
+A fingerprint records, for each file associated with a dataset, its size, its
+modification time and a blake2b hash of a sample of its content. Small files are
+hashed entirely. For files larger than `n_blocks * block_size`, only `n_blocks` blocks
+spread evenly over the file (including the first and last blocks) are hashed, so that
+the cost does not depend on the size of the file and multi-TB sessions can be
+fingerprinted without reading them.
+
+The fingerprint is JSON compatible and is stored in the `fingerprint` extra attribute
+of the dataset (see :py:meth:`flexiznam.schema.datasets.Dataset.compute_fingerprint`
+and :py:meth:`flexiznam.schema.datasets.Dataset.verify`)::
+
+    {
+        "block_size": 1048576,
+        "n_blocks": 8,
+        "files": [
+            {"file": "video.avi", "size": 123, "mtime_ns": 1690000000, "blake2b": "..."},
+        ],
+    }
+"""
+import hashlib
+import os
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
+
+BLOCK_SIZE = 1 << 20
+N_BLOCKS = 8
+
+
+def sample_hash(path, block_size=BLOCK_SIZE, n_blocks=N_BLOCKS, size=None):
+    """Hash of a sample of the content of a file
+
+    Args:
+        path (str or pathlib.Path): path to the file
+        block_size (int): size of the blocks read, in bytes
+        n_blocks (int): number of blocks read in files larger than
+            `n_blocks * block_size`. Must be at least 2.
+        size (int, optional): size of the file, if already known
+
+    Returns:
+        str: hexadecimal blake2b digest of the size and the blocks
+    """
+    if n_blocks < 2:
+        raise ValueError("n_blocks must be at least 2")
+    if size is None:
+        size = os.stat(path).st_size
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(size.to_bytes(8, "little"))
+    with open(path, "rb") as f:
+        if size <= block_size * n_blocks:
+            for block in iter(lambda: f.read(block_size), b""):
+                digest.update(block)
+        else:
+            step = (size - block_size) / (n_blocks - 1)
+            for i in range(n_blocks):
+                f.seek(int(round(i * step)))
+                digest.update(f.read(block_size))
+    return digest.hexdigest()
+
+
+def file_fingerprint(path, block_size=BLOCK_SIZE, n_blocks=N_BLOCKS):
+    """Size, modification time and sampled hash of a file
+
+    Args:
+        path (str or pathlib.Path): path to the file
+        block_size (int): size of the blocks read, in bytes
+        n_blocks (int): number of blocks read in large files
+
+    Returns:
+        dict: with `size`, `mtime_ns` and `blake2b`
+    """
+    file_stat = os.stat(path)
+    return dict(
+        size=file_stat.st_size,
+        mtime_ns=file_stat.st_mtime_ns,
+        blake2b=sample_hash(path, block_size, n_blocks, size=file_stat.st_size),
+    )
+
+
+def _map(function, iterable, max_workers, executor):
+    if executor is not None:
+        return list(executor.map(function, iterable))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(function, iterable))
+
+
+def compute_fingerprint(
+    files,
+    folder,
+    block_size=BLOCK_SIZE,
+    n_blocks=N_BLOCKS,
+    max_workers=None,
+    executor=None,
+):
+    """Fingerprint a list of files, in parallel
+
+    Args:
+        files (list): paths of the files, in `folder`
+        folder (str or pathlib.Path): folder of the dataset. File names are stored
+            relative to it
+        block_size (int): size of the blocks read, in bytes
+        n_blocks (int): number of blocks read in large files
+        max_workers (int, optional): number of threads, if `executor` is None
+        executor (concurrent.futures.Executor, optional): executor to use
+
+    Returns:
+        dict: JSON compatible fingerprint
+    """
+    folder = pathlib.Path(folder)
+    files = [pathlib.Path(f) for f in files]
+    records = _map(
+        lambda f: file_fingerprint(f, block_size, n_blocks),
+        files,
+        max_workers,
+        executor,
+    )
+    for file, record in zip(files, records):
+        record["file"] = file.relative_to(folder).as_posix()
+    return dict(block_size=block_size, n_blocks=n_blocks, files=records)
+
+
+def verify_fingerprint(
+    fingerprint, folder, deep=False, max_workers=None, executor=None
+):
+    """Check that files did not change since they were fingerprinted
+
+    Only the size and modification time of the files are checked, unless they
+    changed or `deep` is True: the sampled hash is then computed again. A file with a
+    new modification time but the same sampled hash is considered unchanged.
+
+    Args:
+        fingerprint (dict): output of :py:func:`compute_fingerprint`
+        folder (str or pathlib.Path): folder of the dataset
+        deep (bool): always compute the sampled hash again. Default False
+        max_workers (int, optional): number of threads, if `executor` is None
+        executor (concurrent.futures.Executor, optional): executor to use
+
+    Returns:
+        dict: file name to reason, for the files that changed. Empty if nothing
+            changed
+    """
+    folder = pathlib.Path(folder)
+    block_size = fingerprint["block_size"]
+    n_blocks = fingerprint["n_blocks"]
+
+    def check(record):
+        path = folder / record["file"]
+        try:
+            file_stat = os.stat(path)
+        except FileNotFoundError:
+            return "file is missing"
+        if file_stat.st_size != record["size"]:
+            return "size changed from %d to %d" % (record["size"], file_stat.st_size)
+        if (not deep) and (file_stat.st_mtime_ns == record["mtime_ns"]):
+            return ""
+        new_hash = sample_hash(path, block_size, n_blocks, size=file_stat.st_size)
+        if new_hash != record["blake2b"]:
+            return "content changed"
+        return ""
+
+    records = fingerprint["files"]
+    reasons = _map(check, records, max_workers, executor)
+    return {r["file"]: reason for r, reason in zip(records, reasons) if reason}
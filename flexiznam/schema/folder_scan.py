@@ -0,0 +1,221 @@
+"""Listing of a folder shared by all the dataset detectors
+
+:py:meth:`flexiznam.schema.datasets.Dataset.from_folder` tries every dataset
+subclass on the same folder. Each of them used to list the folder and stat the files
+it found, which is slow on network storage. A :py:class:`FolderScan` lists a folder
+once with `os.scandir` and keeps the entries, and their `stat`, for all the
+subclasses::
+
+    scan = FolderScan(folder)
+    CameraData.from_folder(folder, folder_scan=scan)
+    HarpData.from_folder(folder, folder_scan=scan)
+
+The listing is not updated if the folder changes, create a new scan instead.
+
+:py:class:`ListingCache` does the same for many paths spread over many folders, for
+instance to check that all the paths of a project exist. Paths are grouped by parent
+folder and each folder is listed once, on a thread pool. Within a
+:py:func:`use_listings` block, the `is_valid` methods of the datasets check their
+files in a listing cache instead of the file system.
+"""
+import contextlib
+import fnmatch
+import os
+import pathlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_ACTIVE = threading.local()
+
+
+class FolderScan(object):
+    """Entries of one folder, listed once
+
+    Attributes:
+        folder (pathlib.Path): path to the folder
+        entries (dict): file name to :py:class:`os.DirEntry`, in the order
+            returned by the file system (same as `os.listdir`)
+    """
+
+    def __init__(self, folder):
+        """List a folder
+
+        Args:
+            folder (str or pathlib.Path): path to the folder
+
+        Raises:
+            IOError: if folder is not a directory
+        """
+        self.folder = pathlib.Path(folder)
+        if not self.folder.is_dir():
+            raise IOError("%s is not a directory." % self.folder)
+        with os.scandir(self.folder) as it:
+            self.entries = {entry.name: entry for entry in it}
+
+    @classmethod
+    def from_folder(cls, folder, folder_scan=None):
+        """Reuse `folder_scan` if it lists `folder`, otherwise scan the folder
+
+        Args:
+            folder (str or pathlib.Path): path to the folder
+            folder_scan (FolderScan, optional): existing scan
+
+        Returns:
+            FolderScan: scan of `folder`
+        """
+        if (folder_scan is not None) and (folder_scan.folder == pathlib.Path(folder)):
+            return folder_scan
+        return cls(folder)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def listdir(self):
+        """Names of all entries, like `os.listdir`"""
+        return list(self.entries)
+
+    def glob(self, pattern):
+        """Paths of the entries matching a pattern, like `folder.glob(pattern)`
+
+        Only patterns without separator are supported, the folder is not walked
+        recursively.
+        """
+        return [self.folder / n for n in fnmatch.filter(self.entries, pattern)]
+
+    def stat(self, name):
+        """`os.stat` of an entry, cached after the first call"""
+        return self.entries[name].stat()
+
+    def is_dir(self, name):
+        """True if the entry is a directory (following symlinks)"""
+        return self.entries[name].is_dir()
+
+    def is_file(self, name):
+        """True if the entry is a file (following symlinks)"""
+        return self.entries[name].is_file()
+
+
+class ListingCache(object):
+    """Listings of the parent folders of many paths
+
+    Checking a path in a listed folder does not touch the file system, except to
+    follow symlinks. A path whose parent does not exist does not exist either. Only
+    paths whose parent exists but cannot be listed (no read permission for instance)
+    are checked with `os.stat`. Like :py:class:`FolderScan`, the listings are not
+    updated if the folders change.
+
+    Attributes:
+        listings (dict): folder to dict of file name to :py:class:`os.DirEntry`
+            (empty if the folder does not exist), or None if the folder cannot be
+            listed
+    """
+
+    def __init__(self):
+        self.listings = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _split(path):
+        return os.path.split(os.path.normpath(os.fspath(path)))
+
+    @staticmethod
+    def _scan(folder):
+        try:
+            with os.scandir(folder) as it:
+                return {entry.name: entry for entry in it}
+        except (FileNotFoundError, NotADirectoryError):
+            return dict()
+        except OSError:
+            return None
+
+    def prefetch(self, paths, max_workers=None):
+        """List the parent folders of all paths
+
+        Args:
+            paths (list): paths that will be checked
+            max_workers (int, optional): number of threads listing folders. Default
+                to the `concurrent.futures.ThreadPoolExecutor` default.
+        """
+        with self._lock:
+            folders = {self._split(p)[0] for p in paths} - set(self.listings)
+        folders = list(folders)
+        if not folders:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            listings = list(executor.map(self._scan, folders))
+        with self._lock:
+            for folder, listing in zip(folders, listings):
+                self.listings.setdefault(folder, listing)
+
+    def _entry(self, path):
+        """Entry of a path in the listing of its parent, listing it if needed
+
+        Returns:
+            :py:class:`os.DirEntry`: the entry, False if it is not in the listing or
+                None if the parent cannot be listed
+        """
+        folder, name = self._split(path)
+        with self._lock:
+            listed = folder in self.listings
+        if not listed:
+            self.prefetch([path], max_workers=1)
+        listing = self.listings[folder]
+        if listing is None:
+            return None
+        return listing.get(name, False)
+
+    def exists(self, path):
+        """Same as `os.path.exists`"""
+        entry = self._entry(path)
+        if entry is None or (entry and entry.is_symlink()):
+            return os.path.exists(path)
+        return bool(entry)
+
+    def is_dir(self, path):
+        """Same as `os.path.isdir`"""
+        entry = self._entry(path)
+        if entry is None:
+            return os.path.isdir(path)
+        return bool(entry) and entry.is_dir()
+
+    def is_file(self, path):
+        """Same as `os.path.isfile`"""
+        entry = self._entry(path)
+        if entry is None:
+            return os.path.isfile(path)
+        return bool(entry) and entry.is_file()
+
+    def listdir(self, folder):
+        """Same as `os.listdir`"""
+        folder = os.path.normpath(os.fspath(folder))
+        with self._lock:
+            listed = folder in self.listings
+        if not listed:
+            listing = self._scan(folder)
+            with self._lock:
+                self.listings.setdefault(folder, listing)
+        listing = self.listings[folder]
+        if not listing:
+            # cannot be listed, missing or empty: let os.listdir decide
+            return os.listdir(folder)
+        return list(listing)
+
+
+@contextlib.contextmanager
+def use_listings(listings):
+    """Use a listing cache for the file checks of datasets in the current thread
+
+    Args:
+        listings (ListingCache): cache to use in the block
+    """
+    previous = getattr(_ACTIVE, "listings", None)
+    _ACTIVE.listings = listings
+    try:
+        yield listings
+    finally:
+        _ACTIVE.listings = previous
+
+
+def active_listings():
+    """Listing cache of the current :py:func:`use_listings` block, or None"""
+    return getattr(_ACTIVE, "listings", None)
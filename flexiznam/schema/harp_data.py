@@ -1,9 +1,10 @@
 import datetime
-import os
 import pathlib
 import re
 
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
+from flexiznam.schema.harp_messages import load_messages
 
 
 class HarpData(Dataset):
@@ -18,6 +19,7 @@ class HarpData(Dataset):
         verbose=True,
         flexilims_session=None,
         project=None,
+        folder_scan=None,
     ):
         """Create a harp dataset by loading info from folder
 
@@ -29,12 +31,15 @@ class HarpData(Dataset):
             verbose (bool=True): print info about what is found
             flexilims_session (flm.Session): session to interact with flexilims
             project (str): project ID or name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of dataset (flz.schema.harp_data.HarpData)
         """
 
-        fnames = [f for f in os.listdir(folder) if f.endswith((".csv", ".bin"))]
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
+        fnames = [f for f in folder_scan.listdir() if f.endswith((".csv", ".bin"))]
         bin_files = [f for f in fnames if f.endswith(".bin")]
         csv_files = [f for f in fnames if f.endswith(".csv")]
         if not bin_files:
@@ -65,8 +70,9 @@ class HarpData(Dataset):
                 raise IOError("A csv file matched with multiple binary files.")
             matched_files.update(associated_csv.values())
 
-            bin_path = pathlib.Path(folder) / bin_file
-            created = datetime.datetime.fromtimestamp(bin_path.stat().st_mtime)
+            created = datetime.datetime.fromtimestamp(
+                folder_scan.stat(bin_file).st_mtime
+            )
             extra_attributes = dict(
                 binary_file=bin_file,
                 csv_files=associated_csv,
@@ -161,6 +167,34 @@ class HarpData(Dataset):
     def csv_files(self, value):
         self.extra_attributes["csv_files"] = str(value)
 
+    def load_messages(self):
+        """Read the binary file
+
+        The file is memory mapped and decoded with numpy, see
+        :py:mod:`flexiznam.schema.harp_messages`.
+
+        Returns:
+            :py:class:`flexiznam.schema.harp_messages.HarpMessages`: the messages,
+                with per register decoding and time slicing
+        """
+        return load_messages(self._files_folder() / self.binary_file)
+
+    def associated_files(self, folder=None):
+        """Binary file and csv files
+
+        Args:
+            folder: Where to look for files? default to self.path_full
+
+        Returns:
+            list: paths of the files
+        """
+        if folder is None:
+            folder = self._files_folder()
+        files = [pathlib.Path(folder) / self.binary_file]
+        if isinstance(self.csv_files, dict):
+            files.extend(pathlib.Path(folder) / f for f in self.csv_files.values())
+        return files
+
     def is_valid(self, return_reason=False):
         """Check that video, metadata and timestamps files exist
 
@@ -168,11 +202,11 @@ class HarpData(Dataset):
             return_reason (bool): if True, return a string with the reason why the
                                   dataset is not valid
         Returns:"""
-        if not (self.path_full / self.binary_file).exists():
+        if not self._exists(self.path_full / self.binary_file):
             msg = f"Missing file {self.binary_file}"
             return msg if return_reason else False
         for _, file_path in self.csv_files.items():
-            if not (self.path_full / file_path).exists():
+            if not self._exists(self.path_full / file_path):
                 msg = f"Missing file {file_path}"
                 return msg if return_reason else False
         return "" if return_reason else True
@@ -0,0 +1,294 @@
+"""Vectorised reader of Harp binary files
+
+A Harp `.bin` file is the stream of messages sent by a device. Each message is::
+
+    message type (1 byte), length (1 byte), address (1 byte), port (1 byte),
+    payload type (1 byte), [seconds (uint32), 32 us ticks (uint16)], payload,
+    checksum (1 byte)
+
+`length` counts the bytes after itself, the timestamp is present if the payload type
+has the 0x10 flag and the checksum is the sum of all other bytes modulo 256.
+
+Messages have different lengths, so the file cannot be reshaped directly. Instead of
+walking it message by message in python, :py:func:`find_messages` tests every byte
+as a potential message start, keeping those with a valid header and checksum (using a
+cumulative sum modulo 256), then keeps the chain of candidates that starts at the
+beginning of the file, using pointer doubling. Everything is done with numpy on a
+memory map of the file. Payloads are only decoded when a register is accessed.
+"""
+import os
+import numpy as np
+
+TIMESTAMP_FLAG = 0x10
+ERROR_FLAG = 0x08
+TICK_DURATION = 32e-6
+
+# payload type (without timestamp flag) to numpy dtype
+PAYLOAD_DTYPES = {
+    0x01: np.dtype("u1"),
+    0x81: np.dtype("i1"),
+    0x02: np.dtype("<u2"),
+    0x82: np.dtype("<i2"),
+    0x04: np.dtype("<u4"),
+    0x84: np.dtype("<i4"),
+    0x08: np.dtype("<u8"),
+    0x88: np.dtype("<i8"),
+    0x44: np.dtype("<f4"),
+}
+
+# size of the elements of each payload type byte, 0 if the payload type is invalid
+_ELEMENT_SIZE = np.zeros(256, dtype=np.int64)
+for _payload_type, _dtype in PAYLOAD_DTYPES.items():
+    _ELEMENT_SIZE[_payload_type] = _dtype.itemsize
+    _ELEMENT_SIZE[_payload_type | TIMESTAMP_FLAG] = _dtype.itemsize
+_IS_PAYLOAD_TYPE = _ELEMENT_SIZE > 0
+
+MESSAGE_DTYPE = np.dtype(
+    [
+        ("message_type", "u1"),
+        ("address", "u1"),
+        ("port", "u1"),
+        ("payload_type", "u1"),
+        ("timestamp", "<f8"),
+    ]
+)
+
+
+def _gather(data, offsets, start, n_bytes):
+    """Bytes `start` to `start + n_bytes` of each message, as an array of shape
+    (len(offsets), n_bytes)"""
+    return data[offsets[:, np.newaxis] + np.arange(start, start + n_bytes)]
+
+
+def find_messages(data):
+    """Find the start of all messages in a Harp byte stream
+
+    Args:
+        data (numpy.ndarray): uint8 array with the content of the file
+
+    Returns:
+        numpy.ndarray: offsets of the messages, in bytes. An incomplete message at
+            the end of the stream is ignored.
+    """
+    n_bytes = len(data)
+    if n_bytes < 6:
+        return np.zeros(0, dtype=np.int64)
+    # headers: message type 1, 2 or 3 (maybe with error flag) and valid payload type
+    message_type = data[: n_bytes - 5] & ~np.uint8(ERROR_FLAG)
+    is_header = (message_type >= 1) & (message_type <= 3)
+    is_header &= _IS_PAYLOAD_TYPE[data[4 : n_bytes - 1]]
+    candidates = np.flatnonzero(is_header)
+
+    # the length must fit the payload type and the message be in the file
+    total_length = data[candidates + 1].astype(np.int64) + 2
+    payload_type = data[candidates + 4]
+    payload_length = total_length - 6
+    payload_length -= np.where(payload_type & TIMESTAMP_FLAG, 6, 0)
+    element_size = _ELEMENT_SIZE[payload_type]
+    valid = (payload_length > 0) & (payload_length % element_size == 0)
+    valid &= candidates + total_length <= n_bytes
+    candidates = candidates[valid]
+    total_length = total_length[valid]
+
+    # checksum: sum of the message bytes but the last, modulo 256
+    cumsum = np.cumsum(data, dtype=np.uint8)
+    last = candidates + total_length - 1
+    before = np.where(candidates > 0, cumsum[np.maximum(candidates - 1, 0)], 0)
+    checksum = (cumsum[last - 1] - before.astype(np.uint8)).astype(np.uint8)
+    valid = checksum == data[last]
+    candidates = candidates[valid]
+    total_length = total_length[valid]
+    n_candidates = len(candidates)
+    if not n_candidates:
+        return candidates
+
+    # index of the candidate following each candidate, n_candidates if none
+    next_offset = candidates + total_length
+    next_index = np.searchsorted(candidates, next_offset)
+    found = next_index < n_candidates
+    found[found] = candidates[next_index[found]] == next_offset[found]
+    jump = np.append(np.where(found, next_index, n_candidates), n_candidates)
+
+    # pointer doubling: after k steps, `in_chain` has the first 2**k messages and
+    # `jump` points 2**k messages ahead
+    in_chain = np.zeros(n_candidates + 1, dtype=bool)
+    in_chain[0] = True
+    # the end of the chain is never added
+    in_chain[n_candidates] = True
+    chain = np.array([0])
+    while True:
+        new = jump[chain]
+        new = new[~in_chain[new]]
+        if not len(new):
+            break
+        in_chain[new] = True
+        chain = np.concatenate([chain, new])
+        jump = jump[jump]
+    return candidates[in_chain[:n_candidates]]
+
+
+class HarpMessages(object):
+    """Messages of a Harp binary file
+
+    Message headers are decoded for all messages, payloads are decoded by
+    :py:meth:`register`.
+
+    Attributes:
+        data (numpy.ndarray): uint8 content of the file, usually a memory map
+        offsets (numpy.ndarray): offset of each message in `data`
+        messages (numpy.ndarray): structured array with the `message_type`,
+            `address`, `port`, `payload_type` and `timestamp` (in seconds, NaN if the
+            message has no timestamp) of each message
+    """
+
+    def __init__(self, data, offsets=None, messages=None):
+        """Decode the headers of the messages of a Harp stream
+
+        Args:
+            data (numpy.ndarray): uint8 content of the file
+            offsets (numpy.ndarray, optional): offsets of the messages, found with
+                :py:func:`find_messages` if None
+            messages (numpy.ndarray, optional): decoded headers of the messages at
+                `offsets`
+        """
+        self.data = data
+        if offsets is None:
+            offsets = find_messages(data)
+        self.offsets = offsets
+        if messages is None:
+            messages = self._decode_headers()
+        self.messages = messages
+
+    @classmethod
+    def from_file(cls, path):
+        """Memory map a Harp binary file and decode it
+
+        Args:
+            path (str or pathlib.Path): path to the `.bin` file
+
+        Returns:
+            :py:class:`HarpMessages`: the messages
+        """
+        if not os.path.getsize(path):
+            return cls(np.zeros(0, dtype=np.uint8))
+        return cls(np.memmap(path, dtype=np.uint8, mode="r"))
+
+    def _decode_headers(self):
+        offsets = self.offsets
+        messages = np.zeros(len(offsets), dtype=MESSAGE_DTYPE)
+        header = _gather(self.data, offsets, 0, 5)
+        messages["message_type"] = header[:, 0]
+        messages["address"] = header[:, 2]
+        messages["port"] = header[:, 3]
+        messages["payload_type"] = header[:, 4]
+        messages["timestamp"] = np.nan
+        has_timestamp = (header[:, 4] & TIMESTAMP_FLAG) > 0
+        timestamp = _gather(self.data, offsets[has_timestamp], 5, 6)
+        seconds = np.ascontiguousarray(timestamp[:, :4]).view("<u4")[:, 0]
+        ticks = np.ascontiguousarray(timestamp[:, 4:]).view("<u2")[:, 0]
+        messages["timestamp"][has_timestamp] = seconds + ticks * TICK_DURATION
+        return messages
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, key):
+        """Subset of the messages, without copying the file
+
+        Args:
+            key (slice or numpy.ndarray): slice, boolean mask or indices
+
+        Returns:
+            :py:class:`HarpMessages`: the selected messages
+        """
+        return HarpMessages(self.data, self.offsets[key], self.messages[key])
+
+    @property
+    def addresses(self):
+        """numpy.ndarray: sorted addresses of the registers present"""
+        return np.unique(self.messages["address"])
+
+    @property
+    def timestamps(self):
+        """numpy.ndarray: timestamp of each message, in seconds"""
+        return self.messages["timestamp"]
+
+    def time_slice(self, start=None, stop=None):
+        """Messages with `start <= timestamp < stop`
+
+        Args:
+            start (float, optional): first time, in seconds
+            stop (float, optional): end time, in seconds (excluded)
+
+        Returns:
+            :py:class:`HarpMessages`: the selected messages
+        """
+        timestamps = self.timestamps
+        if np.all(timestamps[1:] >= timestamps[:-1]):
+            first = 0 if start is None else np.searchsorted(timestamps, start, "left")
+            last = len(self) if stop is None else np.searchsorted(timestamps, stop)
+            return self[first:last]
+        keep = np.ones(len(self), dtype=bool)
+        if start is not None:
+            keep &= timestamps >= start
+        if stop is not None:
+            keep &= timestamps < stop
+        return self[keep]
+
+    def register(self, address, message_type=None):
+        """Decode the payload of all messages of a register
+
+        Args:
+            address (int): address of the register
+            message_type (int, optional): keep only messages of this type (1 read, 2
+                write, 3 event)
+
+        Returns:
+            numpy.ndarray: structured array with the `timestamp` and the `payload`
+                of each message. `payload` has the dtype of the register and has one
+                column per value if the register has several values.
+        """
+        keep = self.messages["address"] == address
+        if message_type is not None:
+            types = self.messages["message_type"] & ~np.uint8(ERROR_FLAG)
+            keep &= types == message_type
+        offsets = self.offsets[keep]
+        messages = self.messages[keep]
+        if not len(offsets):
+            raise KeyError("No message for register %d" % address)
+        payload_types = np.unique(messages["payload_type"])
+        lengths = np.unique(self.data[offsets + 1])
+        if (len(payload_types) > 1) or (len(lengths) > 1):
+            raise ValueError(
+                "Register %d has messages of different types or lengths" % address
+            )
+        payload_type = int(payload_types[0])
+        has_timestamp = bool(payload_type & TIMESTAMP_FLAG)
+        dtype = PAYLOAD_DTYPES[payload_type & ~TIMESTAMP_FLAG]
+        start = 11 if has_timestamp else 5
+        n_bytes = int(lengths[0]) + 2 - start - 1
+        n_values = n_bytes // dtype.itemsize
+        payload = np.ascontiguousarray(_gather(self.data, offsets, start, n_bytes))
+        payload = payload.view(dtype)
+        if n_values == 1:
+            output = np.zeros(len(offsets), [("timestamp", "<f8"), ("payload", dtype)])
+            output["payload"] = payload[:, 0]
+        else:
+            output = np.zeros(
+                len(offsets), [("timestamp", "<f8"), ("payload", dtype, (n_values,))]
+            )
+            output["payload"] = payload
+        output["timestamp"] = messages["timestamp"]
+        return output
+
+
+def load_messages(path):
+    """Read a Harp binary file
+
+    Args:
+        path (str or pathlib.Path): path to the `.bin` file
+
+    Returns:
+        :py:class:`HarpMessages`: the messages
+    """
+    return HarpMessages.from_file(path)
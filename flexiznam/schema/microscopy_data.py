@@ -1,9 +1,9 @@
 import datetime
-import os
 import pathlib
 import warnings
 from flexiznam.config import PARAMETERS
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
 from flexiznam.schema.scanimage_data import parse_si_filename
 
 
@@ -35,6 +35,7 @@ class MicroscopyData(Dataset):
         verbose=True,
         flexilims_session=None,
         project=None,
+        folder_scan=None,
     ):
         """Create Microscopy datasets by loading info from folder
 
@@ -46,6 +47,8 @@ class MicroscopyData(Dataset):
             verbose (bool=True): print info about what is found
             flexilims_session (flm.Session): session to interact with flexilims
             project (str): project ID or name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of dataset (flz.schema.microscopy_data.MicroscopyData)
@@ -53,9 +56,10 @@ class MicroscopyData(Dataset):
         folder = pathlib.Path(folder)
         if not folder.is_dir():
             raise IOError("%s is not a folder" % folder)
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
         fnames = [
             f
-            for f in os.listdir(folder)
+            for f in folder_scan.listdir()
             if f.lower().endswith(tuple(MicroscopyData.VALID_EXTENSIONS))
         ]
 
@@ -69,7 +73,7 @@ class MicroscopyData(Dataset):
         for f in fnames:
             if not (f.lower().endswith("tif") or f.lower().endswith("tiff")):
                 continue
-            if parse_si_filename(folder / f) is None:
+            if parse_si_filename(folder / f, file_stat=folder_scan.stat(f)) is None:
                 continue
             else:
                 si_fnames.append(f)
@@ -81,7 +85,7 @@ class MicroscopyData(Dataset):
         for fname in fnames:
             dataset_path = pathlib.Path(folder) / fname
             genealogy = folder_genealogy + (fname,)
-            created = datetime.datetime.fromtimestamp(dataset_path.stat().st_mtime)
+            created = datetime.datetime.fromtimestamp(folder_scan.stat(fname).st_mtime)
             output[fname] = MicroscopyData(
                 genealogy=genealogy,
                 is_raw=is_raw,
@@ -140,6 +144,23 @@ class MicroscopyData(Dataset):
             flexilims_session=flexilims_session,
         )
 
+    def associated_files(self, folder=None):
+        """The file of the dataset
+
+        Args:
+            folder: Where to look for files? default to the folder containing
+                self.path_full
+
+        Returns:
+            list: path of the file
+        """
+        if folder is None:
+            folder = self._files_folder()
+        return [pathlib.Path(folder) / self.path.name]
+
+    def _files_folder(self):
+        return super()._files_folder().parent
+
     def is_valid(self, return_reason=False):
         """Check that file exist
 
@@ -147,7 +168,7 @@ class MicroscopyData(Dataset):
             return_reason (bool): if True, return a string with the reason why the
                                   dataset is not valid
         Returns:"""
-        if not self.path_full.exists():
+        if not self._exists(self.path_full):
             msg = f"{self.path_full} does not exist"
             return msg if return_reason else False
         return "" if return_reason else True
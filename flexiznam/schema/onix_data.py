@@ -1,9 +1,9 @@
 import datetime
-import os
 import pathlib
 import re
 import pandas as pd
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
 
 
 class OnixData(Dataset):
@@ -21,6 +21,7 @@ class OnixData(Dataset):
         flexilims_session=None,
         project=None,
         enforce_validity=True,
+        folder_scan=None,
     ):
         """Create a Onix dataset by loading info from folder
 
@@ -35,6 +36,8 @@ class OnixData(Dataset):
             project (str): project ID or name
             enforce_validity (bool): True by default. Refuse to create onix dataset
                 if they don't have a rhd2164 and a breakout file
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of datasets (fzm.schema.onix_data.OnixData)
@@ -47,7 +50,7 @@ class OnixData(Dataset):
 
         fnames = [
             f
-            for f in os.listdir(folder)
+            for f in FolderScan.from_folder(folder, folder_scan).listdir()
             if f.endswith(tuple(OnixData.VALID_EXTENSIONS))
         ]
         if not len(fnames):
@@ -154,6 +157,24 @@ class OnixData(Dataset):
             flexilims_session=flexilims_session,
         )
 
+    def associated_files(self, folder=None):
+        """Files of all devices
+
+        Args:
+            folder: Where to look for files? default to self.path_full
+
+        Returns:
+            list: paths of the files
+        """
+        if folder is None:
+            folder = self._files_folder()
+        files = []
+        for device_name in OnixData.DEVICE_NAMES:
+            if device_name in self.extra_attributes:
+                dev_dict = self.extra_attributes[device_name]
+                files.extend(pathlib.Path(folder) / f for f in dev_dict.values())
+        return files
+
     def is_valid(self, return_reason=False):
         """Check that the onix dataset is valid
 
@@ -173,7 +194,7 @@ class OnixData(Dataset):
             dev_dict = self.extra_attributes[device_name]
             for v in dev_dict.values():
                 p = self.path_full / v
-                if not p.exists():
+                if not self._exists(p):
                     msg = f"File {p} does not exist"
                     return msg if return_reason else False
         if ndevices == 0:
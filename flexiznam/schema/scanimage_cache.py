@@ -0,0 +1,150 @@
+"""On-disk cache of ScanImage tif headers
+
+Detecting ScanImage data requires opening every tif file to read its metadata.
+:py:func:`flexiznam.schema.scanimage_data.parse_si_filename` stores what it found in a
+SQLite database so that unchanged files are not opened again, across runs and across
+dataset classes.
+
+Entries are keyed by absolute path and are valid only if the file size and
+modification time did not change.
+
+The cache is disabled unless the `scanimage_header_cache` field of the config file is
+set. Set it to the path of the database, or to True to use
+`~/.flexiznam/scanimage_headers.db`. SQLite locking is not reliable on network file
+systems, so the database should be on a local disk and not shared between users.
+"""
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import warnings
+from flexiznam.config import PARAMETERS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS headers (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    is_scanimage INTEGER,
+    frames_per_file REAL,
+    parsed TEXT
+)
+"""
+
+
+class ScanimageHeaderCache(object):
+    """SQLite cache of the ScanImage header of tif files
+
+    Each thread uses its own connection to the database.
+    """
+
+    def __init__(self, db_file):
+        """Open or create a cache database
+
+        Args:
+            db_file (str or pathlib.Path): path to the SQLite file. Parent folders are
+                created if needed.
+        """
+        self.db_file = pathlib.Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connection() as con:
+            con.execute(_SCHEMA)
+
+    def _connection(self):
+        con = getattr(self._local, "connection", None)
+        if con is None:
+            con = sqlite3.connect(str(self.db_file), timeout=30)
+            self._local.connection = con
+        return con
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM headers").fetchone()[0]
+
+    @staticmethod
+    def _key(path2file, file_stat):
+        if file_stat is None:
+            file_stat = os.stat(path2file)
+        return os.path.abspath(str(path2file)), file_stat.st_size, file_stat.st_mtime_ns
+
+    def get(self, path2file, file_stat=None):
+        """Get the cached header of a file
+
+        Args:
+            path2file (str or pathlib.Path): path to the tif file
+            file_stat (os.stat_result, optional): stat of the file, if already known
+
+        Returns:
+            tuple: (is_scanimage, frames_per_file, parsed) or None if the file is not
+                in the cache or changed since it was cached. `parsed` is the output of
+                `parse_si_filename`, or None if it was not cached.
+        """
+        path, size, mtime_ns = self._key(path2file, file_stat)
+        row = (
+            self._connection()
+            .execute(
+                "SELECT is_scanimage, frames_per_file, parsed FROM headers "
+                "WHERE path=? AND size=? AND mtime_ns=?",
+                (path, size, mtime_ns),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+        parsed = json.loads(row[2]) if row[2] is not None else None
+        return bool(row[0]), row[1], parsed
+
+    def set(self, path2file, is_scanimage, frames_per_file, parsed, file_stat=None):
+        """Cache the header of a file
+
+        Args:
+            path2file (str or pathlib.Path): path to the tif file
+            is_scanimage (bool): is it a ScanImage file?
+            frames_per_file (float): value of `SI.hScan2D.logFramesPerFile`
+            parsed (dict): output of `parse_si_filename`, None if not available
+            file_stat (os.stat_result, optional): stat of the file, if already known
+        """
+        path, size, mtime_ns = self._key(path2file, file_stat)
+        parsed = json.dumps(parsed) if parsed is not None else None
+        con = self._connection()
+        with con:
+            con.execute(
+                "INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?, ?, ?)",
+                (path, size, mtime_ns, int(is_scanimage), frames_per_file, parsed),
+            )
+
+    def clear(self):
+        """Remove all entries"""
+        con = self._connection()
+        with con:
+            con.execute("DELETE FROM headers")
+
+
+_DEFAULT_CACHE = dict()
+_DEFAULT_CACHE_LOCK = threading.Lock()
+
+
+def get_header_cache():
+    """Get the cache defined in the config file
+
+    Returns:
+        :py:class:`ScanimageHeaderCache`: the cache, or None if it is disabled or cannot
+            be created
+    """
+    db_file = PARAMETERS.get("scanimage_header_cache", None)
+    if (db_file is None) or (db_file is False):
+        return None
+    if db_file is True:
+        db_file = pathlib.Path.home() / ".flexiznam" / "scanimage_headers.db"
+    db_file = str(pathlib.Path(db_file).expanduser())
+    with _DEFAULT_CACHE_LOCK:
+        if db_file not in _DEFAULT_CACHE:
+            try:
+                _DEFAULT_CACHE[db_file] = ScanimageHeaderCache(db_file)
+            except (OSError, sqlite3.Error) as err:
+                warnings.warn(
+                    "Cannot use scanimage header cache %s: %s" % (db_file, err)
+                )
+                _DEFAULT_CACHE[db_file] = None
+        return _DEFAULT_CACHE[db_file]
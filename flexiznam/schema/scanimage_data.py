@@ -1,11 +1,13 @@
 import datetime
-import os
 import pathlib
 import re
+import struct
 import warnings
 
 from tifffile import TiffFile, TiffFileError
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
+from flexiznam.schema.scanimage_cache import get_header_cache
 import math
 
 
@@ -21,6 +23,7 @@ class ScanimageData(Dataset):
         verbose=True,
         flexilims_session=None,
         project=None,
+        folder_scan=None,
     ):
         """Create a scanimage dataset by loading info from folder
 
@@ -32,6 +35,8 @@ class ScanimageData(Dataset):
             verbose (bool=True): print info about what is found
             flexilims_session (flm.Session): session to interact with flexilims
             project (str): project ID or name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dist of datasets (fzm.schema.scanimage_data.ScanimageData)
@@ -44,8 +49,9 @@ class ScanimageData(Dataset):
         elif isinstance(folder_genealogy, list):
             folder_genealogy = tuple(folder_genealogy)
 
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
         fnames = [
-            f for f in os.listdir(folder) if f.endswith((".csv", ".tiff", ".tif"))
+            f for f in folder_scan.listdir() if f.endswith((".csv", ".tiff", ".tif"))
         ]
         tif_files = [f for f in fnames if f.endswith((".tif", ".tiff"))]
         csv_files = [f for f in fnames if f.endswith(".csv")]
@@ -58,7 +64,9 @@ class ScanimageData(Dataset):
         while len(tif_files) > 0:
             # find valid tiff by running ScanImageTiffReader
             fname = tif_files[0]
-            parsed_name = parse_si_filename(folder / fname)
+            parsed_name = parse_si_filename(
+                folder / fname, file_stat=folder_scan.stat(fname)
+            )
             if parsed_name is None:
                 # could not read metadata, that is not a SI tif
                 non_si_tiff.append(fname)
@@ -100,8 +108,10 @@ class ScanimageData(Dataset):
             }
 
             # get creation date from one tif
-            first_acq_tif = folder / sorted(acq["tif_files"])[0]
-            created = datetime.datetime.fromtimestamp(first_acq_tif.stat().st_mtime)
+            first_acq_tif = sorted(acq["tif_files"])[0]
+            created = datetime.datetime.fromtimestamp(
+                folder_scan.stat(first_acq_tif).st_mtime
+            )
             extra_attributes = dict(acq)
             # remove file specific fields
             for field in ["file_num", "channel"]:
@@ -233,6 +243,21 @@ class ScanimageData(Dataset):
             )
         self.extra_attributes["tif_files"] = value
 
+    def associated_files(self, folder=None):
+        """Tif files and csv files of the acquisition
+
+        Args:
+            folder: Where to look for files? default to self.path_full
+
+        Returns:
+            list: paths of the files
+        """
+        if folder is None:
+            folder = self._files_folder()
+        files = [pathlib.Path(folder) / f for f in self.tif_files]
+        files.extend(pathlib.Path(folder) / f for f in self.csv_files.values())
+        return files
+
     def is_valid(self, return_reason=False, tif_files=None):
         """Check that associated files exist"""
         if tif_files is None:
@@ -240,13 +265,13 @@ class ScanimageData(Dataset):
         # checking file one by one is long, compare sets
         tif_files = set(tif_files)
         existing_file = {
-            f for f in os.listdir(self.path_full) if f.endswith(("tif", ".tiff"))
+            f for f in self._listdir(self.path_full) if f.endswith(("tif", ".tiff"))
         }
         if tif_files - existing_file:
             msg = "Some tif files do not exist: %s" % (tif_files - existing_file)
             return msg if return_reason else False
         for _, file_path in self.csv_files.items():
-            if not (self.path_full / file_path).exists():
+            if not self._exists(self.path_full / file_path):
                 msg = "Csv file does not exist: %s" % file_path
                 return msg if return_reason else False
         return "" if return_reason else True
@@ -256,7 +281,7 @@ class ScanimageData(Dataset):
         return len(self.tif_files)
 
 
-def parse_si_filename(path2file):
+def parse_si_filename(path2file, use_cache=True, file_stat=None):
     """Parse the filename of a SI tif using metadata
 
     SI file names are created like that:
@@ -273,8 +298,15 @@ def parse_si_filename(path2file):
     This function reads the metadata and returns the individual elements of the
     filename. It returns None if path2file is not a scanimage tif file
 
+    If the header cache is enabled (see :py:mod:`flexiznam.schema.scanimage_cache`),
+    the result is kept in the cache and the file is not read again until its size or
+    modification time change.
+
     Args:
         path2file (str or pathlib.Path): the path to a scanimage tif file
+        use_cache (bool): use the header cache if it is enabled. Default True
+        file_stat (os.stat_result, optional): stat of the file, if already known.
+            Used to check that the cached header is still valid.
 
     Returns:
         a dictionary with the defined part of the file name or None
@@ -283,6 +315,103 @@ def parse_si_filename(path2file):
 
     path2file = pathlib.Path(path2file)
     fname = path2file.stem + path2file.suffix
+    header_cache = get_header_cache() if use_cache else None
+    cached = None
+    if header_cache is not None:
+        if file_stat is None:
+            file_stat = path2file.stat()
+        cached = header_cache.get(path2file, file_stat=file_stat)
+    if cached is not None:
+        is_scanimage, frames_per_file, parsed = cached
+        if (not is_scanimage) or (parsed is not None):
+            return parsed
+    else:
+        frames_per_file = _read_frames_per_file(path2file)
+        is_scanimage = frames_per_file is not None
+        if header_cache is not None:
+            # cache the header now, in case the name cannot be parsed
+            header_cache.set(
+                path2file, is_scanimage, frames_per_file, None, file_stat=file_stat
+            )
+        if not is_scanimage:
+            return None
+
+    out = _parse_si_name(fname, frames_per_file)
+    if header_cache is not None:
+        header_cache.set(path2file, True, frames_per_file, out, file_stat=file_stat)
+    return out
+
+
+# ScanImage BigTIFF files have a static metadata block right after the TIFF header
+SI_MAGIC = 117637889
+SI_HEADER_READ_SIZE = 256 * 1024
+SI_MAX_FRAME_DATA = 16 * 1024 * 1024
+_TIFF_SIGNATURES = (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+")
+_FRAMES_PER_FILE_REGEX = re.compile(rb"SI\.hScan2D\.logFramesPerFile\s*=\s*([^\r\n;]+)")
+
+
+def _read_frames_per_file(path2file):
+    """Read `SI.hScan2D.logFramesPerFile` in the metadata of a tif
+
+    Try first to read it from the header (see `_read_si_header`) and open the file
+    with `tifffile` only if that does not work.
+
+    Args:
+        path2file (pathlib.Path): path to the tif file
+
+    Returns:
+        float: number of frames per file or None if this is not a scanimage tif
+    """
+    with open(path2file, "rb") as fhandle:
+        header = fhandle.read(SI_HEADER_READ_SIZE)
+        decided, frames_per_file = _read_si_header(header, fhandle)
+    if decided:
+        return frames_per_file
+    return _read_frames_per_file_tifffile(path2file)
+
+
+def _read_si_header(header, fhandle=None):
+    """Find the number of frames per file from the first bytes of a file
+
+    ScanImage BigTIFF (v3 and v4) start with the 16 bytes TIFF header, then the
+    magic number, version and size of the non-varying frame data, followed by the
+    frame data itself, which contains `SI.hScan2D.logFramesPerFile`.
+
+    Args:
+        header (bytes): first bytes of the file
+        fhandle (file, optional): file opened in binary mode, positioned at the end of
+            `header`. Used to read the rest of the frame data if it is longer than
+            `header`
+
+    Returns:
+        (bool, float): whether the header was enough to decide and frames per file
+            (None if the file is not a scanimage tif)
+    """
+    if header[:4] not in _TIFF_SIGNATURES:
+        # tifffile would not open it either
+        return True, None
+    if (header[:4] != b"II+\x00") or (len(header) < 32):
+        return False, None
+    magic, version, size0, _ = struct.unpack("<IIII", header[16:32])
+    if (magic != SI_MAGIC) or (version not in (3, 4)) or (size0 > SI_MAX_FRAME_DATA):
+        return False, None
+    frame_data = header[32 : 32 + size0]
+    if (len(frame_data) < size0) and (fhandle is not None):
+        frame_data += fhandle.read(size0 - len(frame_data))
+    match = _FRAMES_PER_FILE_REGEX.search(frame_data)
+    if match is None:
+        return False, None
+    value = match.groups()[0].strip().decode("ascii", errors="replace")
+    if value.lower() == "inf":
+        return True, math.inf
+    try:
+        return True, float(value)
+    except ValueError:
+        return False, None
+
+
+def _read_frames_per_file_tifffile(path2file):
+    """Same as `_read_frames_per_file` by parsing the tif with tifffile"""
     try:
         with TiffFile(str(path2file)) as reader:
             if not reader.is_scanimage:
@@ -294,9 +423,15 @@ def parse_si_filename(path2file):
 
     # find if there are multiple files (i.e. frame per file is not inf)
     try:
-        frames_per_file = mdata["FrameData"]["SI.hScan2D.logFramesPerFile"]
+        return mdata["FrameData"]["SI.hScan2D.logFramesPerFile"]
     except KeyError:
-        raise IOError("Could not find logFramesPerFile in metadata of %s" % fname)
+        raise IOError(
+            "Could not find logFramesPerFile in metadata of %s" % path2file.name
+        )
+
+
+def _parse_si_name(fname, frames_per_file):
+    """Split a scanimage file name, see `parse_si_filename`"""
     if math.isfinite(frames_per_file):
         pattern = r"(.*)_(\d*)_(\d*)(.*).tiff?"
     else:
@@ -3,6 +3,7 @@ import pathlib
 import warnings
 
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
 from flexiznam.config import PARAMETERS
 
 
@@ -33,6 +34,7 @@ class SequencingData(Dataset):
         verbose=True,
         flexilims_session=None,
         project=None,
+        folder_scan=None,
     ):
         """Create a sequencing dataset by loading info from folder
 
@@ -47,6 +49,8 @@ class SequencingData(Dataset):
             verbose (bool=True): print info about what is found
             flexilims_session (flm.Session): session to interact with flexilims
             project (str): project name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of datasets (fzm.schema.sequencing_data.SequencingData)
@@ -59,12 +63,15 @@ class SequencingData(Dataset):
         elif isinstance(folder_genealogy, list):
             folder_genealogy = tuple(folder_genealogy)
         datasets = dict()
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
         valid_files = []
         for ext in SequencingData.VALID_EXTENSIONS:
-            valid_files.extend([(ext, fl) for fl in folder.glob(f"*{ext}")])
+            valid_files.extend([(ext, fl) for fl in folder_scan.glob(f"*{ext}")])
 
         for ext, file in valid_files:
-            created = datetime.datetime.fromtimestamp(file.stat().st_mtime)
+            created = datetime.datetime.fromtimestamp(
+                folder_scan.stat(file.name).st_mtime
+            )
             ds_name = file.name.replace(ext, "")
             if verbose:
                 print("Found sequencing dataset %s" % ds_name)
@@ -124,6 +131,23 @@ class SequencingData(Dataset):
             project_id=project_id,
         )
 
+    def associated_files(self, folder=None):
+        """The file of the dataset
+
+        Args:
+            folder: Where to look for files? default to the folder containing
+                self.path_full
+
+        Returns:
+            list: path of the file
+        """
+        if folder is None:
+            folder = self._files_folder()
+        return [pathlib.Path(folder) / self.path.name]
+
+    def _files_folder(self):
+        return super()._files_folder().parent
+
     def is_valid(self, return_reason=False):
         """Check that file exist
 
@@ -131,7 +155,7 @@ class SequencingData(Dataset):
             return_reason (bool): if True, return a string with the reason why the
                                   dataset is not valid
         Returns:"""
-        if not self.path_full.exists():
+        if not self._exists(self.path_full):
             msg = f"{self.path_full} does not exist"
             return msg if return_reason else False
         return "" if return_reason else True
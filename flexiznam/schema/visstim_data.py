@@ -2,6 +2,7 @@ import datetime
 import pathlib
 
 from flexiznam.schema.datasets import Dataset
+from flexiznam.schema.folder_scan import FolderScan
 
 
 class VisStimData(Dataset):
@@ -16,6 +17,7 @@ class VisStimData(Dataset):
         verbose=True,
         flexilims_session=None,
         project=None,
+        folder_scan=None,
     ):
         """Create a visual stimulation dataset by loading info from folder
 
@@ -30,12 +32,15 @@ class VisStimData(Dataset):
             verbose (bool=True): print info about what is found
             flexilims_session (flm.Session): session to interact with flexilims
             project (str): project ID or name
+            folder_scan (FolderScan): listing of `folder` to reuse, see
+                :py:class:`flexiznam.schema.folder_scan.FolderScan`
 
         Returns:
             dict of dataset (flz.schema.harp_data.HarpData)
         """
 
-        csv_files = list(pathlib.Path(folder).glob("*.csv"))
+        folder_scan = FolderScan.from_folder(folder, folder_scan)
+        csv_files = folder_scan.glob("*.csv")
 
         fnames = [f.name for f in csv_files]
         if "framelog.csv" not in [f.lower() for f in fnames]:
@@ -52,7 +57,9 @@ class VisStimData(Dataset):
         output = {}
         extra_attributes = dict(csv_files={f.stem: f.name for f in csv_files})
         genealogy = folder_genealogy + ("visstim",)
-        created = datetime.datetime.fromtimestamp(log_file.stat().st_mtime)
+        created = datetime.datetime.fromtimestamp(
+            folder_scan.stat(log_file.name).st_mtime
+        )
         output["visstim"] = VisStimData(
             genealogy=genealogy,
             is_raw=is_raw,
@@ -123,6 +130,19 @@ class VisStimData(Dataset):
     def csv_files(self, value):
         self.extra_attributes["csv_files"] = str(value)
 
+    def associated_files(self, folder=None):
+        """Csv files of the dataset
+
+        Args:
+            folder: Where to look for files? default to self.path_full
+
+        Returns:
+            list: paths of the files
+        """
+        if folder is None:
+            folder = self._files_folder()
+        return [pathlib.Path(folder) / f for f in self.csv_files.values()]
+
     def is_valid(self, return_reason=False):
         """Check that all csv files exist
 
@@ -131,7 +151,7 @@ class VisStimData(Dataset):
                                   dataset is not valid
         Returns:"""
         for _, file_path in self.csv_files.items():
-            if not (self.path_full / file_path).exists():
+            if not self._exists(self.path_full / file_path):
                 msg = f"Missing file {file_path}"
                 return msg if return_reason else False
         return "" if return_reason else True
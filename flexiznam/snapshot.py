@@ -0,0 +1,200 @@
+"""In-memory copy of a whole flexilims project
+
+Walking the hierarchy with :py:func:`flexiznam.main.get_children` costs one request
+per entity. A :py:class:`ProjectSnapshot` downloads every datatype once and answers
+the same queries from in-memory indexes.
+
+The snapshot mimics the read interface of :py:class:`flexilims.Flexilims` (`get`,
+`get_children` and `project_id`) so it can be given as `flexilims_session` to any
+flexiznam function::
+
+    snapshot = ProjectSnapshot(flexilims_session)
+    flz.get_datasets_recursively(origin_name="mouse", flexilims_session=snapshot)
+    flz.utils.check_flexilims_paths(snapshot)
+
+Writes (`post`, `update_one`, `delete`) are sent to the real session and the
+snapshot is updated with the reply.
+"""
+import copy
+import threading
+from flexiznam.config import PARAMETERS
+
+
+class ProjectSnapshot(object):
+    """Snapshot of all entities of a project with parent/child indexes
+
+    Attributes:
+        by_id (dict): hexadecimal id to raw flexilims reply
+        by_name (dict): name to list of ids. Names should be unique but are not
+            enforced to be.
+        by_type (dict): datatype to list of ids
+        children (dict): origin_id to list of children ids
+    """
+
+    def __init__(self, flexilims_session, datatypes=None, load=True):
+        """Create a snapshot of the project of a flexilims session
+
+        Args:
+            flexilims_session (:py:class:`flexilims.Flexilims`): session with project
+                set. Used to download the project and for writes.
+            datatypes (list, optional): datatypes to download. Default to
+                PARAMETERS["datatypes"].
+            load (bool, optional): download the project immediately. Default True.
+        """
+        self.flexilims_session = flexilims_session
+        self.project_id = flexilims_session.project_id
+        if datatypes is None:
+            datatypes = PARAMETERS["datatypes"]
+        self.datatypes = list(datatypes)
+        self._lock = threading.RLock()
+        self._clear()
+        if load:
+            self.refresh()
+
+    def __getattr__(self, name):
+        # anything that is not implemented is taken from the real session
+        if name.startswith("_") or name == "flexilims_session":
+            raise AttributeError(name)
+        return getattr(self.flexilims_session, name)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __contains__(self, id):
+        return id in self.by_id
+
+    def _clear(self):
+        self.by_id = {}
+        self.by_name = {}
+        self.by_type = {}
+        self.children = {}
+
+    def refresh(self):
+        """Download all datatypes again and rebuild the indexes
+
+        This makes one request per datatype.
+        """
+        entities = []
+        for datatype in self.datatypes:
+            entities.extend(self.flexilims_session.get(datatype))
+        with self._lock:
+            self._clear()
+            for entity in entities:
+                self._add(entity)
+
+    def _add(self, entity):
+        """Add or replace a raw entity in the indexes"""
+        if entity["id"] in self.by_id:
+            self._remove(entity["id"])
+        self.by_id[entity["id"]] = entity
+        self.by_name.setdefault(entity["name"], []).append(entity["id"])
+        self.by_type.setdefault(entity["type"], []).append(entity["id"])
+        origin_id = entity.get("origin_id", None)
+        if origin_id is not None:
+            self.children.setdefault(origin_id, []).append(entity["id"])
+
+    def _remove(self, id):
+        """Remove an entity from the indexes"""
+        entity = self.by_id.pop(id)
+        self.by_name[entity["name"]].remove(id)
+        self.by_type[entity["type"]].remove(id)
+        origin_id = entity.get("origin_id", None)
+        if origin_id is not None:
+            self.children[origin_id].remove(id)
+
+    def get(
+        self,
+        datatype=None,
+        query_key=None,
+        query_value=None,
+        name=None,
+        origin_id=None,
+        id=None,
+        project_id=None,
+    ):
+        """Same as :py:meth:`flexilims.Flexilims.get` but from memory
+
+        Returns:
+            list: copies of the raw flexilims replies matching the query
+        """
+        if (project_id is not None) and (project_id != self.project_id):
+            raise ValueError("Snapshot is for project %s" % self.project_id)
+        with self._lock:
+            if id is not None:
+                ids = [id] if id in self.by_id else []
+            elif name is not None:
+                ids = self.by_name.get(name, [])
+            elif origin_id is not None:
+                ids = self.children.get(origin_id, [])
+            elif datatype is not None:
+                ids = self.by_type.get(datatype, [])
+            else:
+                ids = list(self.by_id)
+            output = []
+            for entity_id in ids:
+                entity = self.by_id[entity_id]
+                if (datatype is not None) and (entity["type"] != datatype):
+                    continue
+                if (name is not None) and (entity["name"] != name):
+                    continue
+                if (origin_id is not None) and (
+                    entity.get("origin_id", None) != origin_id
+                ):
+                    continue
+                if (query_key is not None) and (
+                    entity["attributes"].get(query_key, None) != query_value
+                ):
+                    continue
+                output.append(copy.deepcopy(entity))
+        return output
+
+    def get_children(self, id):
+        """Same as :py:meth:`flexilims.Flexilims.get_children` but from memory
+
+        Returns:
+            list: copies of the raw replies of all the children of `id`
+        """
+        with self._lock:
+            return [copy.deepcopy(self.by_id[c]) for c in self.children.get(id, [])]
+
+    def iter_descendants(self, id, include_self=False):
+        """Iterate depth-first on all the descendants of an entity
+
+        Args:
+            id (str): hexadecimal id of the root entity
+            include_self (bool): yield the root entity first
+
+        Yields:
+            dict: raw flexilims replies (not copied, do not modify)
+        """
+        if include_self:
+            yield self.by_id[id]
+        for child_id in list(self.children.get(id, [])):
+            yield self.by_id[child_id]
+            for descendant in self.iter_descendants(child_id):
+                yield descendant
+
+    def post(self, *args, **kwargs):
+        """Create an entity online and add it to the snapshot"""
+        reply = self.flexilims_session.post(*args, **kwargs)
+        self._update_from_reply(reply)
+        return reply
+
+    def update_one(self, *args, **kwargs):
+        """Update an entity online and in the snapshot"""
+        reply = self.flexilims_session.update_one(*args, **kwargs)
+        self._update_from_reply(reply)
+        return reply
+
+    def delete(self, id):
+        """Delete an entity online and from the snapshot"""
+        reply = self.flexilims_session.delete(id)
+        with self._lock:
+            if id in self.by_id:
+                self._remove(id)
+        return reply
+
+    def _update_from_reply(self, reply):
+        if isinstance(reply, dict) and ("id" in reply) and ("attributes" in reply):
+            with self._lock:
+                self._add(copy.deepcopy(reply))
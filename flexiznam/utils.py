@@ -10,6 +10,7 @@ SPECIAL_CHARACTERS = re.compile(r'[\',@"+=\-!#$%^&*<>?/\|}{~:]')
 import flexiznam as flz
 from flexiznam.errors import FlexilimsError, DatasetError
 from flexiznam.schema import Dataset
+from flexiznam.schema.folder_scan import ListingCache
 
 
 def compare_series(
@@ -208,19 +209,26 @@ def clean_recursively(
 
 
 def check_flexilims_paths(
-    flexilims_session, root_name=None, recursive=True, error_only=True
+    flexilims_session, root_name=None, recursive=True, error_only=True, max_workers=None
 ):
     """Check that paths defined on flexilims exist
 
     For datasets, check that the exact path exists, for the rest check if either `raw` or
     `process` path exist (as mouse, sample etc can be found in both or either folder).
 
+    All the paths are collected first, then the parent folders are listed once each,
+    on a thread pool, instead of checking entities one by one. To also avoid one
+    flexilims request per entity, use a
+    :py:class:`flexiznam.snapshot.ProjectSnapshot` as `flexilims_session`.
+
     Args:
         flexilims_session (flm.Session): flexilims session object, must define project
         root_name (str): optional, name of entity to check. If not provided, will check
                          all mice.
         recursive (bool): Check recursively all children (default True)
         error_only (bool): Return only issue (default True). Otherwise list valid paths
+        max_workers (int): number of threads listing folders (default None, use the
+                           `ThreadPoolExecutor` default)
 
     Returns:
         error_df (pd.DataFrame): list of unvalid paths
@@ -236,15 +244,35 @@ def check_flexilims_paths(
         ]  # make a list to match get_entity
     else:
         to_check = [flz.get_entity(name=root_name, flexilims_session=flexilims_session)]
-    output = []
+    checks = []
     for element in to_check:
-        _check_path(
-            output,
+        _collect_paths(
+            checks,
             element,
             flexilims_session=flexilims_session,
             recursive=recursive,
-            error_only=error_only,
         )
+    listings = ListingCache()
+    listings.prefetch(
+        [path for _, _, paths, _ in checks for _, path in paths],
+        max_workers=max_workers,
+    )
+    output = []
+    for name, datatype, paths, row in checks:
+        if row is not None:
+            output.append(row)
+        elif datatype == "dataset":
+            path = paths[0][1]
+            if not listings.exists(path):
+                output.append([name, datatype, "dataset path unvalid", path, 1])
+            elif not error_only:
+                output.append([name, datatype, "Data found", path, 0])
+        else:
+            ok = [root for root, path in paths if listings.is_dir(path)]
+            if not len(ok):
+                output.append([name, datatype, "folder does not exist", "", 1])
+            elif not error_only:
+                output.append([name, datatype, "Folder found", " ".join(ok), 0])
     # format output
     output = pd.DataFrame(
         columns=["name", "datatype", "msg", "info", "is_error"], data=output
@@ -454,66 +482,48 @@ def _check_attribute_case(flexilims_session):
     return pd.DataFrame(data=report, columns=["project", "entity", "attribute"])
 
 
-def _check_path(output, element, flexilims_session, recursive, error_only):
-    """Subfunction to recurse path checking"""
+def _collect_paths(checks, element, flexilims_session, recursive):
+    """Subfunction to recurse path collection
+
+    Appends `(name, datatype, paths, row)` to `checks`. `paths` is a list of
+    `(data root, path)` to check and `row` the output row if there is nothing to check.
+    """
+    paths = []
+    row = None
     if "path" not in element:
-        output.append([element.name, element.type, "path not defined", "", 1])
+        row = [element.name, element.type, "path not defined", "", 1]
     elif not isinstance(element.path, str):
-        output.append(
-            [element.name, element.type, "Path is not a string!", element.path, 1]
-        )
+        row = [element.name, element.type, "Path is not a string!", element.path, 1]
     elif element.type != "dataset":
-        ok = []
         for k, v in flz.PARAMETERS["data_root"].items():
-            if (Path(v) / element.path).is_dir():
-                ok.append(v)
-        if not len(ok):
-            output.append([element.name, element.type, "folder does not exist", "", 1])
-        elif not error_only:
-            output.append([element.name, element.type, "Folder found", " ".join(ok), 0])
+            paths.append((v, Path(v) / element.path))
     else:
         try:
             ds = Dataset.from_dataseries(
                 flexilims_session=flexilims_session, dataseries=element
             )
-            if not ds.path_full.exists():
-                output.append(
-                    [
-                        element.name,
-                        element.type,
-                        "dataset path unvalid",
-                        ds.path_full,
-                        1,
-                    ]
-                )
-            elif not error_only:
-                output.append(
-                    [element.name, element.type, "Data found", ds.path_full, 0]
-                )
+            paths.append((None, ds.path_full))
         except OSError as err:
-            output.append(
-                [
-                    element.name,
-                    element.type,
-                    "Cannot create dataset from flexilims",
-                    str(err),
-                    0,
-                ]
-            )
+            row = [
+                element.name,
+                element.type,
+                "Cannot create dataset from flexilims",
+                str(err),
+                0,
+            ]
         except DatasetError as err:
-            output.append(
-                [
-                    element.name,
-                    element.type,
-                    "Genealogy might not be set",
-                    str(err),
-                    0,
-                ]
-            )
+            row = [
+                element.name,
+                element.type,
+                "Genealogy might not be set",
+                str(err),
+                0,
+            ]
+    checks.append((element.name, element.type, paths, row))
     if recursive:
         children = flz.get_children(element.id, flexilims_session=flexilims_session)
         for _, child in children.iterrows():
-            _check_path(output, child, flexilims_session, recursive, error_only)
+            _collect_paths(checks, child, flexilims_session, recursive)
 
 
 def _check_name(output, element, flexilims_session, parent_name, recursive):
@@ -0,0 +1,152 @@
+"""Reading and writing YAML files
+
+All flexiznam YAML files (acquisition yamls, config, token) go through this module.
+It uses the libyaml bindings of pyyaml (`CSafeLoader` and `CSafeDumper`) when they are
+available, which are much faster than the pure python implementation for large
+acquisition yamls, and falls back to the pure python classes otherwise.
+
+Files loaded with :py:func:`load_yaml` can also be cached as JSON next to the YAML
+file (`<file>.cache.json`). The cache is keyed by the size and modification time of
+the YAML file and is used only if it is still valid. It is enabled with `cache=True` or
+with the `yaml_cache` field of the config file.
+"""
+import json
+import os
+import pathlib
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+try:
+    from yaml import CDumper as Dumper
+except ImportError:
+    from yaml import Dumper
+
+CACHE_SUFFIX = ".cache.json"
+
+
+def safe_load(stream):
+    """Same as `yaml.safe_load`, using libyaml if available
+
+    Args:
+        stream (str or file): yaml text or open file
+
+    Returns:
+        object: the parsed data
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None):
+    """Same as `yaml.dump`, using libyaml if available
+
+    Data made only of basic types is written with the safe dumper, so that it can be
+    read back with :py:func:`safe_load` (tuples are written as lists). Other python
+    objects (numpy scalars for instance) are written with the full dumper, as
+    `yaml.dump` does.
+
+    Args:
+        data (object): data to dump
+        stream (file, optional): open file to write to. If None, return the text
+
+    Returns:
+        str: the yaml text if `stream` is None, None otherwise
+    """
+    try:
+        text = yaml.dump(data, Dumper=SafeDumper)
+    except yaml.representer.RepresenterError:
+        text = yaml.dump(data, Dumper=Dumper)
+    if stream is None:
+        return text
+    stream.write(text)
+
+
+def _cache_file(path):
+    return path.with_name(path.name + CACHE_SUFFIX)
+
+
+def _read_cache(cache_file, file_stat):
+    try:
+        with open(cache_file, "r") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (cached.get("size", None) != file_stat.st_size) or (
+        cached.get("mtime_ns", None) != file_stat.st_mtime_ns
+    ):
+        return None
+    return cached
+
+
+def _write_cache(cache_file, file_stat, data):
+    """Write the JSON cache if the data survives a JSON round trip"""
+    try:
+        text = json.dumps(
+            dict(size=file_stat.st_size, mtime_ns=file_stat.st_mtime_ns, data=data)
+        )
+    except (TypeError, ValueError):
+        # dates or other non-JSON types
+        return False
+    if json.loads(text)["data"] != data:
+        # for instance non-string keys
+        return False
+    tmp_file = cache_file.with_name(cache_file.name + ".tmp")
+    try:
+        with open(tmp_file, "w") as f:
+            f.write(text)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        return False
+    return True
+
+
+def load_yaml(path, cache=None):
+    """Load a YAML file
+
+    Args:
+        path (str or pathlib.Path): path to the YAML file
+        cache (bool, optional): read and write the JSON cache next to the file. If
+            None, use the `yaml_cache` field of the config file. Defaults to None.
+
+    Returns:
+        object: the parsed data
+    """
+    path = pathlib.Path(path)
+    if cache is None:
+        from flexiznam.config import PARAMETERS
+
+        cache = PARAMETERS.get("yaml_cache", False)
+    if not cache:
+        with open(path, "r") as f:
+            return safe_load(f)
+
+    file_stat = os.stat(path)
+    cache_file = _cache_file(path)
+    cached = _read_cache(cache_file, file_stat)
+    if cached is not None:
+        return cached["data"]
+    with open(path, "r") as f:
+        data = safe_load(f)
+    _write_cache(cache_file, file_stat, data)
+    return data
+
+
+def dump_yaml(data, path):
+    """Write data to a YAML file
+
+    Any JSON cache of a previous version of the file is removed.
+
+    Args:
+        data (object): data to write
+        path (str or pathlib.Path): path to the target file
+    """
+    path = pathlib.Path(path)
+    text = dump(data)
+    with open(path, "w") as f:
+        f.write(text)
+    cache_file = _cache_file(path)
+    if cache_file.exists():
+        cache_file.unlink()
@@ -0,0 +1,37 @@
+import asyncio
+import flexiznam as flz
+from flexiznam import aio
+from tests.tests_resources.data_for_testing import MOUSE_ID, SESSION
+
+
+def test_aio_queries(flm_sess):
+    async def queries():
+        return await asyncio.gather(
+            aio.get_entity(id=MOUSE_ID, flexilims_session=flm_sess),
+            aio.get_entities(datatype="session", flexilims_session=flm_sess),
+            aio.get_children(parent_id=MOUSE_ID, flexilims_session=flm_sess),
+        )
+
+    mouse, sessions, children = asyncio.run(queries())
+    assert mouse.equals(flz.get_entity(id=MOUSE_ID, flexilims_session=flm_sess))
+    assert SESSION in sessions.index
+    assert sorted(children.id) == sorted(
+        flz.get_children(parent_id=MOUSE_ID, flexilims_session=flm_sess).id
+    )
+
+
+def test_aio_get_datasets_recursively(flm_sess):
+    sync = flz.get_datasets_recursively(
+        origin_name=SESSION, flexilims_session=flm_sess, return_paths=True
+    )
+    aio.set_concurrency(2)
+    try:
+        output = asyncio.run(
+            aio.get_datasets_recursively(
+                origin_name=SESSION, flexilims_session=flm_sess, return_paths=True
+            )
+        )
+    finally:
+        aio.set_concurrency(aio.DEFAULT_CONCURRENCY)
+    assert output == sync
+    assert list(output) == list(sync)
@@ -0,0 +1,62 @@
+import time
+import flexiznam as flz
+from flexiznam import cache
+from tests.tests_resources.data_for_testing import MOUSE_ID
+
+
+def test_entity_cache():
+    entity_cache = cache.EntityCache(ttl=None, maxsize=2)
+    assert entity_cache.get(("mouse", 1)) is None
+    reply = [dict(id="a", attributes=dict(x=1))]
+    entity_cache.set(("mouse", 1), reply)
+    cached = entity_cache.get(("mouse", 1))
+    assert cached == reply
+    # we get a copy that can be modified
+    cached[0]["attributes"].pop("x")
+    assert entity_cache.get(("mouse", 1)) == reply
+    assert entity_cache.stats == dict(hits=2, misses=1, evictions=0, size=1)
+    # empty replies are cached too
+    entity_cache.set(("dataset", 1), [])
+    assert entity_cache.get(("dataset", 1)) == []
+    # LRU eviction
+    entity_cache.set((cache.CHILDREN, 1), reply)
+    assert ("mouse", 1) not in entity_cache
+    assert entity_cache.stats["evictions"] == 1
+    entity_cache.invalidate("dataset")
+    assert len(entity_cache) == 0
+    entity_cache.set(("mouse", 1), reply)
+    entity_cache.clear()
+    assert len(entity_cache) == 0
+
+
+def test_entity_cache_ttl():
+    entity_cache = cache.EntityCache(ttl=0.01)
+    entity_cache.set(("mouse", 1), [])
+    assert entity_cache.get(("mouse", 1)) == []
+    time.sleep(0.02)
+    assert entity_cache.get(("mouse", 1)) is None
+
+
+def test_session_cache(flm_sess):
+    entity_cache = cache.enable_cache(flm_sess)
+    try:
+        assert cache.get_cache(flm_sess) is entity_cache
+        first = flz.get_entity(
+            id=MOUSE_ID, datatype="mouse", flexilims_session=flm_sess
+        )
+        second = flz.get_entity(
+            id=MOUSE_ID, datatype="mouse", flexilims_session=flm_sess
+        )
+        assert first.equals(second)
+        assert entity_cache.hits == 1
+        flz.update_entity(
+            datatype="mouse",
+            id=MOUSE_ID,
+            mode="update",
+            attributes=dict(),
+            flexilims_session=flm_sess,
+        )
+        assert "mouse" not in {k[0] for k in entity_cache._data}
+    finally:
+        cache.disable_cache(flm_sess)
+    assert cache.get_cache(flm_sess) is None
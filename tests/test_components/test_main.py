@@ -1,8 +1,12 @@
 import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
 import pathlib
 from pathlib import Path
 import pandas as pd
 import portalocker
+import threading
+import time
 import pytest
 import flexiznam as flz
 import yaml
@@ -66,6 +70,86 @@ def test_get_flexilims_session():
     assert sess.session.headers["Authorization"].split(" ")[1] == token
 
 
+def test_get_shared_session():
+    flz.clear_shared_sessions()
+    sess = flz.get_shared_session(project_id="test")
+    assert flz.get_shared_session(project_id=PARAMETERS["project_ids"]["test"]) is sess
+    token_file = flz.config.config_tools._find_file("flexilims_token.yml")
+    # the token file is not needed once the session exists
+    with portalocker.Lock(token_file, "r+", timeout=10):
+        assert flz.get_shared_session(project_id="test") is sess
+        flz.get_entities(datatype="mouse", project_id="test")
+    # a token close to expiry is replaced in the same session object
+    key = next(iter(flz.main._SESSION_REGISTRY))
+    created = time.time() - flz.main.TOKEN_MAX_AGE + flz.main.TOKEN_REFRESH_MARGIN / 2
+    flz.main._SESSION_REGISTRY[key] = (sess, created)
+    assert flz.get_shared_session(project_id="test") is sess
+    assert flz.main._SESSION_REGISTRY[key][1] > created
+    # if the token file is also old, a new token is requested for the same session
+    token = sess.session.headers["Authorization"]
+    tokinfo = yaml.safe_load(token_file.read_text())
+    token_file.write_text(yaml.dump(dict(tokinfo, created=created)))
+    flz.main._SESSION_REGISTRY[key] = (sess, created)
+    assert flz.get_shared_session(project_id="test") is sess
+    assert sess.session.headers["Authorization"] != token
+    tokinfo = yaml.safe_load(token_file.read_text())
+    assert sess.session.headers["Authorization"] == "Bearer %s" % tokinfo["token"]
+    flz.clear_shared_sessions()
+    assert flz.get_shared_session(project_id="test") is not sess
+
+
+def test_validate_datasets(tmp_path, monkeypatch):
+    monkeypatch.setitem(PARAMETERS, "project_paths", {})
+    monkeypatch.setitem(
+        PARAMETERS, "data_root", dict(raw=str(tmp_path), processed=str(tmp_path))
+    )
+    datasets = []
+    for recording in ("R1", "R2"):
+        for i, binary_file in enumerate(("a.bin", "b.bin")):
+            datasets.append(
+                HarpData(
+                    path=Path("mouse", "S1", recording),
+                    is_raw=True,
+                    genealogy=("mouse", "S1", recording, "harp%d" % i),
+                    extra_attributes=dict(binary_file=binary_file, csv_files={}),
+                    project="test",
+                )
+            )
+    datasets.append(
+        Dataset(
+            path=Path("mouse", "S1", "R2", "b.bin"),
+            is_raw=True,
+            dataset_type="suite2p_rois",
+            genealogy=("mouse", "S1", "R2", "file"),
+            project="test",
+        )
+    )
+    folder = tmp_path / "mouse" / "S1" / "R2"
+    folder.mkdir(parents=True)
+    (folder / "b.bin").write_text("data")
+    expected = [ds.is_valid() for ds in datasets]
+    assert expected == [False, False, False, True, True]
+    # sessions cannot be pickled, they must not be sent to other processes
+    for ds in datasets:
+        ds._flexilims_session = threading.Lock()
+    process_pool = ProcessPoolExecutor(
+        max_workers=2, mp_context=multiprocessing.get_context("fork")
+    )
+    executors = ("thread", ThreadPoolExecutor(max_workers=2), process_pool)
+    for executor in executors:
+        df = flz.validate_datasets(datasets, executor=executor, max_workers=2)
+        assert list(df.name) == [ds.full_name for ds in datasets]
+        assert list(df.is_valid) == expected
+        assert df.reason.iloc[0] == "Missing file a.bin"
+        assert df.reason.iloc[-1] == ""
+    process_pool.shutdown()
+    assert all(
+        isinstance(ds._flexilims_session, type(threading.Lock())) for ds in datasets
+    )
+    with pytest.raises(ValueError):
+        flz.validate_datasets(datasets, executor="gpu")
+
+
 def test_format_results():
     exmple_res = {
         "id": "randomid",
@@ -80,9 +164,15 @@ def test_format_results():
         "project": "606df1ac08df4d77c72c9aa4",
     }
     exmple_res = [exmple_res, exmple_res.copy()]
+    projected = flz.format_results(
+        exmple_res, columns=["name", "exmpl_attr", "missing"]
+    )
     res = flz.format_results(exmple_res)
     assert res.shape == (2, 10)
     assert "exmpl_attr" in res.columns
+    assert list(projected.columns) == ["name", "exmpl_attr", "missing"]
+    assert projected["exmpl_attr"].equals(res["exmpl_attr"])
+    assert projected["missing"].isna().all()
 
 
 def test_get_experimental_sessions(flm_sess):
@@ -144,6 +234,14 @@ def test_get_mouse_id(flm_sess):
     assert mid == MOUSE_ID
 
 
+def test_get_datatype(flm_sess):
+    assert flz.get_datatype(id=MOUSE_ID, flexilims_session=flm_sess) == "mouse"
+    assert flz.get_datatype(name=SESSION, flexilims_session=flm_sess) == "session"
+    assert flz.get_datatype(name="not_a_name", flexilims_session=flm_sess) is None
+    mouse = flz.get_entity(id=MOUSE_ID, flexilims_session=flm_sess)
+    assert mouse.type == "mouse"
+
+
 def test_get_datasets(flm_sess):
     ds = flz.get_datasets(
         origin_id=MOUSE_ID,
@@ -286,6 +384,18 @@ def test_get_datasets_recursively(flm_sess):
         parent_type="recording",
     )
     assert len(ds_dict) == 2
+    for kwargs in (dict(), dict(parent_type="recording")):
+        serial = flz.get_datasets_recursively(
+            flexilims_session=flm_sess, origin_name=SESSION, return_paths=True, **kwargs
+        )
+        parallel = flz.get_datasets_recursively(
+            flexilims_session=flm_sess,
+            origin_name=SESSION,
+            return_paths=True,
+            max_workers=4,
+            **kwargs
+        )
+        assert list(serial.items()) == list(parallel.items())
 
 
 def test_add_mouse(flm_sess):
@@ -326,6 +436,27 @@ def test_generate_name(flm_sess):
         datatype="dataset", name="134241", flexilims_session=flm_sess
     )
     assert name == "134241_0"
+    names = flz.generate_names(
+        datatype="dataset", name="test_iter", n_names=3, flexilims_session=flm_sess
+    )
+    assert len(set(names)) == 3
+    assert all(n.startswith("test_iter_") for n in names)
+    sess = flz.get_entity(name=SESSION, flexilims_session=flm_sess)
+    name = flz.generate_name(
+        datatype="recording",
+        name=sess["name"] + "_R101501",
+        flexilims_session=flm_sess,
+        origin_id=sess["id"],
+    )
+    assert flz.get_entity(name=name, flexilims_session=flm_sess) is None
+
+
+def test_generate_names_taken():
+    taken = {"rec_0", "rec_2"}
+    names = flz.generate_names("recording", "rec_0", n_names=3, taken=taken)
+    # suffixes already used are skipped
+    assert names == ["rec_1", "rec_3", "rec_4"]
+    assert taken == {"rec_%d" % i for i in range(5)}
 
 
 def test_get_children(flm_sess):
@@ -382,6 +513,53 @@ def test_add_entity(flm_sess):
     )
 
 
+def test_add_entities_bulk(flm_sess):
+    sess = flz.get_entity(name=SESSION, flexilims_session=flm_sess)
+    genealogy = list(sess["genealogy"])
+    records = [
+        dict(
+            datatype="dataset",
+            name="_".join(genealogy + ["bulk_test_%d" % i]),
+            origin_id=sess["id"],
+            attributes=dict(
+                genealogy=genealogy + ["bulk_test_%d" % i],
+                path="random",
+                dataset_type="scanimage",
+                is_raw="no",
+                created="",
+            ),
+        )
+        for i in range(3)
+    ]
+    records.append(dict(datatype="dataset", name="bulk_orphan", origin_name="nope"))
+    report = flz.add_entities_bulk(
+        records, conflicts="append", flexilims_session=flm_sess
+    )
+    assert list(report.status) == ["created"] * 3 + ["failed"]
+    with pytest.raises(FlexilimsError):
+        flz.add_entities_bulk(
+            [dict(records[0], name=report["name"][0])], flexilims_session=flm_sess
+        )
+    for _, row in report.iloc[:3].iterrows():
+        online = flz.get_entity(id=row.id, flexilims_session=flm_sess)
+        assert online["name"] == row["name"]
+        assert "_".join(online["genealogy"]) == row["name"]
+        flm_sess.delete(row.id)
+
+    # malformed records and reserved keywords fail without stopping the batch
+    report = flz.add_entities_bulk(
+        [
+            dict(datatype="session", name=SESSION, attributes=dict(name="clash")),
+            dict(datatype="dataset", name="bulk_malformed", attributes=["oops"]),
+        ],
+        conflicts="update",
+        flexilims_session=flm_sess,
+    )
+    assert list(report.status) == ["failed", "failed"]
+    assert "reserved keyword" in report["error"][0]
+    assert report["error"][1].startswith("ValueError")
+
+
 def test_update_entity(flm_sess):
     with pytest.raises(FlexilimsError) as err:
         flz.update_entity("dataset", name="gibberish", flexilims_session=flm_sess)
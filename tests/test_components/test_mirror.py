@@ -0,0 +1,87 @@
+import pytest
+import flexiznam as flz
+from flexiznam.config import PARAMETERS
+from flexiznam.errors import ConfigurationError, FlexilimsError
+from flexiznam.mirror import ProjectMirror
+from tests.tests_resources.data_for_testing import MOUSE_ID, SESSION
+
+
+def test_mirror_sync(flm_sess, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        ProjectMirror(tmp_path / "mirror.db", project_id=flm_sess.project_id)
+    assert not (tmp_path / "mirror.db").exists()
+    mirror = ProjectMirror(
+        tmp_path / "mirror.db", project_id=flm_sess.project_id, create=True
+    )
+    summary = mirror.sync(flm_sess)
+    assert summary["new"] == len(mirror) > 0
+    assert mirror.last_sync("mouse") is not None
+    summary = mirror.sync(flm_sess)
+    assert summary == dict(new=0, updated=0, deleted=0, unchanged=len(mirror))
+    # a second mirror on the same file sees the same data
+    other = ProjectMirror(tmp_path / "mirror.db", project_id=flm_sess.project_id)
+    assert len(other) == len(mirror)
+    assert MOUSE_ID in other
+
+
+def test_mirror_as_session(flm_sess, tmp_path):
+    mirror = ProjectMirror(
+        tmp_path / "mirror.db", project_id=flm_sess.project_id, create=True
+    )
+    mirror.sync(flm_sess)
+    online = flm_sess.get_children(MOUSE_ID)
+    offline = mirror.get_children(MOUSE_ID)
+    assert sorted(c["id"] for c in online) == sorted(c["id"] for c in offline)
+    online = flz.get_datasets_recursively(
+        flexilims_session=flm_sess, origin_name=SESSION, return_paths=True
+    )
+    offline = flz.get_datasets_recursively(
+        flexilims_session=mirror, origin_name=SESSION, return_paths=True
+    )
+    assert online == offline
+    entity = flz.get_entity(id=MOUSE_ID, flexilims_session=mirror)
+    assert entity["id"] == MOUSE_ID
+    with pytest.raises(FlexilimsError):
+        mirror.delete(MOUSE_ID)
+
+
+def test_mirror_query(flm_sess, tmp_path):
+    mirror = ProjectMirror(
+        tmp_path / "mirror.db", project_id=flm_sess.project_id, create=True
+    )
+    mirror.sync(flm_sess)
+    online = flz.get_entities(
+        datatype="dataset",
+        query_key="dataset_type",
+        query_value="scanimage",
+        flexilims_session=flm_sess,
+    )
+    offline = mirror.query(
+        datatype="dataset", attributes=dict(dataset_type=("scanimage", "nothing"))
+    )
+    assert sorted(online.id) == sorted(offline.id)
+    assert list(online.columns) == list(offline.columns)
+    mouse = flz.get_entity(id=MOUSE_ID, flexilims_session=flm_sess)
+    descendants = mirror.query(genealogy_prefix=mouse.genealogy)
+    assert MOUSE_ID in descendants.id.values
+    assert all(
+        g[: len(mouse.genealogy)] == mouse.genealogy for g in descendants.genealogy
+    )
+    # prefixes match whole names only
+    assert not len(mirror.query(genealogy_prefix=[mouse.genealogy[0][:-1]]))
+    assert not len(mirror.query(created_before="2000-01-01"))
+    assert len(mirror.query(created_after="2000-01-01")) == len(mirror)
+
+
+def test_offline_mirror(flm_sess, tmp_path, monkeypatch):
+    monkeypatch.setitem(PARAMETERS, "offline_mirror", str(tmp_path / "mirror.db"))
+    # a missing mirror is an error, not an empty project
+    with pytest.raises(ConfigurationError):
+        flz.get_flexilims_session(project_id=flm_sess.project_id, offline_mode=True)
+    assert not (tmp_path / "mirror.db").exists()
+    ProjectMirror(tmp_path / "mirror.db", project_id=flm_sess.project_id, create=True)
+    mirror = flz.get_flexilims_session(
+        project_id=flm_sess.project_id, offline_mode=True
+    )
+    assert isinstance(mirror, ProjectMirror)
+    assert mirror.db_file == tmp_path / "mirror.db"
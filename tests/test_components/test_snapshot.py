@@ -0,0 +1,32 @@
+import flexiznam as flz
+from flexiznam.snapshot import ProjectSnapshot
+from tests.tests_resources.data_for_testing import MOUSE_ID, SESSION
+
+
+def test_snapshot_indexes(flm_sess):
+    snapshot = ProjectSnapshot(flm_sess)
+    assert len(snapshot) > 0
+    assert MOUSE_ID in snapshot
+    mouse = snapshot.by_id[MOUSE_ID]
+    assert snapshot.by_name[mouse["name"]] == [MOUSE_ID]
+    assert MOUSE_ID in snapshot.by_type["mouse"]
+    online = flm_sess.get_children(MOUSE_ID)
+    offline = snapshot.get_children(MOUSE_ID)
+    assert sorted(c["id"] for c in online) == sorted(c["id"] for c in offline)
+    assert snapshot.get(datatype="session", name=SESSION)[0]["name"] == SESSION
+    assert not snapshot.get(datatype="mouse", name=SESSION)
+
+
+def test_snapshot_as_session(flm_sess):
+    snapshot = ProjectSnapshot(flm_sess)
+    online = flz.get_datasets_recursively(
+        flexilims_session=flm_sess, origin_name=SESSION, return_paths=True
+    )
+    offline = flz.get_datasets_recursively(
+        flexilims_session=snapshot, origin_name=SESSION, return_paths=True
+    )
+    assert online == offline
+    entity = flz.get_entity(id=MOUSE_ID, flexilims_session=snapshot)
+    assert entity["id"] == MOUSE_ID
+    to_delete = flz.delete_recursively(MOUSE_ID, snapshot, do_it=False)
+    assert len(to_delete) == len(list(snapshot.iter_descendants(MOUSE_ID))) + 1
@@ -0,0 +1,49 @@
+import json
+import yaml
+from flexiznam.camp import sync_data
+from flexiznam.schema import Dataset
+from tests.tests_resources.data_for_testing import DATA_ROOT, TEST_PROJECT
+
+
+def _create(folder, scan_cache=None, max_workers=None):
+    prefetched = None
+    if max_workers is not None:
+        prefetched = sync_data._prefetch_levels(
+            folder,
+            project=TEST_PROJECT,
+            genealogy=["mouse_physio_2p"],
+            format_yaml=True,
+            scan_cache=scan_cache,
+            max_workers=max_workers,
+        )
+    data = sync_data._create_yaml_dict(
+        folder,
+        project=TEST_PROJECT,
+        genealogy=["mouse_physio_2p"],
+        format_yaml=True,
+        parent_dict=dict(),
+        scan_cache=scan_cache,
+        _prefetched=prefetched,
+    )
+    return yaml.dump(data)
+
+
+def test_parallel_yaml_dict():
+    folder = DATA_ROOT / "mouse_physio_2p" / "S20211102"
+    assert _create(folder, max_workers=4) == _create(folder)
+
+
+def test_incremental_yaml_dict(monkeypatch):
+    folder = DATA_ROOT / "mouse_physio_2p" / "S20211102"
+    full = _create(folder)
+    scan_cache = dict()
+    assert _create(folder, scan_cache) == full
+    assert str(folder) in scan_cache
+    # the cache survives a round trip to json
+    scan_cache = json.loads(json.dumps(scan_cache))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("folder parsed again")
+
+    monkeypatch.setattr(Dataset, "from_folder", fail)
+    assert _create(folder, scan_cache) == full
@@ -0,0 +1,97 @@
+import pytest
+from flexiznam.camp import sync_data
+from flexiznam.camp.upload_journal import UploadJournal, UploadProgress
+
+
+def test_upload_journal(tmp_path):
+    journal_file = tmp_path / "upload.jsonl"
+    journal = UploadJournal(journal_file)
+    assert len(journal) == 0
+    journal.add(["mouse", "S20230101"], "abc", "session")
+    journal.add(["mouse", "S20230101", "R101010"], "def", "recording")
+    assert ["mouse", "S20230101"] in journal
+    # simulate an upload killed while writing
+    with open(journal_file, "a") as f:
+        f.write('{"path": ["mouse", "S2023')
+    reloaded = UploadJournal(journal_file)
+    assert len(reloaded) == 2
+    assert reloaded.get(["mouse", "S20230101", "R101010"])["id"] == "def"
+    assert reloaded.get(["mouse", "S20230102"]) is None
+    # entries added after the partial line are kept
+    reloaded.add(["mouse", "S20230102"], "ghi", "session")
+    assert UploadJournal(journal_file).get(["mouse", "S20230102"])["id"] == "ghi"
+
+
+def test_upload_progress():
+    progress = UploadProgress(total=4)
+    progress.created += 1
+    progress.skipped += 1
+    progress.resumed += 1
+    assert progress.done == 3
+    assert progress.rate > 0
+    assert str(progress).startswith("3/4 entities")
+
+
+def test_resume_upload(tmp_path, monkeypatch):
+    yaml_dict = dict(
+        S20230101=dict(
+            type="session",
+            children=dict(
+                R101010=dict(type="recording", children=dict()),
+                R111111=dict(type="recording", children=dict()),
+            ),
+        ),
+        S20230102=dict(type="session", children=dict()),
+    )
+    online = {"S20230102": "existing"}
+    calls = []
+    connection_lost = [True]
+
+    def fake_upload(entity, entity_data, datatype, origin, *args):
+        calls.append((entity, origin["id"]))
+        if entity == "R111111" and connection_lost[0]:
+            connection_lost[0] = False
+            raise OSError("connection lost")
+        if entity in online:
+            return "skipped", dict(id=online[entity], name=entity)
+        return "created", dict(id="id_" + entity, name=entity)
+
+    monkeypatch.setattr(sync_data, "_upload_entity", fake_upload)
+
+    def upload(progress):
+        sync_data._upload_yaml_dict(
+            yaml_dict,
+            origin=dict(id="id_mouse", name="mouse"),
+            raw_data_folder=None,
+            log_func=print,
+            flexilims_session=None,
+            conflicts="skip",
+            verbose=False,
+            genealogy=["mouse"],
+            journal=UploadJournal(tmp_path / "upload.jsonl"),
+            progress=progress,
+        )
+
+    progress = UploadProgress(total=4)
+    with pytest.raises(OSError):
+        upload(progress)
+    assert (progress.created, progress.failed) == (2, 1)
+    assert calls == [
+        ("S20230101", "id_mouse"),
+        ("R101010", "id_S20230101"),
+        ("R111111", "id_S20230101"),
+    ]
+
+    # entities in the journal are not uploaded again and keep their id
+    calls.clear()
+    progress = UploadProgress(total=4)
+    upload(progress)
+    assert calls == [
+        ("R111111", "id_S20230101"),
+        ("S20230102", "id_mouse"),
+    ]
+    assert (progress.created, progress.skipped, progress.resumed) == (1, 1, 2)
+    assert progress.failed == 0
+    assert progress.done == progress.total
+    journal = UploadJournal(tmp_path / "upload.jsonl")
+    assert journal.get(["mouse", "S20230102"])["id"] == "existing"
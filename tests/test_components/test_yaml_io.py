@@ -0,0 +1,37 @@
+import os
+import numpy as np
+import yaml
+from flexiznam import yaml_io
+
+
+def test_dump_and_load(tmp_path):
+    data = dict(a=1, b=[1.5, "x"], c=dict(d=None, e=(1, 2)))
+    target = tmp_path / "data.yml"
+    yaml_io.dump_yaml(data, target)
+    loaded = yaml_io.load_yaml(target, cache=False)
+    assert loaded == dict(a=1, b=[1.5, "x"], c=dict(d=None, e=[1, 2]))
+    assert yaml_io.safe_load(target.read_text()) == loaded
+    # non basic types are still dumped
+    text = yaml_io.dump(dict(a=np.float64(1)))
+    assert text == yaml.dump(dict(a=np.float64(1)))
+
+
+def test_json_cache(tmp_path):
+    target = tmp_path / "data.yml"
+    yaml_io.dump_yaml(dict(a=1), target)
+    cache_file = tmp_path / ("data.yml" + yaml_io.CACHE_SUFFIX)
+    assert yaml_io.load_yaml(target, cache=True) == dict(a=1)
+    assert cache_file.exists()
+    # the cache is used if the yaml did not change
+    cached = yaml_io._read_cache(cache_file, os.stat(target))
+    assert cached["data"] == dict(a=1)
+    # and ignored if it changed
+    target.write_text("a: 22\n")
+    assert yaml_io.load_yaml(target, cache=True) == dict(a=22)
+    # writing the yaml removes the cache
+    yaml_io.dump_yaml(dict(a=3), target)
+    assert not cache_file.exists()
+    # data that cannot be stored as JSON is not cached
+    target.write_text("1: 2021-01-01\n")
+    assert yaml_io.load_yaml(target, cache=True) == {1: yaml.safe_load("2021-01-01")}
+    assert not cache_file.exists()
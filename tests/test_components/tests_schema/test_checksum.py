@@ -0,0 +1,69 @@
+import hashlib
+import pytest
+from flexiznam.schema import SequencingData
+from flexiznam.schema import checksum
+from flexiznam.errors import DatasetError
+
+
+def test_compute_checksums(tmp_path):
+    data = bytes(range(256)) * 10
+    files = []
+    for i in range(3):
+        files.append(tmp_path / ("file%d.bin" % i))
+        files[-1].write_bytes(data[i:])
+    records = checksum.compute_checksums(files, chunk_size=64, max_workers=2)
+    for path, record in zip(files, records):
+        assert record["digest"] == hashlib.md5(path.read_bytes()).hexdigest()
+        assert record["size"] == path.stat().st_size
+    with pytest.raises(ValueError):
+        checksum.compute_checksums(files, algorithm="crc")
+    with pytest.raises(ValueError):
+        checksum.compute_checksums(files, piece_size=100, chunk_size=64)
+
+
+def test_piecewise_resume(tmp_path, monkeypatch):
+    path = tmp_path / "file.bin"
+    path.write_bytes(bytes(range(256)) * 10)
+    pieces = [path.read_bytes()[i : i + 512] for i in range(0, 2560, 512)]
+    expected = hashlib.md5(
+        b"".join(hashlib.md5(p).digest() for p in pieces)
+    ).hexdigest()
+    state_file = tmp_path / "state.jsonl"
+    kwargs = dict(piece_size=512, chunk_size=64, state_file=state_file)
+    assert checksum.compute_checksums([path], **kwargs)[0]["digest"] == expected
+    lines = state_file.read_text().splitlines()
+    assert len(lines) == len(pieces)
+
+    # interrupted run: two pieces done and one partially written line
+    state_file.write_text("\n".join(lines[:2]) + "\n" + lines[2][:10])
+    hashed = []
+    hash_range = checksum.hash_range
+
+    def counting_hash_range(path, algorithm, start, length, chunk_size):
+        hashed.append(start)
+        return hash_range(path, algorithm, start, length, chunk_size)
+
+    monkeypatch.setattr(checksum, "hash_range", counting_hash_range)
+    assert checksum.compute_checksums([path], **kwargs)[0]["digest"] == expected
+    assert len(hashed) == len(pieces) - 2
+    # nothing to do once finished
+    hashed.clear()
+    assert checksum.compute_checksums([path], **kwargs)[0]["digest"] == expected
+    assert not hashed
+
+
+def test_dataset_checksums(tmp_path):
+    path = tmp_path / "sample.fastq.gz"
+    path.write_bytes(b"ACGT" * 1000)
+    ds = SequencingData(path=path, is_raw=True, genealogy=("sample",))
+    with pytest.raises(DatasetError):
+        ds.verify_checksums()
+    checksums = ds.compute_checksums()
+    assert ds.extra_attributes["checksums"] is checksums
+    assert checksums["files"][0]["file"] == "sample.fastq.gz"
+    assert checksums["files"][0]["digest"] == hashlib.md5(b"ACGT" * 1000).hexdigest()
+    assert ds.verify_checksums() == {}
+    path.write_bytes(b"TGCA" * 1000)
+    assert ds.verify_checksums() == {"sample.fastq.gz": "checksum changed"}
+    path.unlink()
+    assert ds.verify_checksums() == {"sample.fastq.gz": "file is missing"}
@@ -0,0 +1,91 @@
+import gc
+import tracemalloc
+import pytest
+import numpy as np
+import pandas as pd
+from flexiznam.schema import Dataset, DatasetTable
+from flexiznam.errors import DatasetError
+from tests.tests_resources.data_for_testing import PROJECT_ID
+
+
+def _make_dataframe(n_sessions=10, n_recordings=10, n_datasets=10):
+    records = []
+    names = []
+    for s in range(n_sessions):
+        for r in range(n_recordings):
+            for d in range(n_datasets):
+                genealogy = ("mouse", "S2023%04d" % s, "R%06d" % r, "suite2p_%d" % d)
+                names.append("_".join(genealogy))
+                records.append(
+                    dict(
+                        genealogy=genealogy,
+                        path="/".join(("project",) + genealogy),
+                        id="%024x" % len(records),
+                        origin_id="%024x" % (len(records) // n_datasets),
+                        project=PROJECT_ID,
+                        is_raw="no",
+                        dataset_type="suite2p_rois",
+                        created="2023-01-01 10:00:00",
+                        nplanes=4,
+                        fs=30.0,
+                    )
+                )
+    records[0]["dataset_type"] = "microscopy"
+    records[0]["pixel_size"] = 1.5
+    return pd.DataFrame(records, index=names)
+
+
+def test_dataset_table():
+    df = _make_dataframe(n_sessions=2)
+    table = DatasetTable.from_dataframe(df)
+    datasets = Dataset.from_dataframe(df)
+    assert len(table) == len(datasets)
+    assert table.names == list(df.index)
+    assert table.project_id == PROJECT_ID
+    for row in (0, 1, 57, -1):
+        ds, expected = table[row], datasets[row]
+        assert type(ds) == type(expected)
+        assert ds.full_name == expected.full_name
+        assert ds.genealogy == expected.genealogy
+        assert ds.path == expected.path
+        assert ds.id == expected.id
+        assert ds.origin_id == expected.origin_id
+        assert ds.project == expected.project
+        assert ds.extra_attributes.keys() == expected.extra_attributes.keys()
+    assert np.isnan(table[1].extra_attributes["pixel_size"])
+    name = df.index[12]
+    assert name in table
+    assert table[name].full_name == name
+    assert table.genealogy(12) == df.iloc[12]["genealogy"]
+    with pytest.raises(KeyError):
+        table["not_a_dataset"]
+    with pytest.raises(IndexError):
+        table[len(table)]
+
+    # attributes missing from a dataset are not added by the table
+    small = DatasetTable.from_datasets(datasets[:2])
+    small.append(datasets[2])
+    assert len(small) == 3
+    assert small[0].extra_attributes == datasets[0].extra_attributes
+    assert small[2].full_name == datasets[2].full_name
+
+    df.loc[df.index[3], "genealogy"] = ("wrong",)
+    with pytest.raises(DatasetError):
+        DatasetTable.from_dataframe(df)
+
+
+def test_dataset_table_memory():
+    df = _make_dataframe()
+
+    def traced_size(function):
+        gc.collect()
+        tracemalloc.start()
+        output = function(df)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del output
+        return size
+
+    list_size = traced_size(Dataset.from_dataframe)
+    table_size = traced_size(DatasetTable.from_dataframe)
+    assert table_size < list_size / 3
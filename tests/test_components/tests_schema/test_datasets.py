@@ -230,6 +230,46 @@ def test_from_dataseries(flm_sess):
     assert type(ds) == microscopy_data.MicroscopyData
 
 
+def test_from_dataframe(flm_sess):
+    df = pd.DataFrame(
+        [
+            dict(
+                genealogy=("minimal_series",),
+                path="/fake/path",
+                id="hexidonflexilims",
+                project=PROJECT_ID,
+                is_raw="no",
+                dataset_type="suite2p_rois",
+            ),
+            dict(
+                genealogy=("test", "microscopy"),
+                path="/fake/path",
+                id="hexidonflexilims",
+                project=PROJECT_ID,
+                is_raw="no",
+                dataset_type="microscopy",
+                pixel_size=1.5,
+            ),
+        ],
+        index=["minimal_series", "test_microscopy"],
+    )
+    datasets = Dataset.from_dataframe(df, flexilims_session=flm_sess)
+    for (name, series), ds in zip(df.iterrows(), datasets):
+        from_series = Dataset.from_dataseries(series, flexilims_session=flm_sess)
+        assert type(ds) == type(from_series)
+        assert ds.full_name == name
+        assert ds.project == from_series.project
+        assert ds.project_id == PROJECT_ID
+        assert ds.flexilims_session == flm_sess
+        assert ds.extra_attributes.keys() == from_series.extra_attributes.keys()
+    # missing attributes are kept as NaN, like from_dataseries
+    assert np.isnan(datasets[0].extra_attributes["pixel_size"])
+    assert Dataset.from_dataframe(df.iloc[:0]) == []
+    df.loc["test_microscopy", "genealogy"] = ("wrong",)
+    with pytest.raises(DatasetError):
+        Dataset.from_dataframe(df, flexilims_session=flm_sess)
+
+
 def test_from_origin(flm_sess):
     """This test requires the database to be up-to-date for the physio mouse"""
     origin_name = "mouse_physio_2p_S20211102_R165821_SpheresPermTube"
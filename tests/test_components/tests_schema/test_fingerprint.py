@@ -0,0 +1,54 @@
+import os
+import pytest
+from flexiznam.schema import Dataset
+from flexiznam.schema import fingerprint
+from flexiznam.config import PARAMETERS
+from flexiznam.errors import DatasetError
+
+
+def test_sample_hash(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 64)
+    reference = fingerprint.sample_hash(path, block_size=256, n_blocks=4)
+    # the whole file is hashed if it is small enough
+    assert fingerprint.sample_hash(path, block_size=4096, n_blocks=4) != reference
+    data = bytearray(path.read_bytes())
+    # the middle of the second block of 4 is not sampled
+    data[len(data) // 2] ^= 1
+    path.write_bytes(bytes(data))
+    assert fingerprint.sample_hash(path, block_size=256, n_blocks=4) == reference
+    data[-1] ^= 1
+    path.write_bytes(bytes(data))
+    assert fingerprint.sample_hash(path, block_size=256, n_blocks=4) != reference
+    with pytest.raises(ValueError):
+        fingerprint.sample_hash(path, n_blocks=1)
+
+
+def test_dataset_fingerprint(tmp_path, monkeypatch):
+    monkeypatch.setitem(
+        PARAMETERS, "data_root", dict(raw=str(tmp_path), processed=str(tmp_path))
+    )
+    folder = tmp_path / "recording"
+    folder.mkdir()
+    (folder / "a_harpmessage.bin").write_bytes(b"0" * 1000)
+    (folder / "a_di.csv").write_text("data")
+    datasets = Dataset.from_folder(folder, fingerprint=True, max_workers=2)
+    ds = datasets["a_harpmessage"]
+    prints = ds.extra_attributes["fingerprint"]
+    assert sorted(r["file"] for r in prints["files"]) == [
+        "a_di.csv",
+        "a_harpmessage.bin",
+    ]
+    assert ds.verify() == {}
+    # a new modification time with the same content is not a change
+    os.utime(folder / "a_di.csv", ns=(0, 0))
+    assert ds.verify() == {}
+    (folder / "a_di.csv").write_text("DATA")
+    assert ds.verify() == {"a_di.csv": "content changed"}
+    (folder / "a_harpmessage.bin").write_bytes(b"0" * 10)
+    assert ds.verify(deep=True)["a_harpmessage.bin"].startswith("size changed")
+    (folder / "a_di.csv").unlink()
+    assert ds.verify()["a_di.csv"] == "file is missing"
+    ds.extra_attributes.pop("fingerprint")
+    with pytest.raises(DatasetError):
+        ds.verify()
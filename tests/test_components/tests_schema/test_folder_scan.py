@@ -0,0 +1,50 @@
+import os
+from flexiznam.schema import Dataset
+from flexiznam.schema.folder_scan import FolderScan, ListingCache
+from tests.tests_resources.data_for_testing import DATA_ROOT
+
+
+def test_folder_scan(tmp_path):
+    for fname in ("a_harpmessage.bin", "a_di.csv", "b.fastq.gz", "c.txt"):
+        (tmp_path / fname).write_text("data")
+    (tmp_path / "sub").mkdir()
+    scan = FolderScan(tmp_path)
+    assert scan.listdir() == os.listdir(tmp_path)
+    assert sorted(scan.glob("*.csv")) == sorted(tmp_path.glob("*.csv"))
+    assert scan.is_dir("sub") and not scan.is_dir("c.txt")
+    assert scan.stat("c.txt").st_size == 4
+    assert FolderScan.from_folder(tmp_path, scan) is scan
+    assert FolderScan.from_folder(tmp_path / "sub", scan) is not scan
+
+
+def test_listing_cache(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("data")
+    (tmp_path / "link").symlink_to(tmp_path / "missing")
+    paths = [
+        tmp_path / "sub",
+        tmp_path / "sub" / "c.txt",
+        tmp_path / "sub" / "d.txt",
+        tmp_path / "missing" / "e.txt",
+        tmp_path / "link",
+    ]
+    listings = ListingCache()
+    listings.prefetch(paths, max_workers=2)
+    assert len(listings.listings) == 3
+    assert listings.listings[str(tmp_path / "missing")] == {}
+    for path in paths:
+        assert listings.exists(path) == path.exists()
+        assert listings.is_dir(path) == path.is_dir()
+        assert listings.is_file(path) == path.is_file()
+    # folders that were not prefetched are listed on demand
+    assert not listings.exists(tmp_path / "other" / "f.txt")
+    assert str(tmp_path / "other") in listings.listings
+
+
+def test_from_folder_shared_scan():
+    folder = DATA_ROOT / "mouse_physio_2p" / "S20211102" / "R165821_SpheresPermTube"
+    serial = Dataset.from_folder(folder)
+    parallel = Dataset.from_folder(folder, max_workers=4)
+    assert list(serial) == list(parallel)
+    for name, ds in serial.items():
+        assert ds.extra_attributes == parallel[name].extra_attributes
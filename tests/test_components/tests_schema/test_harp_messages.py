@@ -0,0 +1,82 @@
+import struct
+import numpy as np
+import pytest
+from flexiznam.schema import HarpData
+from flexiznam.schema.harp_messages import HarpMessages, find_messages
+
+
+def _message(message_type, address, payload_type, values, timestamp=None):
+    """Encode a Harp message"""
+    fmt = {0x01: "B", 0x82: "h", 0x44: "f"}[payload_type]
+    body = bytes([address, 255])
+    if timestamp is None:
+        body += bytes([payload_type])
+    else:
+        seconds = int(timestamp)
+        ticks = int(round((timestamp - seconds) / 32e-6))
+        body += bytes([payload_type | 0x10]) + struct.pack("<IH", seconds, ticks)
+    body += struct.pack("<%d%s" % (len(values), fmt), *values)
+    message = bytes([message_type, len(body) + 1]) + body
+    return message + bytes([sum(message) % 256])
+
+
+def _make_stream(n_messages=300):
+    messages = []
+    expected = []
+    for i in range(n_messages):
+        timestamp = 100 + i * 0.001
+        if i % 3 == 0:
+            # payload bytes that look like message headers
+            values = [3, 6, 32, 255, 0x11]
+            messages.append(_message(3, 32, 0x01, values[i % 5 : i % 5 + 1], timestamp))
+            expected.append((32, timestamp))
+        elif i % 3 == 1:
+            messages.append(_message(3, 44, 0x82, [i, -i, 2 * i], timestamp))
+            expected.append((44, timestamp))
+        else:
+            messages.append(_message(2, 40, 0x44, [i / 2], timestamp))
+            expected.append((40, timestamp))
+    return messages, expected
+
+
+def test_find_messages():
+    messages, _ = _make_stream()
+    stream = b"".join(messages)
+    offsets = find_messages(np.frombuffer(stream, dtype=np.uint8))
+    assert list(offsets) == list(np.cumsum([0] + [len(m) for m in messages[:-1]]))
+    # an incomplete message at the end is ignored
+    truncated = np.frombuffer(stream[:-3], dtype=np.uint8)
+    assert len(find_messages(truncated)) == len(messages) - 1
+    assert len(find_messages(np.zeros(3, dtype=np.uint8))) == 0
+
+
+def test_harp_messages(tmp_path):
+    messages, expected = _make_stream()
+    (tmp_path / "a_harpmessage.bin").write_bytes(b"".join(messages))
+    ds = HarpData(
+        path=tmp_path,
+        is_raw=True,
+        genealogy=("a_harpmessage",),
+        extra_attributes=dict(binary_file="a_harpmessage.bin", csv_files={}),
+    )
+    harp = ds.load_messages()
+    assert isinstance(harp, HarpMessages)
+    assert len(harp) == len(messages)
+    assert list(harp.addresses) == [32, 40, 44]
+    assert list(harp.messages["address"]) == [e[0] for e in expected]
+    assert np.allclose(harp.timestamps, [e[1] for e in expected], atol=32e-6)
+
+    analog = harp.register(44)
+    assert analog["payload"].shape == (100, 3)
+    assert analog["payload"].dtype == np.int16
+    assert list(analog["payload"][1]) == [4, -4, 8]
+    writes = harp.register(40, message_type=2)
+    assert writes["payload"].dtype == np.float32
+    assert writes["payload"][0] == 1.0
+    with pytest.raises(KeyError):
+        harp.register(40, message_type=3)
+
+    window = harp.time_slice(100.0995, 100.1995)
+    assert len(window) == 100
+    assert window.timestamps[0] >= 100.0995
+    assert len(window.register(44)) == 34
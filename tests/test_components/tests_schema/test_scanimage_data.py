@@ -1,7 +1,45 @@
-from flexiznam.schema.scanimage_data import ScanimageData
+import struct
+import pytest
+from flexiznam.schema import scanimage_cache, scanimage_data
+from flexiznam.schema.scanimage_cache import ScanimageHeaderCache, get_header_cache
+from flexiznam.schema.scanimage_data import ScanimageData, parse_si_filename
 from tests.tests_resources.data_for_testing import DATA_ROOT
 
 
+def write_si_tif(path, frames_per_file="Inf", scanimage=True):
+    """Write a 1x1 pixel BigTIFF with a ScanImage v3 metadata block"""
+    frame_data = (
+        "SI.VERSION_MAJOR = '2021'\nSI.hScan2D.logFramesPerFile = %s\n"
+        % frames_per_file
+    ).encode() + b"\x00"
+    magic = 117637889 if scanimage else 0
+    header = struct.pack("<2sHHHQ", b"II", 43, 8, 0, 0)
+    header += struct.pack("<IIII", magic, 3, len(frame_data), 0) + frame_data
+    software = b"SI.LINE_SCAN\x00" if scanimage else b"other\x00"
+    pixel_offset = len(header)
+    software_offset = pixel_offset + 8
+    ifd_offset = software_offset + 16
+    tags = [
+        (256, 3, 1, 1),  # ImageWidth
+        (257, 3, 1, 1),  # ImageLength
+        (258, 3, 1, 8),  # BitsPerSample
+        (259, 3, 1, 1),  # Compression
+        (262, 3, 1, 1),  # Photometric
+        (273, 16, 1, pixel_offset),  # StripOffsets
+        (278, 3, 1, 1),  # RowsPerStrip
+        (279, 16, 1, 1),  # StripByteCounts
+        (305, 2, len(software), software_offset),  # Software
+    ]
+    ifd = struct.pack("<Q", len(tags))
+    for code, dtype, count, value in tags:
+        ifd += struct.pack("<HHQQ", code, dtype, count, value)
+    ifd += struct.pack("<Q", 0)
+    header = header[:8] + struct.pack("<Q", ifd_offset) + header[16:]
+    data = header + b"\x01".ljust(8, b"\x00") + software.ljust(16, b"\x00") + ifd
+    path.write_bytes(data)
+    return path
+
+
 def test_scanimage(tmp_path):
     data_dir = DATA_ROOT / "mouse_physio_2p" / "S20211102" / "Ref"
     ds = ScanimageData.from_folder(data_dir, verbose=False)
@@ -11,3 +49,70 @@ def test_scanimage(tmp_path):
     assert d.dataset_name == "Ref_00001"
     assert d.is_valid()
     assert len(d) == 5
+
+
+def test_parse_si_filename(tmp_path, monkeypatch):
+    header_cache = ScanimageHeaderCache(tmp_path / "cache" / "headers.db")
+    monkeypatch.setattr(scanimage_data, "get_header_cache", lambda: header_cache)
+    multi = write_si_tif(tmp_path / "acq_00002_00003chan1.tif", frames_per_file=500)
+    single = write_si_tif(tmp_path / "acq_00001.tif")
+    other = write_si_tif(tmp_path / "other_00001.tif", scanimage=False)
+    expected = dict(file_stem="acq", acq_num="00002", acq_uid="acq_00002")
+    expected.update(file_num="00003", channel="chan1")
+    assert parse_si_filename(multi, use_cache=False) == expected
+    assert parse_si_filename(multi) == expected
+    assert parse_si_filename(single)["acq_uid"] == "acq_00001"
+    assert parse_si_filename(other) is None
+    assert len(header_cache) == 3
+
+    # cached results do not open the file
+    def fail(*args, **kwargs):
+        raise AssertionError("file was read")
+
+    monkeypatch.setattr(scanimage_data, "_read_frames_per_file", fail)
+    assert parse_si_filename(multi) == expected
+    assert parse_si_filename(other) is None
+    # a modified file is read again
+    write_si_tif(other, frames_per_file=1000)
+    with pytest.raises(AssertionError):
+        parse_si_filename(other)
+
+
+def test_read_si_header(tmp_path):
+    si_tif = write_si_tif(tmp_path / "acq_00001_00001.tif", frames_per_file=500)
+    header = si_tif.read_bytes()
+    assert scanimage_data._read_si_header(header) == (True, 500)
+    assert scanimage_data._read_frames_per_file_tifffile(si_tif) == 500
+    inf_tif = write_si_tif(tmp_path / "acq_00002.tif")
+    assert scanimage_data._read_si_header(inf_tif.read_bytes()) == (True, float("inf"))
+    # frame data longer than the first read
+    with open(si_tif, "rb") as fhandle:
+        assert scanimage_data._read_si_header(fhandle.read(40), fhandle) == (True, 500)
+    # not a tif at all
+    assert scanimage_data._read_si_header(b"not a tif file") == (True, None)
+    assert scanimage_data._read_si_header(b"") == (True, None)
+    # valid tif without the scanimage block: let tifffile decide
+    other = write_si_tif(tmp_path / "other.tif", scanimage=False)
+    assert scanimage_data._read_si_header(other.read_bytes()) == (False, None)
+    assert scanimage_data._read_frames_per_file(other) is None
+    assert scanimage_data._read_si_header(b"II*\x00" + bytes(60)) == (False, None)
+
+
+def test_get_header_cache(tmp_path, monkeypatch):
+    parameters = dict(data_root=dict(processed=str(tmp_path / "processed")))
+    monkeypatch.setattr(scanimage_cache, "PARAMETERS", parameters)
+    monkeypatch.setattr(scanimage_cache, "_DEFAULT_CACHE", dict())
+    # disabled by default, nothing is written in the data root
+    assert get_header_cache() is None
+    parameters["scanimage_header_cache"] = False
+    assert get_header_cache() is None
+    assert not (tmp_path / "processed").exists()
+    parameters["scanimage_header_cache"] = str(tmp_path / "local" / "headers.db")
+    header_cache = get_header_cache()
+    assert isinstance(header_cache, ScanimageHeaderCache)
+    assert header_cache.db_file == tmp_path / "local" / "headers.db"
+    assert get_header_cache() is header_cache
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    parameters["scanimage_header_cache"] = True
+    header_cache = get_header_cache()
+    assert header_cache.db_file.parent == tmp_path / "home" / ".flexiznam"